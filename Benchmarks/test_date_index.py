@@ -0,0 +1,91 @@
+"""Benchmark of string vs. DatetimeIndex dates for the typical alignment operations of the pipeline
+
+Times every operation with pytest-benchmark on both index types and checks that they give the
+same results, so the saved runs show the speedup of the DatetimeIndex.
+
+Run from the repository root with: python -m pytest Benchmarks/test_date_index.py
+"""
+import pytest
+from numpy.random import default_rng
+from pandas import DataFrame, DatetimeIndex, date_range
+
+YEARS = 30
+N_TICKERS = 500
+ROUNDS = 3
+
+## create dict of the conversions of the dates to each index type
+INDEX_TYPES = {
+    "str": lambda index: index.strftime("%Y-%m-%d"),
+    "DatetimeIndex": lambda index: index,
+}
+
+
+@pytest.fixture(scope="module")
+def returns() -> DataFrame:
+    rng = default_rng(0)
+    dates = date_range("1990-01-01", periods=YEARS * 261, freq="B", name="date")
+    return DataFrame(
+        rng.normal(0, 0.01, (len(dates), N_TICKERS)),
+        index=dates,
+        columns=[f"T{i}" for i in range(N_TICKERS)],
+    )
+
+
+@pytest.fixture(scope="module", params=list(INDEX_TYPES))
+def dated(request, returns) -> dict:
+    convert = INDEX_TYPES[request.param]
+    ### drop every 7th day to mimic holidays that have to be re-aligned
+    trading_returns = returns.iloc[[i for i in range(len(returns)) if i % 7]]
+    return {
+        "index_type": request.param,
+        "full_index": convert(returns.index),
+        "returns": trading_returns.set_axis(convert(trading_returns.index)),
+        "benchmark": returns["T0"].rename("benchmark").set_axis(convert(returns.index)),
+    }
+
+
+## create function to time an operation
+def run(benchmark, operation):
+    return benchmark.pedantic(operation, rounds=ROUNDS, iterations=1)
+
+
+def test_index_memory(returns):
+    memory_kb = {
+        index_type: convert(returns.index).memory_usage(deep=True) / 1024
+        for index_type, convert in INDEX_TYPES.items()
+    }
+    assert memory_kb["DatetimeIndex"] < memory_kb["str"]
+
+
+def test_reindex(benchmark, dated):
+    temp_returns = dated["returns"]
+    reindexed = run(
+        benchmark, lambda: temp_returns.reindex(dated["full_index"], fill_value=0)
+    )
+    assert reindexed.shape == (len(dated["full_index"]), N_TICKERS)
+    ### the dropped holidays are filled with 0
+    assert (reindexed["T1"] == 0).sum() == len(dated["full_index"]) - len(temp_returns)
+
+
+def test_join(benchmark, dated):
+    joined = run(benchmark, lambda: dated["returns"].join(dated["benchmark"]))
+    assert joined["benchmark"].equals(joined["T0"].rename("benchmark"))
+
+
+def test_align(benchmark, dated):
+    active = run(benchmark, lambda: dated["returns"].sub(dated["benchmark"], axis=0))
+    ### the benchmark days missing from the returns give rows of NaN
+    assert len(active) == len(dated["full_index"])
+    assert (active["T0"].dropna() == 0).all()
+
+
+def test_slice_year(benchmark, dated):
+    temp_returns = dated["returns"]
+    if dated["index_type"] == "DatetimeIndex":
+        year = run(benchmark, lambda: temp_returns.loc["2000-01-01":"2000-12-31"])
+    else:
+        year = run(
+            benchmark, lambda: temp_returns[temp_returns.index.str.startswith("2000")]
+        )
+    dates = DatetimeIndex(year.index)
+    assert len(year) and (dates.year == 2000).all()
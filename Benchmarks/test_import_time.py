@@ -0,0 +1,81 @@
+"""Check of the import time of the Utils modules, which short-lived CLI and worker processes pay on every start
+
+Every module is imported in a fresh interpreter with python -X importtime. The check fails if a
+module pulls in one of the heavy optional libraries (plotting, Excel, Yahoo) at import, or if the
+fastest of several imports takes longer than the budget times its margin for timing noise.
+
+Run from the repository root with: python -m pytest Benchmarks/test_import_time.py
+"""
+import subprocess
+import sys
+
+import pytest
+from pandas import DataFrame
+
+## create list of the libraries that may only be imported when their code paths are used
+HEAVY_MODULES = ["matplotlib", "mplfinance", "openpyxl", "yfinance", "sklearn"]
+
+## create list of the checked modules
+MODULES = [
+    "Utils.Portfolio.Portfolio",
+    "Utils.Portfolio.Batch",
+    "Utils.Portfolio.Stats",
+    "Utils.Sourcing.Provider",
+    "Utils.__main__",
+]
+
+## cumulative import time in ms including pandas, and the factor allowed on top of it
+IMPORT_BUDGET_MS = 400
+IMPORT_MARGIN = 2
+NUMBER = 3
+
+
+## create function to get the import times of all modules imported by an import statement
+def import_times(module: str) -> DataFrame:
+    """Function to import a module in a fresh interpreter and parse the output of -X importtime
+
+    Parameters
+    ----------
+    module : str
+        dotted name of the module
+
+    Returns
+    -------
+    DataFrame
+        df indexed by imported module with its own and cumulative import time in ms
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own_us, cumulative_us, name = line[len("import time:") :].split("|")
+        rows.append(
+            {
+                "module": name.strip(),
+                "own_ms": int(own_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+            }
+        )
+    return DataFrame(rows).drop_duplicates("module").set_index("module")
+
+
+@pytest.mark.parametrize("module", MODULES)
+def test_module_imports_no_heavy_libraries(module):
+    imported = import_times(module).index.str.split(".").str[0]
+    heavy_modules = [name for name in HEAVY_MODULES if name in imported]
+    assert not heavy_modules, f"{module} imports {heavy_modules} at import"
+
+
+@pytest.mark.parametrize("module", MODULES)
+def test_module_import_time_within_budget(module):
+    ### the whole import is timed, as differences to the import time of pandas are too noisy
+    best_ms = min(import_times(module)["own_ms"].sum() for _ in range(NUMBER))
+    assert (
+        best_ms <= IMPORT_BUDGET_MS * IMPORT_MARGIN
+    ), f"{module} takes {best_ms:.0f} ms to import, budget {IMPORT_BUDGET_MS} ms"
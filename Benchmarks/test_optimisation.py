@@ -0,0 +1,120 @@
+"""Benchmark of the portfolio optimisers on a large universe
+
+Estimates the shrunk covariance matrix of synthetic stocks driven by a common market factor and
+runs every objective of Utils.Portfolio.Optimisation on it, as PortfolioAnalysis.optimise_weights
+does. Every step is timed with pytest-benchmark and fails if its fastest round takes longer than
+MAX_SECONDS or if the weights are not fully invested within the bounds.
+
+Run from the repository root with: python -m pytest Benchmarks/test_optimisation.py
+"""
+import pytest
+from numpy.random import default_rng
+from pandas import DataFrame, Series
+
+from Utils.Portfolio.Optimisation import (
+    ledoit_wolf_shrinkage,
+    max_sharpe_weights,
+    min_variance_weights,
+    risk_parity_weights,
+    shrink_covariance,
+    tracking_error_weights,
+)
+from Utils.Portfolio.Stats import covariances
+from Utils.Sourcing.Synthetic import synthetic_ohlc
+from Utils.Sourcing.Yahoo import returns_from_ohlc
+
+N_STOCKS = 500
+YEARS = 3
+MAX_WEIGHT = 0.05
+MAX_TRACKING_ERROR = 0.05
+MAX_SECONDS = 1.0
+ROUNDS = 3
+
+## create list of the tickers of the synthetic stocks
+TICKERS = [f"STOCK{i}" for i in range(N_STOCKS)]
+
+
+@pytest.fixture(scope="module")
+def returns() -> DataFrame:
+    returns = returns_from_ohlc(
+        synthetic_ohlc(TICKERS + ["MARKET"], "2000-01-01", f"{2000 + YEARS}-01-01")
+    ).fillna(0)
+    ### the synthetic paths are independent, a market factor gives a realistic covariance matrix
+    betas = default_rng(0).uniform(0.5, 1.5, N_STOCKS)
+    returns = returns[TICKERS] + returns[["MARKET"]].to_numpy() * betas
+    return returns.assign(BENCHMARK=returns.mean(axis=1))
+
+
+@pytest.fixture(scope="module")
+def covariance_matrix(returns) -> DataFrame:
+    return covariances(returns)
+
+
+@pytest.fixture(scope="module")
+def covariance(returns, covariance_matrix) -> DataFrame:
+    shrinkage = ledoit_wolf_shrinkage(returns[TICKERS])
+    return shrink_covariance(covariance_matrix.loc[TICKERS, TICKERS], shrinkage)
+
+
+## create function to time a step and check its fastest round against the budget
+def run(benchmark, function, *args):
+    result = benchmark.pedantic(function, args, rounds=ROUNDS, iterations=1)
+    ### no timings are kept with --benchmark-disable
+    if benchmark.stats:
+        assert benchmark.stats["min"] <= MAX_SECONDS, f"slower than {MAX_SECONDS} s"
+    return result
+
+
+## create function to check that weights are fully invested within the bounds
+def assert_valid(weights: Series, max_weight: float = MAX_WEIGHT):
+    assert weights.index.tolist() == TICKERS
+    assert abs(weights.sum() - 1) < 1e-8
+    assert weights.min() >= -1e-12
+    assert weights.max() <= max_weight + 1e-12
+
+
+def test_covariance(benchmark, returns):
+    covariance_matrix = run(benchmark, covariances, returns)
+    assert covariance_matrix.shape == (N_STOCKS + 1, N_STOCKS + 1)
+
+
+def test_shrinkage(benchmark, returns):
+    assert 0 <= run(benchmark, ledoit_wolf_shrinkage, returns[TICKERS]) <= 1
+
+
+def test_min_variance(benchmark, covariance):
+    assert_valid(run(benchmark, min_variance_weights, covariance, 0.0, MAX_WEIGHT))
+
+
+def test_max_sharpe(benchmark, returns, covariance):
+    expected_returns = returns[TICKERS].mean()
+    weights = run(
+        benchmark,
+        max_sharpe_weights,
+        covariance,
+        expected_returns,
+        0.0,
+        0.0,
+        MAX_WEIGHT,
+    )
+    assert_valid(weights)
+
+
+def test_risk_parity(benchmark, covariance):
+    ### risk parity ignores the weight bounds
+    assert_valid(run(benchmark, risk_parity_weights, covariance), 1.0)
+
+
+def test_tracking_error(benchmark, returns, covariance_matrix, covariance):
+    weights = run(
+        benchmark,
+        tracking_error_weights,
+        covariance,
+        covariance_matrix.loc[TICKERS, "BENCHMARK"],
+        covariance_matrix.loc["BENCHMARK", "BENCHMARK"],
+        returns[TICKERS].mean(),
+        MAX_TRACKING_ERROR,
+        0.0,
+        MAX_WEIGHT,
+    )
+    assert_valid(weights)
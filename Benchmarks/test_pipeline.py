@@ -0,0 +1,113 @@
+"""Benchmark suite of the main pipeline steps on synthetic market data, for tracking performance regressions
+
+Times every operation with pytest-benchmark for each combination of number of tickers and years,
+without network access. Saved runs are compared to later ones to flag regressions.
+
+Run from the repository root with:
+    python -m pytest Benchmarks --benchmark-autosave
+    python -m pytest Benchmarks --benchmark-compare --benchmark-compare-fail=min:20%
+"""
+from io import BytesIO
+
+import pytest
+from openpyxl import Workbook
+from pandas import DataFrame, DateOffset, Timestamp
+
+from Utils.Portfolio.Formatting import (
+    save_charts,
+    use_agg_backend,
+    write_df_to_xlsx_table,
+)
+from Utils.Portfolio.Portfolio import PortfolioAnalysis
+from Utils.Sourcing.Synthetic import synthetic_company_info, synthetic_ohlc
+from Utils.Sourcing.Yahoo import returns_from_ohlc
+
+## create grid of cases as (number of tickers, years)
+CASES = [(n_tickers, years) for n_tickers in [10, 100, 1000] for years in [1, 10, 30]]
+ROUNDS = 3
+MAX_XLSX_CELLS = 2_000_000
+N_CHARTS = 10
+
+### mplfinance warns about candle charts of many years, which are rendered on purpose here
+pytestmark = pytest.mark.filterwarnings("ignore:::mplfinance")
+
+
+## create function to build an analysis of n_tickers equally weighted synthetic stocks
+def synthetic_analysis(n_tickers: int, years: int) -> PortfolioAnalysis:
+    end_date = Timestamp("2023-01-01")
+    start_date = end_date - DateOffset(years=years)
+    tickers = [f"T{i:04d}" for i in range(n_tickers)]
+    params = {
+        "start_date": start_date.strftime("%Y-%m-%d"),
+        "end_date": end_date.strftime("%Y-%m-%d"),
+        "benchmark": "BENCH",
+        "path_input": "Input",
+        "path_output": "Output",
+    }
+    constituents_info = (
+        DataFrame([synthetic_company_info(ticker) for ticker in tickers])
+        .set_index("ticker")
+        .assign(weight=1 / n_tickers)
+    )
+    analysis = PortfolioAnalysis.from_data(
+        DataFrame({"weight": 1 / n_tickers}, index=tickers),
+        params,
+        ohlc=synthetic_ohlc(
+            tickers + ["BENCH"], params["start_date"], params["end_date"]
+        ),
+        constituents_info=constituents_info,
+        benchmark_info=synthetic_company_info("BENCH"),
+    )
+    return analysis
+
+
+@pytest.fixture(
+    scope="module", params=CASES, ids=[f"{n}tickers-{y}years" for n, y in CASES]
+)
+def analysis(request) -> PortfolioAnalysis:
+    use_agg_backend()
+    return synthetic_analysis(*request.param)
+
+
+## create function to time an operation, optionally clearing the memoized series first
+def run(benchmark, operation, analysis: PortfolioAnalysis | None = None):
+    def clear_cache():
+        analysis.__dict__.pop("_derived_cache", None)
+
+    setup = clear_cache if analysis is not None else None
+    return benchmark.pedantic(operation, setup=setup, rounds=ROUNDS, iterations=1)
+
+
+def test_returns_from_ohlc(benchmark, analysis):
+    returns = run(benchmark, lambda: returns_from_ohlc(analysis.ohlc))
+    assert returns.shape[1] == len(analysis.portfolio_tickers) + 1
+
+
+def test_get_constituents_stats(benchmark, analysis):
+    stats = run(benchmark, analysis.get_constituents_stats, analysis)
+    assert len(stats) == len(analysis.portfolio_tickers)
+
+
+def test_get_relative_returns_daily(benchmark, analysis):
+    relative_returns = run(benchmark, analysis.get_relative_returns_daily, analysis)
+    assert relative_returns.index.equals(analysis.date_range)
+
+
+def test_write_df_to_xlsx_table(benchmark, analysis):
+    if analysis.constituent_returns.size > MAX_XLSX_CELLS:
+        pytest.skip(f"more than {MAX_XLSX_CELLS} cells")
+
+    def write_table():
+        wb = Workbook(write_only=True)
+        write_df_to_xlsx_table(wb, "constituent_returns", analysis.constituent_returns)
+        ### write-only sheets are only complete once the workbook is saved
+        wb.save(BytesIO())
+
+    run(benchmark, write_table)
+
+
+def test_save_charts(benchmark, analysis, tmp_path):
+    charts = analysis.get_charts("returns_cumulative")[:N_CHARTS]
+    charts += analysis.get_charts("candles")[:1]
+    run(benchmark, lambda: save_charts(charts, str(tmp_path), max_workers=1))
+    assert len(list(tmp_path.iterdir())) == len(charts)
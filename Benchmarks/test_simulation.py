@@ -0,0 +1,67 @@
+"""Benchmark of the Monte Carlo simulation of portfolio outcomes
+
+Times the simulation of a synthetic portfolio vs. its benchmark with every method in the current
+process and on a process pool with pytest-benchmark, and checks that the outcomes do not depend
+on the number of workers. The paths per second are stored in the extra info of every run.
+
+Run from the repository root with: python -m pytest Benchmarks/test_simulation.py
+"""
+import pytest
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
+
+from Utils.Portfolio.Simulation import OUTCOMES, simulate_outcomes
+from Utils.Sourcing.Synthetic import synthetic_ohlc
+from Utils.Sourcing.Yahoo import returns_from_ohlc
+
+N_PATHS = 100_000
+HORIZON_DAYS = 252
+YEARS = 10
+BATCH_SIZE = 10_000
+ROUNDS = 3
+
+
+@pytest.fixture(scope="module")
+def history() -> DataFrame:
+    ohlc = synthetic_ohlc(
+        ["PORTFOLIO", "BENCHMARK"], "2000-01-01", f"{2000 + YEARS}-01-01"
+    )
+    return (
+        returns_from_ohlc(ohlc)
+        .fillna(0)
+        .set_axis(["portfolio", "benchmark"], axis=1)
+    )
+
+
+## create function to simulate the outcomes with the settings of the benchmark
+def simulate(history: DataFrame, method: str, max_workers: int | None) -> DataFrame:
+    return simulate_outcomes(
+        history,
+        N_PATHS,
+        HORIZON_DAYS,
+        method,
+        batch_size=BATCH_SIZE,
+        max_workers=max_workers,
+    )
+
+
+@pytest.fixture(scope="module", params=["bootstrap", "normal"])
+def method(request) -> str:
+    return request.param
+
+
+@pytest.fixture(scope="module")
+def reference(history, method) -> DataFrame:
+    return simulate(history, method, 1)
+
+
+@pytest.mark.parametrize("max_workers", [1, None], ids=["serial", "pool"])
+def test_simulate_outcomes(benchmark, history, method, reference, max_workers):
+    outcomes = benchmark.pedantic(
+        simulate, (history, method, max_workers), rounds=ROUNDS, iterations=1
+    )
+    ### no timings are kept with --benchmark-disable
+    if benchmark.stats:
+        benchmark.extra_info["paths_per_second"] = N_PATHS / benchmark.stats["min"]
+    assert outcomes.shape == (N_PATHS, len(OUTCOMES))
+    assert_frame_equal(outcomes, reference)
@@ -0,0 +1,86 @@
+"""Benchmark of saving and reloading an analysis snapshot vs. re-deriving the returns from prices
+
+Times every step with pytest-benchmark and checks that the reloaded analysis matches the saved one.
+
+Run from the repository root with: python -m pytest Benchmarks/test_snapshot.py
+"""
+import pytest
+from numpy import exp
+from numpy.random import default_rng
+from pandas import DataFrame, concat, date_range
+from pandas.testing import assert_frame_equal
+
+from Utils.Portfolio.Portfolio import PortfolioAnalysis
+from Utils.Sourcing.Yahoo import OHLC_FIELDS, returns_from_ohlc
+
+YEARS = 20
+N_TICKERS = 500
+ROUNDS = 3
+
+
+@pytest.fixture(scope="module")
+def analysis() -> PortfolioAnalysis:
+    rng = default_rng(0)
+    dates = date_range("2000-01-01", periods=YEARS * 261, freq="B", name="date")
+    tickers = [f"T{i}" for i in range(N_TICKERS)] + ["BENCH"]
+    close = DataFrame(
+        100 * exp(rng.normal(0, 0.01, (len(dates), len(tickers))).cumsum(axis=0)),
+        index=dates,
+        columns=tickers,
+    )
+    params = {
+        "start_date": str(dates[0].date()),
+        "end_date": str(dates[-1].date()),
+        "benchmark": "BENCH",
+        "path_input": "Input",
+        "path_output": "Output",
+    }
+    info = DataFrame({"ticker": tickers, "sector": "n/a", "country": "n/a"})
+    return PortfolioAnalysis.from_data(
+        DataFrame({"weight": 1 / N_TICKERS}, index=tickers[:-1]),
+        params,
+        ohlc=concat({field: close for field in OHLC_FIELDS}, axis=1),
+        constituents_info=info.iloc[:-1]
+        .set_index("ticker")
+        .assign(weight=1 / N_TICKERS),
+        benchmark_info=info.iloc[-1].to_dict(),
+    )
+
+
+@pytest.fixture(scope="module")
+def path_snapshot(analysis, tmp_path_factory) -> str:
+    path_snapshot = str(tmp_path_factory.mktemp("snapshot"))
+    analysis.save_snapshot(path_snapshot)
+    return path_snapshot
+
+
+## create function to time an operation
+def run(benchmark, operation):
+    return benchmark.pedantic(operation, rounds=ROUNDS, iterations=1)
+
+
+def test_derive_returns(benchmark, analysis):
+    returns = run(benchmark, lambda: returns_from_ohlc(analysis.ohlc))
+    ### the first day has no return
+    assert returns.shape == (len(analysis.ohlc) - 1, N_TICKERS + 1)
+
+
+def test_save_snapshot(benchmark, analysis, tmp_path):
+    run(benchmark, lambda: analysis.save_snapshot(str(tmp_path)))
+    assert (tmp_path / "metadata.json").exists()
+
+
+@pytest.mark.parametrize("mmap", [True, False], ids=["mmap", "in_memory"])
+def test_load_snapshot(benchmark, analysis, path_snapshot, mmap):
+    loaded = run(
+        benchmark, lambda: PortfolioAnalysis.load_snapshot(path_snapshot, mmap=mmap)
+    )
+    assert_frame_equal(loaded.constituent_returns, analysis.constituent_returns)
+
+
+def test_load_and_stats(benchmark, analysis, path_snapshot):
+    stats = run(
+        benchmark,
+        lambda: PortfolioAnalysis.load_snapshot(path_snapshot).get_constituents_stats(),
+    )
+    assert_frame_equal(stats, analysis.get_constituents_stats())
@@ -0,0 +1,234 @@
+import cProfile
+import json
+import logging
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from io import StringIO
+from os import makedirs, path
+from threading import Lock, local
+from time import perf_counter
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+## create function to print the log messages of the project like the former progress prints
+def configure_logging(level: int | str = logging.INFO) -> None:
+    """Function to print the log messages of all Utils modules to stderr as '<timestamp> - <message>'
+
+    Parameters
+    ----------
+    level : int | str, optional
+        lowest level of the messages shown, by default logging.INFO
+    """
+    utils_logger = logging.getLogger("Utils")
+    if not utils_logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
+        utils_logger.addHandler(handler)
+    utils_logger.setLevel(level)
+
+
+class Instrumentation:
+    def __init__(self):
+        """Class to collect per-stage timings, counters and peak memory of a run
+
+        Stages are timed with the stage context manager or the timed decorator and may be nested,
+        nested stages are reported as 'outer/inner'. Counters (e.g. network_calls, cache_hits,
+        rows_written) are increased with count. Timings and counters are collected from all threads
+        of the current process; work done in worker processes is only visible through its stage in
+        the parent process.
+        """
+        self.lock = Lock()
+        self.local = local()
+        self.trace_memory = False
+        self.reset()
+
+    def reset(self) -> None:
+        """Function to clear all collected timings and counters"""
+        with self.lock:
+            self.started_at = datetime.now()
+            self.start_time = perf_counter()
+            self.stages = {}
+            self.counters = {}
+            self.profile_stats = None
+
+    def count(self, name: str, value: int | float = 1) -> None:
+        """Function to increase a counter
+
+        Parameters
+        ----------
+        name : str
+            name of the counter, e.g. 'network_calls'
+        value : int | float, optional
+            amount added to the counter, by default 1
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def stage(self, name: str):
+        """Context manager timing a stage of the run
+
+        Parameters
+        ----------
+        name : str
+            name of the stage, e.g. 'sourcing.download_ohlc'
+        """
+        stack = self.local.__dict__.setdefault("stack", [])
+        full_name = "/".join([frame["name"] for frame in stack] + [name])
+        frame = {"name": name, "children_peak": 0}
+        if self.trace_memory:
+            ### the peak of the parent stage so far is kept before the peak is reset for this stage
+            if stack:
+                stack[-1]["children_peak"] = max(
+                    stack[-1]["children_peak"], tracemalloc.get_traced_memory()[1]
+                )
+            tracemalloc.reset_peak()
+        stack.append(frame)
+        start_time = perf_counter()
+        try:
+            yield
+        finally:
+            seconds = perf_counter() - start_time
+            stack.pop()
+            peak = None
+            if self.trace_memory:
+                peak = max(tracemalloc.get_traced_memory()[1], frame["children_peak"])
+                if stack:
+                    stack[-1]["children_peak"] = max(stack[-1]["children_peak"], peak)
+            with self.lock:
+                stats = self.stages.setdefault(
+                    full_name, {"calls": 0, "seconds": 0.0, "peak_memory_bytes": None}
+                )
+                stats["calls"] += 1
+                stats["seconds"] += seconds
+                if peak is not None:
+                    stats["peak_memory_bytes"] = max(stats["peak_memory_bytes"] or 0, peak)
+
+    def timed(self, name: str) -> Callable:
+        """Decorator timing every call of a function as a stage
+
+        Parameters
+        ----------
+        name : str
+            name of the stage
+        """
+
+        def decorator(function: Callable) -> Callable:
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def report(self) -> dict:
+        """Function to get the collected timings and counters
+
+        Returns
+        -------
+        dict
+            JSON serialisable dict with the keys started_at, total_seconds, peak_memory_bytes,
+            stages, counters and profile (top functions by cumulative time, if profiled)
+        """
+        with self.lock:
+            return {
+                "started_at": self.started_at.isoformat(),
+                "total_seconds": perf_counter() - self.start_time,
+                "peak_memory_bytes": (
+                    max(
+                        [tracemalloc.get_traced_memory()[1]]
+                        + [
+                            stats["peak_memory_bytes"] or 0
+                            for stats in self.stages.values()
+                        ]
+                    )
+                    if self.trace_memory
+                    else None
+                ),
+                "stages": {name: dict(stats) for name, stats in self.stages.items()},
+                "counters": dict(self.counters),
+                "profile": self.profile_stats,
+            }
+
+    def write_report(self, file_path: str) -> None:
+        """Function to write the report as JSON
+
+        Parameters
+        ----------
+        file_path : str
+            path of the JSON file
+        """
+        makedirs(path.dirname(file_path) or ".", exist_ok=True)
+        with open(file_path, "w") as file:
+            json.dump(self.report(), file, indent=1)
+        logger.info(f"run report saved here: {file_path}")
+
+    @contextmanager
+    def run(
+        self,
+        path_report: str | None = None,
+        trace_memory: bool = False,
+        profile: bool = False,
+        profile_top: int = 30,
+    ):
+        """Context manager instrumenting a whole run, e.g. a notebook or a nightly job
+
+        Parameters
+        ----------
+        path_report : str | None, optional
+            path of the JSON report written at the end, by default None (not written)
+        trace_memory : bool, optional
+            if True, peak memory per stage is measured with tracemalloc, which slows the run down, by default False
+        profile : bool, optional
+            if True, the run is profiled with cProfile; the top functions are added to the report and
+            the raw stats are saved next to it as .prof, by default False
+        profile_top : int, optional
+            number of functions listed in the report, by default 30
+        """
+        self.reset()
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        profiler = cProfile.Profile() if profile else None
+        try:
+            if profiler:
+                profiler.enable()
+            yield self
+        finally:
+            if profiler:
+                profiler.disable()
+                self.profile_stats = _profile_summary(profiler, profile_top)
+                if path_report:
+                    profiler.dump_stats(path.splitext(path_report)[0] + ".prof")
+            if path_report:
+                self.write_report(path_report)
+            if trace_memory:
+                tracemalloc.stop()
+                self.trace_memory = False
+
+
+def _profile_summary(profiler: cProfile.Profile, top: int) -> list[dict]:
+    stats = pstats.Stats(profiler, stream=StringIO())
+    summary = []
+    for (file_name, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+        summary.append(
+            {
+                "function": f"{file_name}:{line}({function})",
+                "calls": calls,
+                "own_seconds": own,
+                "cumulative_seconds": cumulative,
+            }
+        )
+    summary.sort(key=lambda row: row["cumulative_seconds"], reverse=True)
+    return summary[:top]
+
+
+## create the instrumentation shared by all modules
+instrumentation = Instrumentation()
@@ -0,0 +1,167 @@
+from numpy import errstate, log1p, where
+from pandas import DataFrame, Index, Series, concat, get_dummies
+
+## create list of the attribution effects, which add up to the active return
+attribution_effects = ["allocation", "selection", "interaction"]
+
+
+## create function to compute the daily Brinson-Fachler attribution by group
+def brinson_attribution(
+    portfolio_weights: DataFrame | Series,
+    portfolio_returns: DataFrame,
+    portfolio_groups: Series,
+    benchmark_weights: DataFrame | Series,
+    benchmark_returns: DataFrame,
+    benchmark_groups: Series,
+) -> DataFrame:
+    """Function to compute daily allocation, selection and interaction effects per group (e.g. sector)
+
+    Stocks are aggregated to groups with one matrix product against a one-hot group matrix, so the
+    cost is a few matrix products regardless of the number of days. Per day and group:
+    allocation = (wp - wb) * (rb - Rb), selection = wb * (rp - rb), interaction = (wp - wb) * (rp - rb),
+    where w are group weights, r group returns and Rb the total benchmark return. The effects of all
+    groups add up to the active return Rp - Rb of the day.
+
+    Parameters
+    ----------
+    portfolio_weights : DataFrame | Series
+        start-of-day weights of the portfolio stocks, one column per stock, or a series for constant weights
+    portfolio_returns : DataFrame
+        df of daily returns of the portfolio stocks with a DatetimeIndex
+    portfolio_groups : Series
+        group (e.g. sector) of each portfolio stock
+    benchmark_weights : DataFrame | Series
+        weights of the benchmark stocks, as for portfolio_weights
+    benchmark_returns : DataFrame
+        df of daily returns of the benchmark stocks with the same index as portfolio_returns
+    benchmark_groups : Series
+        group of each benchmark stock
+
+    Returns
+    -------
+    DataFrame
+        df with two column levels (stat, group), where stat is portfolio_weight, benchmark_weight,
+        portfolio_return, benchmark_return, allocation, selection and interaction
+    """
+    groups = Index(
+        sorted(
+            set(portfolio_groups.fillna("n/a").reindex(portfolio_returns.columns))
+            | set(benchmark_groups.fillna("n/a").reindex(benchmark_returns.columns))
+        )
+    )
+    portfolio_weight, portfolio_group_return = _group_totals(
+        portfolio_weights, portfolio_returns, portfolio_groups, groups
+    )
+    benchmark_weight, benchmark_group_return = _group_totals(
+        benchmark_weights, benchmark_returns, benchmark_groups, groups
+    )
+    benchmark_total = (benchmark_weight * benchmark_group_return).sum(axis=1)[:, None]
+
+    ### groups not held have no return of their own; the benchmark return is used instead,
+    ### so that the effects of such groups are attributed to allocation only
+    benchmark_group_return = where(
+        benchmark_weight != 0, benchmark_group_return, benchmark_total
+    )
+    portfolio_group_return = where(
+        portfolio_weight != 0, portfolio_group_return, benchmark_group_return
+    )
+
+    active_weight = portfolio_weight - benchmark_weight
+    stats = {
+        "portfolio_weight": portfolio_weight,
+        "benchmark_weight": benchmark_weight,
+        "portfolio_return": portfolio_group_return,
+        "benchmark_return": benchmark_group_return,
+        "allocation": active_weight * (benchmark_group_return - benchmark_total),
+        "selection": benchmark_weight * (portfolio_group_return - benchmark_group_return),
+        "interaction": active_weight * (portfolio_group_return - benchmark_group_return),
+    }
+    return concat(
+        {
+            name: DataFrame(values, index=portfolio_returns.index, columns=groups)
+            for name, values in stats.items()
+        },
+        axis=1,
+        names=["stat", portfolio_groups.name],
+    )
+
+
+def _group_totals(weights, returns: DataFrame, stock_groups: Series, groups: Index):
+    ### one-hot matrix stocks x groups
+    group_matrix = (
+        get_dummies(stock_groups.fillna("n/a").reindex(returns.columns))
+        .reindex(columns=groups, fill_value=False)
+        .to_numpy(dtype=float)
+    )
+    return_values = returns.fillna(0).to_numpy(dtype=float)
+    if isinstance(weights, Series):
+        weight_values = weights.reindex(returns.columns).fillna(0).to_numpy(dtype=float)
+        group_weight = (weight_values @ group_matrix)[None, :].repeat(len(returns), 0)
+        contribution = return_values @ (weight_values[:, None] * group_matrix)
+    else:
+        weight_values = (
+            weights.reindex(index=returns.index, columns=returns.columns)
+            .fillna(0)
+            .to_numpy(dtype=float)
+        )
+        group_weight = weight_values @ group_matrix
+        contribution = (weight_values * return_values) @ group_matrix
+
+    with errstate(divide="ignore", invalid="ignore"):
+        group_return = where(group_weight != 0, contribution / group_weight, 0)
+    return group_weight, group_return
+
+
+## create function to link daily attribution effects over the whole period
+def link_attribution(attribution_daily: DataFrame) -> DataFrame:
+    """Function to link daily attribution effects to effects of the whole period with Carino smoothing
+
+    Each day's effects are scaled by k_t / K, with k = (ln(1 + Rp) - ln(1 + Rb)) / (Rp - Rb) per day
+    (k_t) and for the whole period (K), so that the linked effects of all groups add up to the
+    cumulative active return of the period.
+
+    Parameters
+    ----------
+    attribution_daily : DataFrame
+        df as returned by brinson_attribution
+
+    Returns
+    -------
+    DataFrame
+        df indexed by group with the average weights, the linked allocation, selection and interaction
+        effects and their total_effect
+    """
+    portfolio_total = (
+        attribution_daily["portfolio_weight"] * attribution_daily["portfolio_return"]
+    ).sum(axis=1)
+    benchmark_total = (
+        attribution_daily["benchmark_weight"] * attribution_daily["benchmark_return"]
+    ).sum(axis=1)
+    smoothing_daily = _carino_factor(portfolio_total, benchmark_total)
+    smoothing_total = _carino_factor(
+        Series(portfolio_total.add(1).prod() - 1),
+        Series(benchmark_total.add(1).prod() - 1),
+    ).item()
+    scaling = smoothing_daily / smoothing_total
+
+    attribution = DataFrame(
+        {
+            "portfolio_weight": attribution_daily["portfolio_weight"].mean(),
+            "benchmark_weight": attribution_daily["benchmark_weight"].mean(),
+        }
+        | {
+            effect: attribution_daily[effect].mul(scaling, axis=0).sum()
+            for effect in attribution_effects
+        }
+    )
+    attribution["total_effect"] = attribution[attribution_effects].sum(axis=1)
+    return attribution
+
+
+def _carino_factor(portfolio_returns: Series, benchmark_returns: Series) -> Series:
+    ### (ln(1 + Rp) - ln(1 + Rb)) / (Rp - Rb), with the limit 1 / (1 + R) for Rp == Rb
+    log_difference = log1p(portfolio_returns) - log1p(benchmark_returns)
+    difference = portfolio_returns - benchmark_returns
+    with errstate(divide="ignore", invalid="ignore"):
+        factor = log_difference / difference
+    return factor.where(difference.abs() > 1e-12, 1 / (1 + portfolio_returns))
@@ -0,0 +1,200 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from os import listdir, path
+
+from pandas import DataFrame, read_excel
+
+from ..Instrumentation import instrumentation
+from ..Sourcing.Cache import InfoCache, PriceCache
+from ..Sourcing.Provider import get_provider
+from ..Sourcing.Yahoo import fetch_company_info_many, fetch_ohlc
+from .Portfolio import PortfolioAnalysis
+
+logger = logging.getLogger(__name__)
+
+
+## create function to run the outputs of a single analysis, used by the process pool
+def run_analysis(
+    name: str,
+    analysis: PortfolioAnalysis,
+    create_xlsx: bool = True,
+    write_only: bool = False,
+) -> tuple[str, DataFrame]:
+    """Function to compute the constituents stats and Excel output of one analysis
+
+    Parameters
+    ----------
+    name : str
+        name of the portfolio, used as suffix of the Excel output
+    analysis : PortfolioAnalysis
+        analysis to run
+    create_xlsx : bool, optional
+        if True, the Excel output is created, by default True
+    write_only : bool, optional
+        passed to PortfolioAnalysis.create_xlsx_output, by default False
+
+    Returns
+    -------
+    tuple[str, DataFrame]
+        name of the portfolio and its constituents stats
+    """
+    constituents_stats = analysis.get_constituents_stats()
+    if create_xlsx:
+        analysis.create_xlsx_output(
+            f"portfolio_overview_{name}", write_only=write_only
+        )
+    return name, constituents_stats
+
+
+class PortfolioBatch:
+    def __init__(self, portfolios: dict[str, DataFrame], params={}):
+        """Class to analyse many portfolios against the same benchmark from one market data load
+
+        The OHLC data and company info of the union of all constituents and the benchmark are
+        fetched once and shared by the PortfolioAnalysis of every portfolio.
+
+        Parameters
+        ----------
+        portfolios : dict[str, DataFrame]
+            dict mapping portfolio name to a df indexed by ticker with a 'weight' column
+        params : dict, optional
+            analysis params shared by all portfolios, see PortfolioAnalyser.ipynb, by default {}
+        """
+        logger.info("initialising class PortfolioBatch")
+        self.portfolios = portfolios
+        self.params = dict(params)
+        self.params.setdefault("end_date", datetime.now().strftime("%Y-%m-%d"))
+        self.benchmark = self.params.get("benchmark", None)
+        assert self.benchmark, "benchmark missing in params"
+
+        self.tickers = list(
+            dict.fromkeys(
+                [
+                    ticker
+                    for portfolio in self.portfolios.values()
+                    for ticker in portfolio.index.unique()
+                ]
+                + [self.benchmark]
+            )
+        )
+
+        path_cache = self.params.get("path_cache", None)
+        self.provider = get_provider(self.params.get("data_provider", None))
+        self.scheduler = self.provider.create_scheduler(
+            **self.params.get("fetch_scheduler", {})
+        )
+        use_cache = path_cache and self.provider.remote
+        self.price_cache = (
+            PriceCache(path_cache, source=self.scheduler.download_ohlc)
+            if use_cache
+            else None
+        )
+        self.info_cache = (
+            InfoCache(path_cache, ttl_days=self.params.get("info_cache_ttl_days", 7))
+            if use_cache
+            else None
+        )
+
+        logger.info(
+            f"fetching data for {len(self.tickers)} tickers "
+            f"of {len(self.portfolios)} portfolios"
+        )
+        with instrumentation.stage("batch.load_data"):
+            self.market_data = fetch_ohlc(
+                self.tickers,
+                self.params.get("start_date", None),
+                self.params["end_date"],
+                cache=self.price_cache,
+                scheduler=self.scheduler,
+            )
+            self.company_info = DataFrame(
+                fetch_company_info_many(
+                    self.tickers,
+                    max_workers=self.params.get("max_workers", 8),
+                    cache=self.info_cache,
+                    scheduler=self.scheduler,
+                )
+            ).set_index("ticker")
+
+        self.analyses = {
+            name: PortfolioAnalysis(
+                portfolio,
+                self.params,
+                market_data=self.market_data,
+                company_info=self.company_info,
+            )
+            for name, portfolio in self.portfolios.items()
+        }
+
+    @classmethod
+    def from_xlsx(cls, paths: list | str, params={}) -> "PortfolioBatch":
+        """Function to create a PortfolioBatch from all sheets of one or several portfolio files
+
+        Parameters
+        ----------
+        paths : list | str
+            list of xlsx paths, or a directory whose xlsx files (except template.xlsx) are all read
+        params : dict, optional
+            analysis params shared by all portfolios, by default {}
+
+        Returns
+        -------
+        PortfolioBatch
+            batch containing one portfolio per sheet, named '<file>_<sheet>' if several files are read
+        """
+        if not isinstance(paths, list):
+            if path.isdir(paths):
+                paths = [
+                    path.join(paths, file_name)
+                    for file_name in sorted(listdir(paths))
+                    if file_name.endswith(".xlsx")
+                    and file_name != "template.xlsx"
+                    and not file_name.startswith("~$")
+                ]
+            else:
+                paths = [paths]
+
+        portfolios = {}
+        for file_path in paths:
+            file_name = path.splitext(path.basename(file_path))[0]
+            sheets = read_excel(file_path, sheet_name=None, index_col=0)
+            for sheet_name, portfolio in sheets.items():
+                name = sheet_name if len(paths) == 1 else f"{file_name}_{sheet_name}"
+                portfolios[name] = portfolio
+        return cls(portfolios, params)
+
+    @instrumentation.timed("batch.run")
+    def run(
+        self,
+        max_workers: int | None = None,
+        create_xlsx: bool = True,
+        write_only: bool = False,
+    ) -> dict[str, DataFrame]:
+        """Function to compute the stats and Excel outputs of all portfolios on a process pool
+
+        Parameters
+        ----------
+        max_workers : int | None, optional
+            number of worker processes, by default None (number of CPUs); 1 runs in the current process
+        create_xlsx : bool, optional
+            if True, an Excel output 'portfolio_overview_<name>.xlsx' is created per portfolio, by default True
+        write_only : bool, optional
+            passed to PortfolioAnalysis.create_xlsx_output, by default False
+
+        Returns
+        -------
+        dict[str, DataFrame]
+            dict mapping portfolio name to its constituents stats
+        """
+        names = list(self.analyses)
+        analyses = [self.analyses[name] for name in names]
+        options = [create_xlsx] * len(names), [write_only] * len(names)
+
+        if max_workers == 1:
+            results = map(run_analysis, names, analyses, *options)
+            return dict(results)
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(run_analysis, names, analyses, *options)
+            return dict(results)
@@ -1,11 +1,21 @@
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mticker
-from mplfinance import plot as mpl_plot
-from openpyxl import workbook
-from openpyxl.utils import get_column_letter
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.worksheet.table import Table, TableStyleInfo
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+from os import makedirs, path
+from typing import TYPE_CHECKING, Iterable
+from warnings import catch_warnings, filterwarnings
+
+from numpy import linspace
 from pandas import DataFrame, Series
+from pandas.api.types import is_datetime64_any_dtype, is_numeric_dtype
+
+from ..Instrumentation import instrumentation
+
+### matplotlib, mplfinance and openpyxl make up most of the import time of the project, so they
+### are only imported by the functions that plot or write Excel files
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
+    from matplotlib.figure import Figure
+    from openpyxl import workbook
 
 ## create dictionary for automated number formatting of excel columns by name
 mappings_number_formattings = {
@@ -14,19 +24,82 @@ mappings_number_formattings = {
     "total_return": "0.00%;-0.00%",
     "volatility": "0.00%;-0.00%",
     "beta": "0.00;-0.00",
+    "max_drawdown": "0.00%;-0.00%",
+    "max_drawdown_days": "0",
+    "var_historical": "0.00%;-0.00%",
+    "cvar_historical": "0.00%;-0.00%",
+    "var_parametric": "0.00%;-0.00%",
+    "cvar_parametric": "0.00%;-0.00%",
+    "sharpe_ratio": "0.00;-0.00",
+    "sortino_ratio": "0.00;-0.00",
+    "tracking_error": "0.00%;-0.00%",
+    "information_ratio": "0.00;-0.00",
     "date": "dd.mm.yyyy",
 }
 
 
+## create function to open the xlsx template for the output
+def load_template_workbook(
+    template_xlsx: str,
+    write_only: bool = False,
+    placeholder_sheets: tuple = ("Sheet1",),
+) -> "workbook":
+    """Function to create the output workbook from the xlsx template
+
+    Parameters
+    ----------
+    template_xlsx : str
+        path to the xlsx template
+    write_only : bool, optional
+        if True, a streaming write-only workbook is returned, into which the values and visibility of
+        the template sheets are copied (cell styles and comments of the template sheets are not), by default False
+    placeholder_sheets : tuple, optional
+        names of template sheets that are dropped from the output, by default ("Sheet1",)
+
+    Returns
+    -------
+    workbook
+        openpyxl workbook to which the output sheets can be added
+    """
+    from openpyxl import Workbook, load_workbook
+
+    if not write_only:
+        wb = load_workbook(template_xlsx)
+        for ws_name in placeholder_sheets:
+            if ws_name in wb.sheetnames:
+                del wb[ws_name]
+        return wb
+
+    wb = Workbook(write_only=True)
+    template = load_workbook(template_xlsx, read_only=True)
+    for ws_template in template.worksheets:
+        if ws_template.title in placeholder_sheets:
+            continue
+        ws = wb.create_sheet(ws_template.title)
+        ### hidden template sheets such as __FDSCACHE__ stay hidden
+        ws.sheet_state = ws_template.sheet_state
+        for row in ws_template.iter_rows(values_only=True):
+            ws.append(row)
+    template.close()
+    return wb
+
+
 ## create function to write df to xlsx worksheet, formatted as Table
+@instrumentation.timed("formatting.write_df_to_xlsx_table")
 def write_df_to_xlsx_table(
-    wb: workbook,
+    wb: "workbook",
     ws_name: str,
     df: DataFrame,
     base_formatting: str = "General",
+    sample_rows: int = 1000,
 ) -> None:
     """Function to write df to an Excel table using openpyxl
 
+    Number formats are resolved once per column (by name, and only for numeric or date
+    columns) and column widths are estimated from a sample of rows instead of every cell.
+    If wb was created with write_only=True, rows are streamed to disk as they are
+    appended, which keeps memory flat for large dfs.
+
     Parameters
     ----------
     wb : openpyxl workbook
@@ -37,70 +110,329 @@ def write_df_to_xlsx_table(
         df that should be written to Excel
     base_formatting : str, optional
         Excel number formatting applied to all columns not found in mappings_number_formattings, by default "General"
+    sample_rows : int, optional
+        maximum number of rows used to estimate the column widths, by default 1000
+    """
+    write_dfs_to_xlsx_table(wb, ws_name, [df], base_formatting, sample_rows)
+
+
+## create function to write dfs produced one after another to one xlsx table
+def write_dfs_to_xlsx_table(
+    wb: "workbook",
+    ws_name: str,
+    dfs: Iterable[DataFrame],
+    base_formatting: str = "General",
+    sample_rows: int = 1000,
+) -> None:
+    """Function to write dfs with the same columns, e.g. from a generator, to one Excel table
+
+    Number formats and column widths are taken from the first df. With a write-only wb every df
+    is streamed to disk before the next one is requested, so only one df is held in memory.
+
+    Parameters
+    ----------
+    wb : openpyxl workbook
+        oxl workbook item to which the ws should be added
+    ws_name : str
+        desired worksheet name in Excel output
+    dfs : Iterable[DataFrame]
+        dfs that should be written to Excel, one below the other
+    base_formatting : str, optional
+        Excel number formatting applied to all columns not found in mappings_number_formattings, by default "General"
+    sample_rows : int, optional
+        maximum number of rows of the first df used to estimate the column widths, by default 1000
     """
-    wb.create_sheet(ws_name)
-    ws = wb[ws_name]
-    for row in dataframe_to_rows(df.reset_index(), index=False, header=True):
-        ws.append(row)
+    from openpyxl.cell import Cell, WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+    from openpyxl.worksheet.table import Table, TableColumn, TableStyleInfo
+
+    ws = wb.create_sheet(ws_name)
+    columns, n_rows, n_cells = None, 0, 0
+    for df in dfs:
+        temp_df = df.reset_index()
+        if columns is None:
+            columns = temp_df.columns
+            column_formattings = get_column_formattings(temp_df, base_formatting)
+            column_widths = get_column_widths(temp_df, sample_rows)
+            for column_letter, column_width in column_widths.items():
+                ws.column_dimensions[column_letter].width = column_width
+            ws.freeze_panes = "B2"
+            ws.append(temp_df.columns.tolist())
+            ### rows of write-only sheets are serialised as soon as they are appended, so the
+            ### styled cells of each column can be reused for every row instead of creating one
+            ### per value; other sheets keep the appended cells and get a copy of the style
+            formatted_cells = {}
+            for column_index, number_formatting in column_formattings.items():
+                formatted_cells[column_index] = (
+                    WriteOnlyCell(ws) if wb.write_only else Cell(ws)
+                )
+                formatted_cells[column_index].number_format = number_formatting
+
+        rows = temp_df.to_numpy(dtype=object).tolist()
+        if wb.write_only:
+            for row in rows:
+                for column_index, cell in formatted_cells.items():
+                    if row[column_index] is not None:
+                        cell.value = row[column_index]
+                        row[column_index] = cell
+                ws.append(row)
+        else:
+            for row in rows:
+                for column_index, formatted_cell in formatted_cells.items():
+                    if row[column_index] is not None:
+                        cell = Cell(ws, value=row[column_index])
+                        cell._style = copy(formatted_cell._style)
+                        row[column_index] = cell
+                ws.append(row)
+        n_rows += temp_df.shape[0]
+        n_cells += temp_df.size
+    if columns is None:
+        return
+
     table = Table(
         displayName=ws_name,
-        ref="A1:" + get_column_letter(ws.max_column) + str(ws.max_row),
+        ref="A1:" + get_column_letter(len(columns)) + str(n_rows + 1),
+        tableColumns=[
+            TableColumn(id=column_index + 1, name=str(column_name))
+            for column_index, column_name in enumerate(columns)
+        ],
     )
 
     table.tableStyleInfo = TableStyleInfo(name="TableStyleLight1", showRowStripes=True)
 
-    ws.add_table(table)
+    with catch_warnings():
+        ### the table columns are set explicitly above, also in write-only mode
+        filterwarnings("ignore", "In write-only mode", UserWarning)
+        ws.add_table(table)
+    instrumentation.count("rows_written", n_rows)
+    instrumentation.count("cells_written", n_cells)
 
-    for column in ws.columns:
-        cell_width = max(len(str(cell.value)) for cell in column) * 1.33
-        ws.column_dimensions[column[0].column_letter].width = cell_width
-    ws.freeze_panes = "B2"
 
-    for column_name in df.reset_index().columns:
-        column_letter = get_column_letter(
-            df.reset_index().columns.get_loc(column_name) + 1
-        )
-        if mappings_number_formattings.get(column_name):
-            number_formatting = mappings_number_formattings.get(column_name)
+## create function to resolve the number formatting of each df column
+def get_column_formattings(df: DataFrame, base_formatting: str = "General") -> dict:
+    """Function to get the Excel number formatting of all numeric and date columns of a df
+
+    Parameters
+    ----------
+    df : DataFrame
+        df that should be written to Excel
+    base_formatting : str, optional
+        Excel number formatting applied to all columns not found in mappings_number_formattings, by default "General"
+
+    Returns
+    -------
+    dict
+        dict mapping column position to number formatting, omitting columns kept as "General"
+    """
+    column_formattings = {}
+    for column_index, (column_name, dtype) in enumerate(df.dtypes.items()):
+        if not (is_numeric_dtype(dtype) or is_datetime64_any_dtype(dtype)):
+            continue
+        number_formatting = mappings_number_formattings.get(column_name, base_formatting)
+        if number_formatting != "General":
+            column_formattings[column_index] = number_formatting
+    return column_formattings
+
+
+## create function to estimate Excel column widths from sampled values
+def get_column_widths(df: DataFrame, sample_rows: int = 1000) -> dict:
+    """Function to estimate Excel column widths from the header and a sample of rows
+
+    Text columns are measured in full, since their lengths vary too much to be sampled.
+
+    Parameters
+    ----------
+    df : DataFrame
+        df that should be written to Excel
+    sample_rows : int, optional
+        maximum number of evenly spaced rows measured per numeric or date column, by default 1000
+
+    Returns
+    -------
+    dict
+        dict mapping column letter to column width
+    """
+    from openpyxl.utils import get_column_letter
+
+    sample_positions = linspace(0, len(df) - 1, min(len(df), sample_rows)).astype(int)
+    column_widths = {}
+    for column_index, column_name in enumerate(df.columns):
+        column = df[column_name]
+        if column.dtype == object:
+            sample = column
+        elif is_datetime64_any_dtype(column.dtype):
+            ### dates are displayed through their number format, i.e. without time
+            sample = column.iloc[sample_positions].dt.strftime("%d.%m.%Y")
         else:
-            number_formatting = base_formatting
-        for cell in ws[column_letter]:
-            cell.number_format = number_formatting
+            sample = column.iloc[sample_positions]
+        lengths = [len(str(column_name))] + [len(str(value)) for value in sample]
+        column_widths[get_column_letter(column_index + 1)] = max(lengths) * 1.33
+    return column_widths
 
 
-## create function to plot line charts for stock returns / prices
-def line_plot(
+## create function to draw line charts for stock returns / prices onto given axes
+def draw_line_chart(
+    ax: "Axes",
     series: list[Series] | Series,
     title: str | None = None,
     xlabel: str | None = None,
     ylabel: str | None = None,
     format_as_pct=True,
-):
+) -> None:
     ### if series input, convert to list of series
     if isinstance(series, Series):
         series = [series]
 
-    plt.figure(figsize=(10, 5))
-
     ### plot all series
     for s in series:
-        s.plot(label=s.name)
+        s.plot(ax=ax, label=s.name)
 
-    plt.title(title)
-    plt.xlabel(xlabel)
-    plt.ylabel(ylabel)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
 
     ### base line chart params
-    plt.grid(True)
-    plt.legend()
-    plt.xticks(rotation=45)
-    plt.tight_layout()
+    ax.grid(True)
+    ax.legend()
+    ax.tick_params(axis="x", labelrotation=45)
+    ax.figure.tight_layout()
 
     if format_as_pct:
-        plt.gca().yaxis.set_major_formatter(mticker.PercentFormatter(xmax=1))
+        from matplotlib.ticker import PercentFormatter
 
+        ax.yaxis.set_major_formatter(PercentFormatter(xmax=1))
+
+
+## create function to plot line charts for stock returns / prices
+def line_plot(
+    series: list[Series] | Series,
+    title: str | None = None,
+    xlabel: str | None = None,
+    ylabel: str | None = None,
+    format_as_pct=True,
+):
+    import matplotlib.pyplot as plt
+
+    fig = plt.figure(figsize=(10, 5))
+    draw_line_chart(plt.gca(), series, title, xlabel, ylabel, format_as_pct)
     plt.show()
+    plt.close(fig)
+
+
+## create function to build line charts without pyplot, e.g. for file exports
+def line_figure(
+    series: list[Series] | Series,
+    title: str | None = None,
+    xlabel: str | None = None,
+    ylabel: str | None = None,
+    format_as_pct=True,
+) -> "Figure":
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 5))
+    draw_line_chart(fig.subplots(), series, title, xlabel, ylabel, format_as_pct)
+    return fig
+
+
+def candle_plot(df, title: str = None, mav: int = 9, **kwargs):
+    ### kwargs are passed on to mplfinance, e.g. savefig or returnfig
+    from mplfinance import plot as mpl_plot
+
+    return mpl_plot(
+        df, title=title, type="candle", style="charles", figsize=(10, 5), mav=mav, **kwargs
+    )
+
+
+## create function to render a single chart to a file, used by the process pool
+def save_chart(chart: dict, file_path: str) -> str:
+    """Function to render a chart to a file without displaying it
+
+    Parameters
+    ----------
+    chart : dict
+        chart definition with the keys 'kind' ('line' or 'candle'), 'data' and 'title'
+    file_path : str
+        path of the output file, the format is derived from its extension (e.g. png, svg, pdf)
+
+    Returns
+    -------
+    str
+        path of the output file
+    """
+    if chart["kind"] == "candle":
+        candle_plot(chart["data"], title=chart["title"], savefig=file_path, closefig=True)
+    else:
+        line_figure(chart["data"], title=chart["title"]).savefig(file_path)
+    return file_path
+
+
+def use_agg_backend() -> None:
+    """Function switching pyplot to the non-interactive Agg backend, used to initialise worker processes"""
+    import matplotlib.pyplot as plt
+
+    plt.switch_backend("Agg")
+
+
+## create function to render many charts to files on a process pool
+@instrumentation.timed("formatting.save_charts")
+def save_charts(
+    charts: list[dict],
+    path_charts: str,
+    file_format: str = "png",
+    max_workers: int | None = None,
+    pdf_report: str | None = None,
+) -> list[str]:
+    """Function to render charts to files in parallel, without displaying them
+
+    Parameters
+    ----------
+    charts : list[dict]
+        chart definitions as taken by save_chart, each with an additional 'name' key used as file name
+    path_charts : str
+        directory in which the files are created
+    file_format : str, optional
+        file format of the charts, e.g. "png", "svg" or "pdf", by default "png"
+    max_workers : int | None, optional
+        number of worker processes, by default None (number of CPUs); 1 renders in the current process
+    pdf_report : str | None, optional
+        if set, all charts are additionally collected as pages of one PDF file of this name, by default None.
+        The pages are written sequentially in the current process, as one file cannot be written concurrently.
+
+    Returns
+    -------
+    list[str]
+        paths of all created files
+    """
+    makedirs(path_charts, exist_ok=True)
+    file_paths = [
+        path.join(path_charts, f"{chart['name']}.{file_format}".replace("/", "_"))
+        for chart in charts
+    ]
+
+    if max_workers == 1:
+        created_files = list(map(save_chart, charts, file_paths))
+    else:
+        with ProcessPoolExecutor(
+            max_workers=max_workers, initializer=use_agg_backend
+        ) as executor:
+            created_files = list(executor.map(save_chart, charts, file_paths))
+
+    if pdf_report:
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_pdf import PdfPages
 
+        report_path = path.join(path_charts, pdf_report)
+        with PdfPages(report_path) as pdf:
+            for chart in charts:
+                if chart["kind"] == "candle":
+                    fig, _ = candle_plot(
+                        chart["data"], title=chart["title"], returnfig=True
+                    )
+                    pdf.savefig(fig)
+                    plt.close(fig)
+                else:
+                    pdf.savefig(line_figure(chart["data"], title=chart["title"]))
+        created_files.append(report_path)
 
-def candle_plot(df, title: str = None, mav: int = 9):
-    mpl_plot(df, title=title, type="candle", style="charles", figsize=(10, 5), mav=mav)
+    instrumentation.count("charts_written", len(created_files))
+    return created_files
@@ -0,0 +1,208 @@
+from numpy import (
+    absolute,
+    arange,
+    exp,
+    flatnonzero,
+    log1p,
+    maximum,
+    ones,
+    vstack,
+    where,
+    zeros,
+)
+from pandas import DataFrame, DatetimeIndex, Series
+
+## create dictionary mapping calendar rebalancing frequencies to pandas periods
+rebalancing_periods = {
+    "monthly": "M",
+    "quarterly": "Q",
+    "annually": "Y",
+}
+
+
+## create function to flag the days on which the portfolio is rebalanced
+def rebalancing_flags(index: DatetimeIndex, rebalancing: str = "monthly"):
+    """Function to flag calendar rebalancing days, i.e. the first day of each period
+
+    Parameters
+    ----------
+    index : DatetimeIndex
+        trading days
+    rebalancing : str, optional
+        "daily", "monthly", "quarterly" or "annually", by default "monthly"
+
+    Returns
+    -------
+    ndarray
+        boolean array, True on days on which the weights are reset to target before trading
+    """
+    if rebalancing == "daily":
+        return ones(len(index), dtype=bool)
+    if rebalancing not in rebalancing_periods:
+        raise ValueError(f"unknown rebalancing {rebalancing}")
+
+    periods = index.to_period(rebalancing_periods[rebalancing]).asi8
+    flags = ones(len(index), dtype=bool)
+    flags[1:] = periods[1:] != periods[:-1]
+    return flags
+
+
+## create function to simulate a portfolio that drifts between rebalancing days
+def simulate_rebalanced_portfolio(
+    returns: DataFrame,
+    target_weights: Series,
+    rebalancing: str = "monthly",
+    threshold: float = 0.05,
+    chunk_size: int = 252,
+) -> tuple[DataFrame, Series]:
+    """Function to compute drifting weights and portfolio returns under a rebalancing schedule
+
+    Between rebalancing days each position grows with its own returns. With calendar schedules
+    all days are computed at once from cumulative log growth, relative to the growth at the last
+    rebalancing day. Threshold rebalancing is path dependent: the drift is computed for blocks of
+    chunk_size days at once and the loop only advances per rebalancing event, not per day.
+
+    Parameters
+    ----------
+    returns : DataFrame
+        df of daily returns, one column per stock, with a DatetimeIndex
+    target_weights : Series
+        target weights indexed by stock
+    rebalancing : str, optional
+        "daily", "monthly", "quarterly", "annually" or "threshold", by default "monthly"
+    threshold : float, optional
+        for "threshold", absolute weight deviation of any stock that triggers a rebalancing, by default 0.05
+    chunk_size : int, optional
+        for "threshold", number of days evaluated at once, by default 252
+
+    Returns
+    -------
+    tuple[DataFrame, Series]
+        start-of-day weights of all stocks and daily portfolio returns
+    """
+    weights = target_weights.reindex(returns.columns).fillna(0).to_numpy(dtype=float)
+    ### log_growth[t] is the cumulative log growth up to the close of day t - 1
+    log_growth = vstack(
+        [
+            zeros((1, returns.shape[1])),
+            log1p(returns.fillna(0).to_numpy(dtype=float)).cumsum(axis=0),
+        ]
+    )
+
+    if rebalancing == "threshold":
+        flags = threshold_rebalancing_flags(log_growth, weights, threshold, chunk_size)
+    else:
+        flags = rebalancing_flags(returns.index, rebalancing)
+
+    last_rebalancing = maximum.accumulate(where(flags, arange(len(flags)), 0))
+    base = log_growth[last_rebalancing]
+    start_values = weights * exp(log_growth[:-1] - base)
+    end_values = weights * exp(log_growth[1:] - base)
+    start_total = start_values.sum(axis=1)
+
+    drifting_weights = DataFrame(
+        start_values / start_total[:, None], index=returns.index, columns=returns.columns
+    )
+    portfolio_returns = Series(
+        end_values.sum(axis=1) / start_total - 1,
+        index=returns.index,
+        name="portfolio_return",
+    )
+    return drifting_weights, portfolio_returns
+
+
+def threshold_rebalancing_flags(
+    log_growth, weights, threshold: float, chunk_size: int = 252
+):
+    """Function to flag the days on which any weight has drifted further than threshold from target
+
+    Parameters
+    ----------
+    log_growth : ndarray
+        cumulative log growth, with a leading row of zeros, as computed in simulate_rebalanced_portfolio
+    weights : ndarray
+        target weights
+    threshold : float
+        absolute weight deviation of any stock that triggers a rebalancing
+    chunk_size : int, optional
+        number of days evaluated at once, by default 252
+
+    Returns
+    -------
+    ndarray
+        boolean array, True on days on which the weights are reset to target before trading
+    """
+    n_days = log_growth.shape[0] - 1
+    flags = zeros(n_days, dtype=bool)
+    flags[0] = True
+    last_rebalancing, scan_start = 0, 1
+    while scan_start < n_days:
+        scan_end = min(scan_start + chunk_size, n_days)
+        values = weights * exp(
+            log_growth[scan_start:scan_end] - log_growth[last_rebalancing]
+        )
+        drifted = values / values.sum(axis=1, keepdims=True)
+        breaches = flatnonzero((absolute(drifted - weights) > threshold).any(axis=1))
+        if breaches.size:
+            last_rebalancing = scan_start + breaches[0]
+            flags[last_rebalancing] = True
+            scan_start = last_rebalancing + 1
+        else:
+            scan_start = scan_end
+    return flags
+
+
+## create function to simulate a portfolio from a dated transactions table
+def simulate_transactions(
+    prices: DataFrame, transactions: DataFrame
+) -> tuple[DataFrame, Series]:
+    """Function to compute weights and portfolio returns from dated trades
+
+    Trades are executed at the close of their date (or of the next trading day), so they affect
+    the returns from the following day onwards. Positions are the cumulative sums of the traded
+    quantities, which have to be expressed in units consistent with the (adjusted) prices.
+
+    Parameters
+    ----------
+    prices : DataFrame
+        df of daily (adjusted) close prices, one column per stock, with a DatetimeIndex
+    transactions : DataFrame
+        df with the columns 'date', 'ticker' and 'quantity' (negative for sales); trades before
+        the first day are executed at its close
+
+    Returns
+    -------
+    tuple[DataFrame, Series]
+        start-of-day weights of all stocks and daily portfolio returns
+    """
+    prices = prices.ffill()
+    ### trades on non-trading days are executed on the next trading day, later ones are ignored
+    trade_positions = prices.index.searchsorted(DatetimeIndex(transactions["date"]))
+    executed = trade_positions < len(prices)
+    trades = (
+        transactions[executed]
+        .assign(date=prices.index[trade_positions[executed]])
+        .pivot_table(index="date", columns="ticker", values="quantity", aggfunc="sum")
+        .reindex(index=prices.index, columns=prices.columns, fill_value=0)
+        .fillna(0)
+    )
+
+    ### positions held over day t are the ones at the close of day t - 1
+    positions = trades.cumsum().shift(1, fill_value=0).to_numpy(dtype=float)
+    price_values = prices.fillna(0).to_numpy(dtype=float)
+    start_values = positions * vstack([price_values[:1], price_values[:-1]])
+    end_values = positions * price_values
+    start_total = start_values.sum(axis=1)
+
+    safe_total = where(start_total != 0, start_total, 1)
+    weights = DataFrame(
+        where(start_total[:, None] != 0, start_values / safe_total[:, None], 0),
+        index=prices.index,
+        columns=prices.columns,
+    )
+    portfolio_returns = Series(
+        where(start_total != 0, end_values.sum(axis=1) / safe_total - 1, 0),
+        index=prices.index,
+        name="portfolio_return",
+    )
+    return weights, portfolio_returns
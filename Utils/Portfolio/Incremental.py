@@ -0,0 +1,123 @@
+from numpy import errstate, isnan, nan, ones, sqrt, where, zeros
+from pandas import DataFrame, Series, concat
+
+
+## create function to extend cumulative returns by new daily returns
+def append_cumulative(
+    cumulative: DataFrame | Series, returns: DataFrame | Series
+) -> DataFrame | Series:
+    """Function to append the cumulative returns of new days without recomputing the history
+
+    Parameters
+    ----------
+    cumulative : DataFrame | Series
+        cumulative returns up to the day before the first new day
+    returns : DataFrame | Series
+        daily returns of the new days, with the columns of cumulative
+
+    Returns
+    -------
+    DataFrame | Series
+        cumulative returns of all days, as cumprod(1 + returns) - 1 of the whole history
+    """
+    last = cumulative.iloc[-1]
+    ### missing returns are skipped by cumprod, so the last valid value carries the growth
+    if isinstance(last, Series) and last.isna().any():
+        last = cumulative.ffill().iloc[-1]
+    growth = 1 + (last.fillna(0) if isinstance(last, Series) else last)
+    return concat([cumulative, (1 + returns).cumprod() * growth - 1])
+
+
+class IncrementalStats:
+    """Running per-constituent aggregates of daily returns, which new days can be added to
+
+    Holds the growth, the count, mean and sum of squared deviations of the non-zero returns (for
+    the annualised volatility) and the sums of benchmark x constituent and benchmark^2 products
+    (for the beta) of every constituent. Adding days costs O(new days x constituents), and the
+    stats equal those of Stats.annualised_volatilities and Stats.betas over the whole history.
+
+    Parameters
+    ----------
+    tickers : list
+        tickers of the constituents
+    annual_trading_days : int, optional
+        number of assumed annual trading days, by default 252
+    """
+
+    def __init__(self, tickers: list, annual_trading_days: int = 252):
+        self.tickers = list(tickers)
+        self.annual_trading_days = annual_trading_days
+        self.observations = zeros(len(self.tickers))
+        self.growth = ones(len(self.tickers))
+        self.benchmark_growth = 1.0
+        self.count = zeros(len(self.tickers))
+        self.mean = zeros(len(self.tickers))
+        self.squared_deviations = zeros(len(self.tickers))
+        self.benchmark_products = zeros(len(self.tickers))
+        self.benchmark_squares = zeros(len(self.tickers))
+
+    def update(self, returns: DataFrame, benchmark_returns: Series) -> None:
+        """Function to add days of returns to the aggregates
+
+        Parameters
+        ----------
+        returns : DataFrame
+            df of daily constituent returns of the new days
+        benchmark_returns : Series
+            daily benchmark returns of the new days
+        """
+        values = returns.reindex(columns=self.tickers).to_numpy(dtype=float)
+        observed = ~isnan(values)
+        self.observations += observed.sum(axis=0)
+        self.growth *= where(observed, 1 + values, 1).prod(axis=0)
+        self.benchmark_growth *= (1 + benchmark_returns).prod()
+
+        ### volatility ignores zero returns; the batch moments are merged with the running ones
+        valid = observed & (values != 0)
+        batch_count = valid.sum(axis=0)
+        with errstate(divide="ignore", invalid="ignore"):
+            batch_mean = where(valid, values, 0).sum(axis=0) / batch_count
+            batch_squared_deviations = (
+                where(valid, values - batch_mean, 0) ** 2
+            ).sum(axis=0)
+            count = self.count + batch_count
+            delta = where(batch_count > 0, batch_mean - self.mean, 0)
+            self.mean = where(count > 0, self.mean + delta * batch_count / count, 0)
+            self.squared_deviations = where(
+                count > 0,
+                self.squared_deviations
+                + where(batch_count > 0, batch_squared_deviations, 0)
+                + delta**2 * self.count * batch_count / count,
+                0,
+            )
+        self.count = count
+
+        x_values = benchmark_returns.reindex(returns.index).to_numpy(dtype=float)[:, None]
+        paired = observed & ~isnan(x_values)
+        self.benchmark_products += where(paired, x_values * values, 0).sum(axis=0)
+        self.benchmark_squares += where(paired, x_values**2, 0).sum(axis=0)
+
+    def get_stats(self) -> DataFrame:
+        """Function to get the stats of all constituents from the aggregates
+
+        Returns
+        -------
+        DataFrame
+            df indexed by ticker with the columns total_return, relative_return,
+            volatility_annualised and beta
+        """
+        total_return = where(self.observations > 0, self.growth - 1, nan)
+        with errstate(divide="ignore", invalid="ignore"):
+            variance = where(
+                self.count > 1, self.squared_deviations / (self.count - 1), nan
+            )
+            beta = self.benchmark_products / self.benchmark_squares
+        return DataFrame(
+            {
+                "total_return": total_return,
+                "relative_return": (1 + total_return) / self.benchmark_growth - 1,
+                "volatility_annualised": sqrt(variance) * sqrt(self.annual_trading_days),
+                "beta": beta,
+            },
+            index=self.tickers,
+        )
@@ -0,0 +1,74 @@
+from functools import wraps
+from typing import Callable
+
+
+class _Identity:
+    """Wrapper comparing equal only to a wrapper of the very same object"""
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, _Identity) and self.obj is other.obj
+
+
+## create dictionary of fingerprints for the inputs derived series can depend on
+dependency_fingerprints = {
+    "weights": lambda pa: tuple(pa.df_portfolio["weight"].items()),
+    "dates": lambda pa: (pa.start_date, pa.end_date, _Identity(pa.date_range)),
+    "benchmark": lambda pa: pa.benchmark,
+    "rebalancing": lambda pa: (pa.rebalancing, pa.rebalancing_threshold),
+    "constituent_returns": lambda pa: _Identity(pa.constituent_returns),
+    "benchmark_returns": lambda pa: _Identity(pa.benchmark_returns),
+    "var_confidence": lambda pa: pa.var_confidence,
+    "risk_free_rate": lambda pa: pa.risk_free_rate,
+}
+
+
+## create decorator to memoize derived series of PortfolioAnalysis
+def derived(*dependencies: str) -> Callable:
+    """Decorator memoizing a getter of PortfolioAnalysis until one of its dependencies changes
+
+    The fingerprints of the listed dependencies are compared on every call and the
+    getter is only re-run if one of them differs from the last call. Returns frames
+    are compared by identity, so they have to be re-assigned rather than modified in
+    place. The cached object is returned as is and should not be modified by callers.
+
+    Parameters
+    ----------
+    dependencies : str
+        names of the dependencies, i.e. keys of dependency_fingerprints
+    """
+
+    def decorator(method: Callable) -> Callable:
+        @wraps(method)
+        def wrapper(self):
+            key = tuple(dependency_fingerprints[d](self) for d in dependencies)
+            derived_cache = self.__dict__.setdefault("_derived_cache", {})
+            cached = derived_cache.get(method.__name__)
+            if cached is None or cached[0] != key:
+                cached = (key, method(self))
+                derived_cache[method.__name__] = cached
+            return cached[1]
+
+        wrapper.dependencies = dependencies
+        return wrapper
+
+    return decorator
+
+
+## create function to store a result computed outside of a derived getter, e.g. incrementally
+def set_derived(pa, getter: Callable, value) -> None:
+    """Function to store value as the memoized result of a derived getter for the current inputs
+
+    Parameters
+    ----------
+    pa : PortfolioAnalysis
+        analysis whose cache is updated
+    getter : Callable
+        getter decorated with derived, e.g. PortfolioAnalysis.get_constituents_stats
+    value
+        result the getter would return for the current inputs
+    """
+    key = tuple(dependency_fingerprints[d](pa) for d in getter.dependencies)
+    pa.__dict__.setdefault("_derived_cache", {})[getter.__name__] = (key, value)
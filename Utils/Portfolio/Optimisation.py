@@ -0,0 +1,545 @@
+import logging
+
+from numpy import (
+    abs as np_abs,
+    clip,
+    concatenate,
+    diag,
+    empty,
+    eye,
+    full,
+    inf,
+    ix_,
+    ndarray,
+    sqrt,
+    trace,
+    where,
+    zeros,
+)
+from numpy.linalg import LinAlgError, eigvalsh, norm, solve
+from pandas import DataFrame, Series
+
+from ..Instrumentation import instrumentation
+
+logger = logging.getLogger(__name__)
+
+## create list of the objectives of optimal_weights
+OBJECTIVES = ["min_variance", "max_sharpe", "risk_parity", "tracking_error"]
+
+
+## create function to estimate the optimal shrinkage intensity of a covariance matrix
+def ledoit_wolf_shrinkage(returns: DataFrame) -> float:
+    """Function to estimate the Ledoit-Wolf shrinkage intensity towards a scaled identity matrix
+
+    The sample covariance of many stocks over few days is noisy and close to singular, which
+    optimisers turn into extreme weights. Ledoit and Wolf (2004) estimate the intensity that
+    minimises the expected distance of (1 - intensity) * sample + intensity * mean variance * I
+    to the true covariance.
+
+    Parameters
+    ----------
+    returns : DataFrame
+        df of daily returns, one column per stock, without missing values
+
+    Returns
+    -------
+    float
+        shrinkage intensity between 0 and 1
+    """
+    values = returns.to_numpy(dtype=float)
+    values = values - values.mean(axis=0)
+    n_days, n_stocks = values.shape
+    covariance = values.T @ values / n_days
+    target = trace(covariance) / n_stocks
+
+    ### distance of the sample covariance to the target, and the variance of its entries
+    distance = ((covariance - target * eye(n_stocks)) ** 2).sum() / n_stocks
+    squares = values**2
+    variance = (
+        (squares.T @ squares).sum() / n_days - (covariance**2).sum()
+    ) / (n_days * n_stocks)
+    if distance == 0:
+        return 0.0
+    return float(min(variance, distance) / distance)
+
+
+## create function to shrink a covariance matrix towards a scaled identity matrix
+def shrink_covariance(covariance: DataFrame, shrinkage: float) -> DataFrame:
+    """Function to shrink a covariance matrix towards its mean variance times the identity matrix
+
+    Parameters
+    ----------
+    covariance : DataFrame
+        covariance matrix
+    shrinkage : float
+        shrinkage intensity between 0 (sample covariance) and 1 (scaled identity), e.g. from
+        ledoit_wolf_shrinkage
+
+    Returns
+    -------
+    DataFrame
+        shrunk covariance matrix with the index and columns of covariance
+    """
+    values = covariance.to_numpy(dtype=float)
+    target = trace(values) / len(values)
+    shrunk = (1 - shrinkage) * values + shrinkage * target * eye(len(values))
+    return DataFrame(shrunk, index=covariance.index, columns=covariance.columns)
+
+
+## create function to get the minimum variance weights
+@instrumentation.timed("optimisation.min_variance_weights")
+def min_variance_weights(
+    covariance: DataFrame, min_weight: float = 0.0, max_weight: float = 1.0
+) -> Series:
+    """Function to get the fully invested weights with the lowest variance
+
+    Parameters
+    ----------
+    covariance : DataFrame
+        covariance matrix of the stock returns
+    min_weight : float, optional
+        lowest weight of a stock, negative values allow short positions, by default 0.0
+    max_weight : float, optional
+        highest weight of a stock, by default 1.0
+
+    Returns
+    -------
+    Series
+        weights indexed by stock, summing to 1
+    """
+    values = covariance.to_numpy(dtype=float)
+    weights = _solve_qp(values, zeros(len(values)), min_weight, max_weight)
+    return Series(weights, index=covariance.index, name="weight")
+
+
+## create function to get the maximum Sharpe ratio weights
+@instrumentation.timed("optimisation.max_sharpe_weights")
+def max_sharpe_weights(
+    covariance: DataFrame,
+    expected_returns: Series,
+    risk_free_rate: float = 0.0,
+    min_weight: float = 0.0,
+    max_weight: float = 1.0,
+) -> Series:
+    """Function to get the fully invested weights with the highest Sharpe ratio
+
+    The weights with the highest Sharpe ratio lie on the efficient frontier, i.e. minimise
+    variance / 2 - risk tolerance * expected excess return for some risk tolerance. The Sharpe
+    ratio is unimodal along the frontier, so the risk tolerance is narrowed down by golden-section
+    search, with every frontier portfolio solved starting from the closest one already solved.
+    Between two risk tolerances with the same weights at their bounds the weights are linear in
+    the risk tolerance, which gives the maximum of the Sharpe ratio in closed form.
+
+    Parameters
+    ----------
+    covariance : DataFrame
+        covariance matrix of the stock returns
+    expected_returns : Series
+        expected stock returns per period of the covariance
+    risk_free_rate : float, optional
+        risk free rate per period of the covariance, by default 0.0
+    min_weight : float, optional
+        lowest weight of a stock, negative values allow short positions, by default 0.0
+    max_weight : float, optional
+        highest weight of a stock, by default 1.0
+
+    Returns
+    -------
+    Series
+        weights indexed by stock, summing to 1
+    """
+    values = covariance.to_numpy(dtype=float)
+    excess_returns = expected_returns.reindex(covariance.index).to_numpy(dtype=float)
+    excess_returns = excess_returns - risk_free_rate
+    lipschitz = eigvalsh(values)[-1]
+    solutions = {
+        0.0: _solve_qp(
+            values, zeros(len(values)), min_weight, max_weight, lipschitz=lipschitz
+        )
+    }
+
+    def frontier_sharpe(risk_tolerance: float) -> float:
+        if risk_tolerance not in solutions:
+            closest = min(solutions, key=lambda solved: abs(solved - risk_tolerance))
+            solutions[risk_tolerance] = _solve_qp(
+                values,
+                risk_tolerance * excess_returns,
+                min_weight,
+                max_weight,
+                start=solutions[closest],
+                lipschitz=lipschitz,
+            )
+        weights = solutions[risk_tolerance]
+        return excess_returns @ weights / sqrt(weights @ values @ weights)
+
+    ### the risk tolerance is doubled until the Sharpe ratio stops rising, which brackets its maximum
+    lower, upper = 0.0, _initial_risk_tolerance(values, excess_returns)
+    while frontier_sharpe(2 * upper) > frontier_sharpe(upper) and upper < 1e12:
+        lower, upper = upper, 2 * upper
+    left, right = _golden_section(frontier_sharpe, lower, 2 * upper)
+
+    ### the maximum of (p + q t) / sqrt(a + 2 b t + c t^2) on the segment through left and right
+    intercept, slope = _frontier_segment(solutions[left], left, solutions[right], right)
+    p, q = excess_returns @ intercept, excess_returns @ slope
+    a, b, c = (
+        intercept @ values @ intercept,
+        intercept @ values @ slope,
+        slope @ values @ slope,
+    )
+    candidates = [left, right]
+    if q * b != p * c and (p * b - q * a) / (q * b - p * c) >= 0:
+        candidates.append((p * b - q * a) / (q * b - p * c))
+    best = max(candidates, key=frontier_sharpe)
+    return Series(solutions[best], index=covariance.index, name="weight")
+
+
+## create function to get the risk parity weights
+@instrumentation.timed("optimisation.risk_parity_weights")
+def risk_parity_weights(
+    covariance: DataFrame,
+    risk_budgets: Series | None = None,
+    tolerance: float = 1e-10,
+    max_iterations: int = 100,
+) -> Series:
+    """Function to get the long-only weights whose risk contributions match the risk budgets
+
+    The risk contribution of a stock is its weight times its marginal contribution to the
+    portfolio volatility. The weights are the normalised minimum of y' cov y / 2 - budgets' log(y),
+    which is convex and found with a few damped Newton steps.
+
+    Parameters
+    ----------
+    covariance : DataFrame
+        covariance matrix of the stock returns
+    risk_budgets : Series | None, optional
+        share of the portfolio risk of every stock, by default None (equal risk contributions)
+    tolerance : float, optional
+        maximum deviation of a risk contribution share from its budget, by default 1e-10
+    max_iterations : int, optional
+        maximum number of Newton steps, by default 100
+
+    Returns
+    -------
+    Series
+        weights indexed by stock, summing to 1
+    """
+    values = covariance.to_numpy(dtype=float)
+    if risk_budgets is None:
+        budgets = full(len(values), 1 / len(values))
+    else:
+        budgets = risk_budgets.reindex(covariance.index).to_numpy(dtype=float)
+        budgets = budgets / budgets.sum()
+
+    weights = budgets / sqrt(diag(values))
+    for _ in range(max_iterations):
+        marginal_risks = values @ weights
+        contributions = weights * marginal_risks
+        if np_abs(contributions / contributions.sum() - budgets).max() < tolerance:
+            break
+        gradient = marginal_risks - budgets / weights
+        step = solve(values + diag(budgets / weights**2), gradient)
+        ### the step is halved until all weights stay positive
+        scale = 1.0
+        while (weights - scale * step <= 0).any():
+            scale /= 2
+        weights = weights - scale * step
+    return Series(weights / weights.sum(), index=covariance.index, name="weight")
+
+
+## create function to get the weights with the highest expected return within a tracking error budget
+@instrumentation.timed("optimisation.tracking_error_weights")
+def tracking_error_weights(
+    covariance: DataFrame,
+    benchmark_covariances: Series,
+    benchmark_variance: float,
+    expected_returns: Series,
+    max_tracking_error: float,
+    min_weight: float = 0.0,
+    max_weight: float = 1.0,
+    annual_trading_days: int = 252,
+) -> Series:
+    """Function to get the fully invested weights with the highest expected return whose tracking error stays within a budget
+
+    The squared tracking error of weights w vs. the benchmark is w' cov w - 2 w' benchmark_covariances
+    + benchmark_variance, so the optimal weights minimise squared tracking error / 2 - risk
+    tolerance * expected return for the largest risk tolerance whose tracking error is within
+    the budget. The risk tolerance is narrowed down by bisection; between two risk tolerances with
+    the same weights at their bounds the squared tracking error is quadratic in the risk
+    tolerance, which gives the risk tolerance exhausting the budget in closed form. If even the
+    weights tracking the benchmark most closely exceed the budget, those are returned.
+
+    Parameters
+    ----------
+    covariance : DataFrame
+        covariance matrix of the daily stock returns
+    benchmark_covariances : Series
+        covariances of the daily stock returns with the daily benchmark returns
+    benchmark_variance : float
+        variance of the daily benchmark returns
+    expected_returns : Series
+        expected daily stock returns
+    max_tracking_error : float
+        highest annualised tracking error, e.g. 0.05
+    min_weight : float, optional
+        lowest weight of a stock, negative values allow short positions, by default 0.0
+    max_weight : float, optional
+        highest weight of a stock, by default 1.0
+    annual_trading_days : int, optional
+        number of assumed annual trading days, by default 252
+
+    Returns
+    -------
+    Series
+        weights indexed by stock, summing to 1
+    """
+    values = covariance.to_numpy(dtype=float)
+    covariances = benchmark_covariances.reindex(covariance.index).to_numpy(dtype=float)
+    returns = expected_returns.reindex(covariance.index).to_numpy(dtype=float)
+    lipschitz = eigvalsh(values)[-1]
+
+    def solve_for(risk_tolerance: float, start: ndarray | None = None) -> ndarray:
+        return _solve_qp(
+            values,
+            covariances + risk_tolerance * returns,
+            min_weight,
+            max_weight,
+            start=start,
+            lipschitz=lipschitz,
+        )
+
+    def tracking_error(weights: ndarray) -> float:
+        variance = weights @ values @ weights - 2 * weights @ covariances
+        return sqrt(max(variance + benchmark_variance, 0) * annual_trading_days)
+
+    weights = solve_for(0.0)
+    if tracking_error(weights) > max_tracking_error:
+        logger.warning(
+            f"the lowest tracking error is {tracking_error(weights):.2%}, above the "
+            f"budget of {max_tracking_error:.2%}"
+        )
+        return Series(weights, index=covariance.index, name="weight")
+
+    ### the risk tolerance is doubled until the budget is exceeded or the weights stop changing
+    lower, upper = 0.0, _initial_risk_tolerance(values, returns)
+    lower_weights, upper_weights = weights, solve_for(upper, weights)
+    while tracking_error(upper_weights) <= max_tracking_error:
+        if norm(upper_weights - lower_weights) < 1e-12 or upper > 1e12:
+            return Series(upper_weights, index=covariance.index, name="weight")
+        lower, lower_weights = upper, upper_weights
+        upper *= 2
+        upper_weights = solve_for(upper, lower_weights)
+
+    while upper - lower > 1e-4 * upper:
+        middle = (lower + upper) / 2
+        middle_weights = solve_for(middle, lower_weights)
+        if tracking_error(middle_weights) <= max_tracking_error:
+            lower, lower_weights = middle, middle_weights
+        else:
+            upper, upper_weights = middle, middle_weights
+
+    ### the root of a t^2 + 2 b t + c = budget^2 on the segment through lower and upper
+    intercept, slope = _frontier_segment(lower_weights, lower, upper_weights, upper)
+    a = slope @ values @ slope
+    b = intercept @ values @ slope - slope @ covariances
+    c = (
+        intercept @ values @ intercept
+        - 2 * intercept @ covariances
+        + benchmark_variance
+        - max_tracking_error**2 / annual_trading_days
+    )
+    if a > 0 and b**2 >= a * c:
+        weights = solve_for((sqrt(b**2 - a * c) - b) / a, lower_weights)
+        if tracking_error(weights) <= max_tracking_error * (1 + 1e-9):
+            lower_weights = weights
+    return Series(lower_weights, index=covariance.index, name="weight")
+
+
+def _initial_risk_tolerance(quadratic: ndarray, returns: ndarray) -> float:
+    ### risk tolerance at which the expected returns weigh about as much as the variances
+    return trace(quadratic) / len(quadratic) / max(np_abs(returns).max(), 1e-12)
+
+
+def _golden_section(
+    function, lower: float, upper: float, tolerance: float = 1e-4
+) -> tuple[float, float]:
+    ### narrows down the maximum of a unimodal function to two points a tolerance share of the
+    ### initial interval apart
+    ratio, width = (sqrt(5) - 1) / 2, tolerance * (upper - lower)
+    left, right = upper - ratio * (upper - lower), lower + ratio * (upper - lower)
+    left_value, right_value = function(left), function(right)
+    while upper - lower > width:
+        if left_value < right_value:
+            lower, left, left_value = left, right, right_value
+            right = lower + ratio * (upper - lower)
+            right_value = function(right)
+        else:
+            upper, right, right_value = right, left, left_value
+            left = upper - ratio * (upper - lower)
+            left_value = function(left)
+    return left, right
+
+
+def _frontier_segment(
+    weights: ndarray,
+    risk_tolerance: float,
+    other_weights: ndarray,
+    other_risk_tolerance: float,
+) -> tuple[ndarray, ndarray]:
+    ### intercept and slope of the weights as linear function of the risk tolerance, exact if
+    ### both solutions have the same weights at their bounds
+    slope = (other_weights - weights) / (other_risk_tolerance - risk_tolerance)
+    return weights - risk_tolerance * slope, slope
+
+
+def _solve_qp(
+    quadratic: ndarray,
+    linear: ndarray,
+    min_weight: float,
+    max_weight: float,
+    start: ndarray | None = None,
+    lipschitz: float | None = None,
+) -> ndarray:
+    ### minimises w' quadratic w / 2 - linear' w over fully invested weights within the bounds:
+    ### the start (or a few hundred projected gradient steps) tells which weights sit at a bound,
+    ### then active set steps solve for the other weights exactly
+    n_stocks = len(linear)
+    assert n_stocks * min_weight <= 1 <= n_stocks * max_weight, (
+        f"weights between {min_weight} and {max_weight} cannot sum to 1 "
+        f"for {n_stocks} stocks"
+    )
+    if start is not None:
+        weights = _solve_active_set(quadratic, linear, min_weight, max_weight, start)
+        if weights is not None:
+            return weights
+    else:
+        start = full(n_stocks, 1 / n_stocks)
+    if lipschitz is None:
+        lipschitz = eigvalsh(quadratic)[-1]
+
+    weights = _projected_gradient(
+        quadratic, linear, min_weight, max_weight, start, lipschitz, 1e-6, 500
+    )
+    polished = _solve_active_set(quadratic, linear, min_weight, max_weight, weights)
+    if polished is not None:
+        return polished
+    ### the active set steps may cycle on degenerate problems, which the gradient steps do not
+    return _projected_gradient(
+        quadratic, linear, min_weight, max_weight, weights, lipschitz, 1e-12, 50_000
+    )
+
+
+def _solve_active_set(
+    quadratic: ndarray,
+    linear: ndarray,
+    lower: float,
+    upper: float,
+    weights: ndarray,
+    max_iterations: int = 50,
+    threshold: float = 1e-12,
+) -> ndarray | None:
+    ### primal-dual active set method: the weights at a bound are fixed, the free weights and the
+    ### multiplier of the budget solve the linear optimality conditions, and the weights whose
+    ### multiplier or value violates them swap sets; returns None if the sets do not settle
+    scale = diag(quadratic).mean()
+    at_lower = weights <= lower + threshold
+    at_upper = ~at_lower & (weights >= upper - threshold)
+    for _ in range(max_iterations):
+        free = ~(at_lower | at_upper)
+        n_free = free.sum()
+        weights = where(at_upper, upper, lower).astype(float)
+        if not n_free:
+            ### all weights at a bound are optimal if they are fully invested and some budget
+            ### multiplier lies between the gradients of the weights at the two bounds
+            gradient = quadratic @ weights - linear
+            if abs(weights.sum() - 1) < threshold and gradient[at_upper].max(
+                initial=-inf
+            ) <= gradient[at_lower].min(initial=inf):
+                return weights
+            return None
+        system = empty((n_free + 1, n_free + 1))
+        system[:n_free, :n_free] = quadratic[ix_(free, free)]
+        system[:n_free, n_free] = -1
+        system[n_free, :n_free] = 1
+        system[n_free, n_free] = 0
+        targets = concatenate(
+            [
+                linear[free] - quadratic[ix_(free, ~free)] @ weights[~free],
+                [1 - weights[~free].sum()],
+            ]
+        )
+        try:
+            solution = solve(system, targets)
+        except LinAlgError:
+            return None
+        weights[free] = solution[:-1]
+
+        multipliers = quadratic @ weights - linear - solution[-1]
+        shifted = weights - multipliers / scale
+        new_lower = shifted <= lower + threshold
+        new_upper = ~new_lower & (shifted >= upper - threshold)
+        if (new_lower == at_lower).all() and (new_upper == at_upper).all():
+            return weights
+        at_lower, at_upper = new_lower, new_upper
+    return None
+
+
+def _projected_gradient(
+    quadratic: ndarray,
+    linear: ndarray,
+    lower: float,
+    upper: float,
+    start: ndarray,
+    lipschitz: float,
+    tolerance: float,
+    max_iterations: int,
+) -> ndarray:
+    ### accelerated projected gradient descent (FISTA with adaptive restart)
+    step = 1 / max(lipschitz, 1e-300)
+    weights = _project_capped_simplex(start, lower, upper)
+    momentum, extrapolated = 1.0, weights
+    for _ in range(max_iterations):
+        gradient = quadratic @ extrapolated - linear
+        new_weights = _project_capped_simplex(
+            extrapolated - step * gradient, lower, upper
+        )
+        change = new_weights - weights
+        if norm(change) < tolerance:
+            return new_weights
+        ### momentum is reset as soon as it points uphill
+        if (extrapolated - new_weights) @ change > 0:
+            momentum = 1.0
+        new_momentum = (1 + sqrt(1 + 4 * momentum**2)) / 2
+        extrapolated = new_weights + (momentum - 1) / new_momentum * change
+        weights, momentum = new_weights, new_momentum
+    return weights
+
+
+def _project_capped_simplex(values: ndarray, lower: float, upper: float) -> ndarray:
+    ### closest point with entries in [lower, upper] summing to 1: clip(values - shift, lower, upper)
+    ### for the shift where the sum, a piecewise linear decreasing function, crosses 1
+    n_values = len(values)
+    sorted_values = values.copy()
+    sorted_values.sort()
+    cumulative = concatenate([[0.0], sorted_values.cumsum()])
+    shifts = concatenate([sorted_values - upper, sorted_values - lower])
+    shifts.sort()
+
+    n_below = sorted_values.searchsorted(shifts + lower, side="right")
+    n_above = n_values - sorted_values.searchsorted(shifts + upper, side="left")
+    n_between = n_values - n_below - n_above
+    sums = (
+        lower * n_below
+        + upper * n_above
+        + cumulative[n_values - n_above]
+        - cumulative[n_below]
+        - shifts * n_between
+    )
+    ### sums decrease with the shift; the crossing lies between two consecutive breakpoints
+    position = min(max((sums >= 1).sum(), 1), len(shifts) - 1)
+    left, right = shifts[position - 1], shifts[position]
+    left_sum, right_sum = sums[position - 1], sums[position]
+    if left_sum == right_sum:
+        shift = left
+    else:
+        shift = left + (left_sum - 1) / (left_sum - right_sum) * (right - left)
+    return clip(values - shift, lower, upper)
@@ -1,20 +1,97 @@
+import logging
 from datetime import datetime
+from functools import cached_property
 from os import path
+from typing import TYPE_CHECKING
 
-from matplotlib.pyplot import plot
 from numpy import cumprod
-from openpyxl import load_workbook
-from pandas import DataFrame, Series, concat, date_range
+from pandas import (
+    DataFrame,
+    DateOffset,
+    DatetimeIndex,
+    Index,
+    Series,
+    concat,
+    date_range,
+    read_excel,
+)
 
-from ..Sourcing.Yahoo import fetch_company_info, fetch_ohlc, fetch_returns
-from .Formatting import candle_plot, line_plot, write_df_to_xlsx_table
-from .Stats import annualised_volatility, beta
+from ..Instrumentation import instrumentation
+from ..Sourcing.Cache import InfoCache, PriceCache
+from ..Sourcing.Provider import get_provider
+from ..Sourcing.Yahoo import fetch_company_info_many, fetch_ohlc, returns_from_ohlc
+from .Attribution import brinson_attribution, link_attribution
+from .Formatting import (
+    candle_plot,
+    line_plot,
+    load_template_workbook,
+    save_charts,
+    write_df_to_xlsx_table,
+    write_dfs_to_xlsx_table,
+)
+from .Holdings import simulate_rebalanced_portfolio, simulate_transactions
+from .Incremental import IncrementalStats, append_cumulative
+from .Memo import derived, set_derived
+from .Optimisation import (
+    OBJECTIVES,
+    ledoit_wolf_shrinkage,
+    max_sharpe_weights,
+    min_variance_weights,
+    risk_parity_weights,
+    shrink_covariance,
+    tracking_error_weights,
+)
+from .Risk import risk_stats
+from .Scenarios import run_sweep, weights_grid
+from .Simulation import simulate_outcomes, summarise_outcomes
+from .Snapshot import json_serialisable, read_snapshot, write_snapshot
+from .Stats import annualised_volatilities, betas, covariances, rolling_stats
+from .Streaming import (
+    CsvBlockWriter,
+    RunningStats,
+    block_size_for_budget,
+    iter_column_blocks,
+    returns_to_long,
+)
+
+if TYPE_CHECKING:
+    from matplotlib.pyplot import plot
+
+logger = logging.getLogger(__name__)
+
+## params of the data sources, which are replaced by the data of a snapshot
+SNAPSHOT_SOURCE_PARAMS = ["data_provider", "fetch_scheduler", "path_cache"]
 
 
 class PortfolioAnalysis:
-    def __init__(self, portfolio: DataFrame, params={}):
-        print(f"{datetime.now()} - initialising class PortfolioAnalysis")
+    def __init__(
+        self,
+        portfolio: DataFrame,
+        params={},
+        market_data: DataFrame | None = None,
+        company_info: DataFrame | None = None,
+    ):
+        """Class to run portfolio analyses vs. a benchmark
+
+        Market data and company info are only fetched on first access, so creating the class is
+        instant and only the data that is actually used is loaded.
+
+        Parameters
+        ----------
+        portfolio : DataFrame
+            df indexed by ticker with a 'weight' column
+        params : dict, optional
+            analysis params, see PortfolioAnalyser.ipynb, by default {}
+        market_data : DataFrame | None, optional
+            pre-loaded OHLC df as returned by fetch_ohlc, covering at least the constituents and the
+            benchmark (e.g. shared by a PortfolioBatch), by default None (fetched)
+        company_info : DataFrame | None, optional
+            pre-loaded df indexed by ticker with the fields of fetch_company_info, covering at least
+            the constituents and the benchmark, by default None (fetched)
+        """
+        logger.info("initialising class PortfolioAnalysis")
         self.df_portfolio = portfolio
+        self.params = params
         self.start_date = params.get("start_date", None)
         self.end_date = params.get("end_date", None)
         self.benchmark = params.get("benchmark", None)
@@ -23,6 +100,16 @@ class PortfolioAnalysis:
         self.portfolio_total_weight = sum(self.df_portfolio["weight"])
         self.path_input = params.get("path_input", False)
         self.path_output = params.get("path_output", False)
+        self.path_cache = params.get("path_cache", None)
+        self.info_cache_ttl_days = params.get("info_cache_ttl_days", 7)
+        self.max_workers = params.get("max_workers", 8)
+        self.rebalancing = params.get("rebalancing", "daily")
+        self.rebalancing_threshold = params.get("rebalancing_threshold", 0.05)
+        self.benchmark_composition = params.get("benchmark_composition", None)
+        self.block_size = params.get("block_size", 500)
+        self.memory_budget_mb = params.get("memory_budget_mb", None)
+        self.risk_free_rate = params.get("risk_free_rate", 0.0)
+        self.var_confidence = params.get("var_confidence", 0.95)
 
         assert (
             round(self.portfolio_total_weight, 2) == 1
@@ -35,18 +122,454 @@ class PortfolioAnalysis:
         if not self.end_date:
             self.end_date = datetime.now().strftime("%Y-%m-%d")
 
-        self.date_range = date_range(
-            start=self.start_date, end=self.end_date, freq="B"
-        ).strftime("%Y-%m-%d")
+        self.date_range = _business_days(self.start_date, self.end_date)
+        if isinstance(self.benchmark_composition, str):
+            self.benchmark_composition = read_excel(
+                self.benchmark_composition, index_col=0
+            )
 
         self.template_xlsx = path.join(self.path_input, "template.xlsx")
+        self.provider = get_provider(params.get("data_provider", None))
+        self.scheduler = self.provider.create_scheduler(
+            **params.get("fetch_scheduler", {})
+        )
+        ### local data is read faster from its own files than from the cache
+        use_cache = self.path_cache and self.provider.remote
+        self.price_cache = (
+            PriceCache(self.path_cache, source=self.scheduler.download_ohlc)
+            if use_cache
+            else None
+        )
+        self.info_cache = (
+            InfoCache(self.path_cache, ttl_days=self.info_cache_ttl_days)
+            if use_cache
+            else None
+        )
+
+        self.shared_company_info = company_info
+        self.sweep_benchmark_returns = DataFrame(index=self.date_range)
+        if market_data is not None:
+            self.ohlc = self.select_market_data_daily(market_data)
+
+    ### the datasets below are loaded on first access only; assigning them (e.g. in from_data)
+    ### replaces the lazy loading, and re-assigning them invalidates the derived series
+
+    @cached_property
+    def ohlc(self) -> DataFrame | None:
+        """Daily OHLC data of all constituents and the benchmark, see get_market_data_daily"""
+        logger.info("fetching portfolio data")
+        with instrumentation.stage("portfolio.load_market_data"):
+            return self.get_market_data_daily()
+
+    @cached_property
+    def constituent_returns(self) -> DataFrame | None:
+        """Daily returns of all constituents, see get_constituent_returns_daily"""
+        return self.get_constituent_returns_daily()
+
+    @cached_property
+    def benchmark_returns(self) -> Series | None:
+        """Daily returns of the benchmark, see get_benchmark_returns_daily"""
+        return self.get_benchmark_returns_daily()
+
+    @cached_property
+    def constituents_info(self) -> DataFrame | None:
+        """Basic info of all constituents, see get_constituents_info"""
+        with instrumentation.stage("portfolio.load_company_info"):
+            return self.get_constituents_info()
+
+    @cached_property
+    def benchmark_info(self) -> dict:
+        """Basic info of the benchmark, as returned by fetch_company_info"""
+        return self.fetch_company_info([self.benchmark])[0]
+
+    @cached_property
+    def benchmark_constituent_returns(self) -> DataFrame | None:
+        """Daily returns of the stocks in params["benchmark_composition"], fetched in one request"""
+        assert (
+            self.benchmark_composition is not None
+        ), "benchmark_composition missing in params"
+        tickers = self.benchmark_composition.index.unique().tolist()
+        missing_tickers = [
+            ticker for ticker in tickers if ticker not in self.constituent_returns.columns
+        ]
+        benchmark_constituent_returns = [self.constituent_returns]
+        if missing_tickers:
+            logger.info(f"fetching {len(missing_tickers)} benchmark constituents")
+            missing_returns = returns_from_ohlc(
+                fetch_ohlc(
+                    missing_tickers,
+                    self.start_date,
+                    self.end_date,
+                    cache=self.price_cache,
+                    scheduler=self.scheduler,
+                )
+            )
+            benchmark_constituent_returns.append(
+                missing_returns.reindex(self.date_range, fill_value=0)
+            )
+        return concat(benchmark_constituent_returns, axis=1).reindex(
+            columns=tickers, fill_value=0
+        )
+
+    @cached_property
+    def benchmark_constituents_info(self) -> DataFrame | None:
+        """Sector and country of the stocks in params["benchmark_composition"], fetched unless given there"""
+        composition = self.benchmark_composition
+        if {"sector", "country"}.issubset(composition.columns):
+            return composition[["sector", "country"]]
+        return DataFrame(
+            self.fetch_company_info(composition.index.unique().tolist())
+        ).set_index("ticker")
 
-        print(f"{datetime.now()} - fetching portfolio data")
+    @classmethod
+    def from_data(
+        cls,
+        portfolio: DataFrame,
+        params={},
+        ohlc: DataFrame | None = None,
+        constituent_returns: DataFrame | None = None,
+        benchmark_returns: Series | None = None,
+        constituents_info: DataFrame | None = None,
+        benchmark_info: dict | None = None,
+    ) -> "PortfolioAnalysis":
+        """Function to create a PortfolioAnalysis from pre-loaded data, e.g. offline or from a cache
 
-        self.constituent_returns = self.get_constituent_returns_daily()
-        self.benchmark_returns = self.get_benchmark_returns_daily()
-        self.constituents_info = self.get_constituents_info()
-        self.benchmark_info = fetch_company_info(self.benchmark)
+        Datasets that are not passed are still loaded lazily on first access.
+
+        Parameters
+        ----------
+        portfolio : DataFrame
+            df indexed by ticker with a 'weight' column
+        params : dict, optional
+            analysis params, see PortfolioAnalyser.ipynb, by default {}
+        ohlc : DataFrame | None, optional
+            OHLC df of the constituents and the benchmark as returned by fetch_ohlc, by default None
+        constituent_returns : DataFrame | None, optional
+            df of daily returns with one column per constituent, by default None
+        benchmark_returns : Series | None, optional
+            series of daily benchmark returns, by default None
+        constituents_info : DataFrame | None, optional
+            df indexed by ticker with the fields of fetch_company_info and a 'weight' column, by default None
+        benchmark_info : dict | None, optional
+            info dict of the benchmark as returned by fetch_company_info, by default None
+
+        Returns
+        -------
+        PortfolioAnalysis
+            analysis using the passed data
+        """
+        analysis = cls(portfolio, params, market_data=ohlc)
+        if constituent_returns is not None:
+            analysis.constituent_returns = _align_dates(
+                constituent_returns, analysis.date_range
+            )
+        if benchmark_returns is not None:
+            analysis.benchmark_returns = _align_dates(
+                benchmark_returns, analysis.date_range
+            )
+        if constituents_info is not None:
+            analysis.constituents_info = constituents_info
+        if benchmark_info is not None:
+            analysis.benchmark_info = benchmark_info
+        return analysis
+
+    @instrumentation.timed("portfolio.save_snapshot")
+    def save_snapshot(self, path_snapshot: str) -> None:
+        """Function to save the portfolio, prices, returns and info of the analysis to a snapshot directory
+
+        Data that has not been loaded yet is fetched first, including the returns and info of the
+        benchmark constituents if params["benchmark_composition"] is set. The snapshot can be
+        reloaded with load_snapshot to reproduce the analysis without any network access. The
+        params of the data sources (data_provider, fetch_scheduler and path_cache) are not saved.
+
+        Parameters
+        ----------
+        path_snapshot : str
+            directory of the snapshot, created if necessary
+
+        Raises
+        ------
+        ValueError
+            if a param is not JSON serialisable
+        """
+        logger.info(f"saving snapshot to {path_snapshot}")
+        params = {
+            name: value
+            for name, value in self.params.items()
+            if name not in SNAPSHOT_SOURCE_PARAMS
+        } | {
+            "start_date": self.start_date,
+            "end_date": self.end_date,
+            "benchmark_composition": None,
+        }
+        unserialisable = [
+            name for name, value in params.items() if not json_serialisable(value)
+        ]
+        if unserialisable:
+            raise ValueError(
+                f"params {unserialisable} are not JSON serialisable and cannot be saved to a snapshot"
+            )
+        metadata = {"params": params}
+        records = {
+            "portfolio": self.df_portfolio,
+            "constituents_info": self.constituents_info,
+            "benchmark_info": self.benchmark_info,
+        }
+        frames = {
+            "ohlc": self.ohlc,
+            "constituent_returns": self.constituent_returns,
+            "benchmark_returns": self.benchmark_returns,
+        }
+        ### the benchmark constituents are stored as well, so the attribution needs no network
+        if self.benchmark_composition is not None:
+            records["benchmark_composition"] = self.benchmark_composition
+            records["benchmark_constituents_info"] = self.benchmark_constituents_info
+            frames["benchmark_constituent_returns"] = self.benchmark_constituent_returns
+        write_snapshot(path_snapshot, metadata, frames=frames, records=records)
+
+    @classmethod
+    @instrumentation.timed("portfolio.load_snapshot")
+    def load_snapshot(
+        cls, path_snapshot: str, params={}, mmap: bool = True
+    ) -> "PortfolioAnalysis":
+        """Function to create a PortfolioAnalysis from a snapshot directory written by save_snapshot
+
+        Parameters
+        ----------
+        path_snapshot : str
+            directory of the snapshot
+        params : dict, optional
+            params overriding the ones of the snapshot, e.g. path_output or a data_provider to
+            refresh the analysis from, by default {}
+        mmap : bool, optional
+            if True, prices and returns are memory-mapped read-only instead of read into memory, by default True
+
+        Returns
+        -------
+        PortfolioAnalysis
+            analysis using the data of the snapshot
+        """
+        logger.info(f"loading snapshot from {path_snapshot}")
+        snapshot = read_snapshot(path_snapshot, mmap=mmap)
+        ### data source params of older snapshots may be stored as text and are dropped
+        snapshot_params = {
+            name: value
+            for name, value in snapshot["metadata"]["params"].items()
+            if name not in SNAPSHOT_SOURCE_PARAMS
+        } | {"benchmark_composition": snapshot["records"].get("benchmark_composition")}
+        analysis = cls.from_data(
+            snapshot["records"]["portfolio"],
+            snapshot_params | params,
+            constituent_returns=snapshot["frames"]["constituent_returns"],
+            benchmark_returns=snapshot["frames"]["benchmark_returns"],
+            constituents_info=snapshot["records"]["constituents_info"],
+            benchmark_info=snapshot["records"]["benchmark_info"],
+        )
+        ### the stored OHLC data is already restricted to the analysis
+        analysis.ohlc = snapshot["frames"]["ohlc"]
+        if "benchmark_constituent_returns" in snapshot["frames"]:
+            analysis.benchmark_constituent_returns = _align_dates(
+                snapshot["frames"]["benchmark_constituent_returns"],
+                analysis.date_range,
+            )
+            analysis.benchmark_constituents_info = snapshot["records"][
+                "benchmark_constituents_info"
+            ]
+        return analysis
+
+    @instrumentation.timed("portfolio.refresh")
+    def refresh(self, end_date: str | None = None) -> int:
+        """Function to append the days after end_date to the loaded data and update the outputs incrementally
+
+        Only the new days are fetched. The cumulative and relative returns, the daily portfolio
+        returns (with daily rebalancing) and the constituents stats are extended from running
+        aggregates and stored as the memoized results of their getters, so e.g. create_xlsx_output
+        does not recompute the history; only the risk stats (see get_risk_stats) are recomputed in
+        one vectorized pass. The history itself is not fetched again, so adjustments of
+        past prices (e.g. after dividends) are only picked up by a new analysis.
+
+        Parameters
+        ----------
+        end_date : str | None, optional
+            new last observation date (exclusive) as string in format 'YYYY-MM-DD', by default None (today)
+
+        Returns
+        -------
+        int
+            number of days added; 0 if no prices were published since the last refresh
+        """
+        new_end_date = end_date or datetime.now().strftime("%Y-%m-%d")
+        if _business_days(self.end_date, new_end_date).empty:
+            return 0
+
+        tickers = list(dict.fromkeys(self.portfolio_tickers + [self.benchmark]))
+        new_ohlc = fetch_ohlc(
+            tickers,
+            self.end_date,
+            new_end_date,
+            cache=self.price_cache,
+            scheduler=self.scheduler,
+        )
+        new_ohlc = new_ohlc.loc[
+            (new_ohlc.index >= self.end_date) & (new_ohlc.index < new_end_date)
+        ].dropna(how="all")
+        if new_ohlc.empty:
+            return 0
+        ### the analysis only advances to the last day with prices, so days not published yet are fetched next time
+        new_end_date = (new_ohlc.index.max() + DateOffset(days=1)).strftime("%Y-%m-%d")
+        new_dates = _business_days(self.end_date, new_end_date)
+
+        ### the history is reduced to running aggregates once, later refreshes only add the new days
+        constituent_columns = self.constituent_returns.columns
+        if "incremental_stats" not in self.__dict__:
+            self.incremental_stats = IncrementalStats(constituent_columns)
+            self.incremental_stats.update(self.constituent_returns, self.benchmark_returns)
+            self.last_close = self.ohlc["Close"].ffill().iloc[-1]
+        daily_rebalancing = self.rebalancing == "daily"
+        ### date_range ends with the (exclusive) end date, whose returns are filled with 0 until its
+        ### prices are fetched, so that row is replaced by the new days
+        previous = {
+            getter: _before(getter(self), self.end_date)
+            for getter in [
+                PortfolioAnalysis.get_constituent_returns_cumulative,
+                PortfolioAnalysis.get_benchmark_returns_cumulative,
+            ]
+            + (
+                [
+                    PortfolioAnalysis.get_portfolio_returns_daily,
+                    PortfolioAnalysis.get_portfolio_returns_cumulative,
+                    PortfolioAnalysis.get_return_overview_daily,
+                    PortfolioAnalysis.get_return_overview_cumulative,
+                    PortfolioAnalysis.get_relative_returns_daily,
+                ]
+                if daily_rebalancing
+                else []
+            )
+        }
+
+        new_close = concat(
+            [
+                self.last_close.to_frame().T,
+                new_ohlc["Close"].reindex(columns=self.last_close.index),
+            ]
+        ).ffill()
+        new_returns = new_close.pct_change().iloc[1:].dropna(how="all")
+        new_returns = new_returns.reindex(new_dates, fill_value=0).rename_axis("date")
+        new_constituent_returns = new_returns.reindex(columns=constituent_columns)
+        new_benchmark_returns = new_returns[self.benchmark]
+        self.last_close = new_close.iloc[-1]
+        self.incremental_stats.update(new_constituent_returns, new_benchmark_returns)
+
+        self.ohlc = concat([self.ohlc, new_ohlc.reindex(columns=self.ohlc.columns)])
+        self.constituent_returns = concat(
+            [_before(self.constituent_returns, self.end_date), new_constituent_returns]
+        )
+        self.benchmark_returns = concat(
+            [_before(self.benchmark_returns, self.end_date), new_benchmark_returns]
+        )
+        days_added = len(_business_days(self.start_date, new_end_date)) - len(
+            self.date_range
+        )
+        self.end_date = new_end_date
+        self.date_range = _business_days(self.start_date, self.end_date)
+        self.sweep_benchmark_returns = DataFrame(index=self.date_range)
+        self.__dict__.pop("benchmark_constituent_returns", None)
+
+        set_derived(
+            self,
+            PortfolioAnalysis.get_constituent_returns_cumulative,
+            append_cumulative(
+                previous[PortfolioAnalysis.get_constituent_returns_cumulative],
+                new_constituent_returns,
+            ),
+        )
+        set_derived(
+            self,
+            PortfolioAnalysis.get_benchmark_returns_cumulative,
+            append_cumulative(
+                previous[PortfolioAnalysis.get_benchmark_returns_cumulative],
+                new_benchmark_returns,
+            ),
+        )
+        if daily_rebalancing:
+            new_portfolio_returns = new_constituent_returns.mul(
+                constituent_columns.map(self.df_portfolio["weight"])
+            ).sum(axis=1)
+            new_overview = DataFrame(
+                {
+                    "portfolio_return": new_portfolio_returns,
+                    "benchmark_return": new_benchmark_returns,
+                }
+            )
+            for getter, new_values in {
+                PortfolioAnalysis.get_portfolio_returns_daily: new_portfolio_returns,
+                PortfolioAnalysis.get_return_overview_daily: new_overview,
+                PortfolioAnalysis.get_relative_returns_daily: (
+                    (1 + new_overview["portfolio_return"]).div(
+                        1 + new_overview["benchmark_return"], axis=0
+                    )
+                    - 1
+                ).rename("relative_return"),
+            }.items():
+                set_derived(self, getter, concat([previous[getter], new_values]))
+            set_derived(
+                self,
+                PortfolioAnalysis.get_portfolio_returns_cumulative,
+                append_cumulative(
+                    previous[PortfolioAnalysis.get_portfolio_returns_cumulative],
+                    new_portfolio_returns,
+                ),
+            )
+            set_derived(
+                self,
+                PortfolioAnalysis.get_return_overview_cumulative,
+                append_cumulative(
+                    previous[PortfolioAnalysis.get_return_overview_cumulative],
+                    new_overview,
+                ),
+            )
+        ### drawdowns and quantiles need the whole history, so the risk stats are recomputed
+        set_derived(
+            self,
+            PortfolioAnalysis.get_constituents_stats,
+            concat(
+                [
+                    self.df_portfolio,
+                    self.incremental_stats.get_stats(),
+                    self.get_risk_stats().drop(index="portfolio"),
+                ],
+                axis=1,
+            ),
+        )
+        logger.info(f"added {days_added} days up to {new_dates[-1].date()}")
+        return days_added
+
+    def fetch_company_info(self, tickers: list) -> list[dict]:
+        """Function to get the company info of tickers, from the shared company info if available
+
+        Parameters
+        ----------
+        tickers : list
+            list of tickers
+
+        Returns
+        -------
+        list[dict]
+            list of info dicts as returned by fetch_company_info_many
+        """
+        if self.shared_company_info is not None:
+            return (
+                self.shared_company_info.reindex(tickers)
+                .rename_axis("ticker")
+                .reset_index()
+                .to_dict("records")
+            )
+        return fetch_company_info_many(
+            tickers,
+            max_workers=self.max_workers,
+            cache=self.info_cache,
+            scheduler=self.scheduler,
+        )
 
     def get_constituents_info(self) -> DataFrame | None:
         """Function to get a df containing basic info for all constituents within the portfolio
@@ -57,7 +580,7 @@ class PortfolioAnalysis:
             df containing basic constituents info
         """
         temp_constituents_info = DataFrame(
-            [fetch_company_info(ticker) for ticker in self.portfolio_tickers]
+            self.fetch_company_info(self.portfolio_tickers)
         )
         temp_constituents_info["weight"] = temp_constituents_info["ticker"].map(
             self.df_portfolio["weight"]
@@ -65,49 +588,177 @@ class PortfolioAnalysis:
         constituents_info = temp_constituents_info.set_index("ticker")
         return constituents_info
 
-    def get_constituent_returns_daily(self) -> DataFrame | None:
-        """Function to get a df containing daily returns for all constituents within the portfolio
+    def get_market_data_daily(self) -> DataFrame | None:
+        """Function to get a df containing daily OHLC data for all constituents and the benchmark
+
+        Constituents and benchmark are fetched in a single request. All returns and OHLC
+        getters of the class derive their data from this df instead of fetching again.
 
         Returns
         -------
         DataFrame | None
-            _description_
+            DataFrame with Open, High, Low, and Close for each constituent and the benchmark
         """
-        constituent_returns = fetch_returns(
-            self.portfolio_tickers,
+        tickers = list(dict.fromkeys(self.portfolio_tickers + [self.benchmark]))
+        market_data = fetch_ohlc(
+            tickers,
             self.start_date,
             self.end_date,
-        ).reindex(self.date_range, fill_value=0)
+            cache=self.price_cache,
+            scheduler=self.scheduler,
+        )
+        self.warn_missing_tickers(market_data)
+        return market_data
+
+    def warn_missing_tickers(self, market_data: DataFrame) -> None:
+        """Function to log the constituents without prices, which the analysis continues without
+
+        Parameters
+        ----------
+        market_data : DataFrame
+            OHLC df as returned by fetch_ohlc
+        """
+        received_tickers = market_data.columns.get_level_values(1)
+        missing_tickers = [
+            ticker for ticker in self.portfolio_tickers if ticker not in received_tickers
+        ]
+        if missing_tickers:
+            logger.warning(
+                f"no prices for {len(missing_tickers)} constituents, continuing without "
+                f"them: {', '.join(missing_tickers)}"
+            )
+        assert (
+            self.benchmark in received_tickers
+        ), f"no prices for the benchmark {self.benchmark}"
+
+    def get_failure_report(self) -> DataFrame:
+        """Function to get the tickers whose data could not be fetched, see FetchScheduler.failure_report
+
+        Returns
+        -------
+        DataFrame
+            df with one row per failed ticker and dataset, with the columns ticker, dataset, attempts and error
+        """
+        return self.scheduler.failure_report()
+
+    def select_market_data_daily(self, market_data: DataFrame) -> DataFrame | None:
+        """Function to select the constituents, benchmark and dates of the analysis from a larger OHLC df
+
+        Parameters
+        ----------
+        market_data : DataFrame
+            OHLC df as returned by fetch_ohlc, covering at least the constituents and the benchmark
+
+        Returns
+        -------
+        DataFrame | None
+            DataFrame with Open, High, Low, and Close for each constituent and the benchmark
+        """
+        tickers = list(dict.fromkeys(self.portfolio_tickers + [self.benchmark]))
+        selected_market_data = market_data.loc[
+            (market_data.index >= self.start_date) & (market_data.index < self.end_date),
+            market_data.columns.get_level_values(1).isin(tickers),
+        ].dropna(how="all")
+        self.warn_missing_tickers(selected_market_data)
+        return selected_market_data
+
+    def get_constituent_returns_daily(self) -> DataFrame | None:
+        """Function to get a df containing daily returns for all constituents within the portfolio
+
+        Returns
+        -------
+        DataFrame | None
+            df containing daily returns with one column per constituent
+        """
+        temp_returns = returns_from_ohlc(self.ohlc)
+        constituent_columns = [
+            ticker for ticker in temp_returns.columns if ticker in self.portfolio_tickers
+        ]
+        constituent_returns = temp_returns[constituent_columns].reindex(
+            self.date_range, fill_value=0
+        )
         return constituent_returns
 
     def get_constituent_ohlc_daily(self) -> DataFrame | None:
-        """Function to get a DataFrame containing daily OHLCV data for all constituents within the portfolio
+        """Function to get a DataFrame containing daily OHLC data for all constituents within the portfolio
 
         Returns
         -------
         DataFrame | None
-            DataFrame with Open, High, Low, Close, and Volume for each constituent
+            DataFrame with Open, High, Low, and Close for each constituent
         """
-        ohlc_data = fetch_ohlc(
-            self.portfolio_tickers,
-            self.start_date,
-            self.end_date,
-        )
+        ohlc_data = self.ohlc.loc[
+            :, self.ohlc.columns.get_level_values(1).isin(self.portfolio_tickers)
+        ].dropna(how="all")
         return ohlc_data
 
+    @derived("weights", "rebalancing", "constituent_returns")
     def get_portfolio_returns_daily(self):
         """Function to get a series containing daily portfolio returns
 
+        With params["rebalancing"] set to "daily" (the default) the portfolio is assumed to be
+        rebalanced to its weights every day. Any other schedule lets the weights drift between
+        rebalancing days, see Holdings.simulate_rebalanced_portfolio.
+
         Returns
         -------
         _type_
             _description_
         """
         temp_returns = self.constituent_returns
+        if self.rebalancing != "daily":
+            _, portfolio_returns = simulate_rebalanced_portfolio(
+                temp_returns,
+                self.df_portfolio["weight"],
+                self.rebalancing,
+                self.rebalancing_threshold,
+            )
+            return portfolio_returns.rename(None)
+
         temp_weights = temp_returns.columns.map(self.df_portfolio["weight"])
         portfolio_returns = temp_returns.mul(temp_weights).sum(axis=1)
         return portfolio_returns
 
+    @derived("weights", "rebalancing", "constituent_returns")
+    def get_portfolio_weights_daily(self) -> DataFrame | None:
+        """Function to get a df containing the start-of-day weights of all constituents under params["rebalancing"]
+
+        Returns
+        -------
+        DataFrame | None
+            df containing daily weights with one column per constituent
+        """
+        weights_daily, _ = simulate_rebalanced_portfolio(
+            self.constituent_returns,
+            self.df_portfolio["weight"],
+            self.rebalancing,
+            self.rebalancing_threshold,
+        )
+        return weights_daily
+
+    def simulate_transactions(self, transactions: DataFrame) -> tuple[DataFrame, Series]:
+        """Function to get daily weights and portfolio returns from a dated transactions table
+
+        Parameters
+        ----------
+        transactions : DataFrame
+            df with the columns 'date', 'ticker' and 'quantity' (negative for sales), where quantities
+            are expressed in units of the adjusted close prices
+
+        Returns
+        -------
+        tuple[DataFrame, Series]
+            df of daily start-of-day weights per constituent and series of daily portfolio returns
+        """
+        prices = (
+            self.ohlc["Close"]
+            .reindex(columns=self.constituent_returns.columns)
+            .reindex(self.date_range)
+            .ffill()
+        )
+        return simulate_transactions(prices, transactions)
+
+    @derived("weights", "rebalancing", "dates", "constituent_returns")
     def get_portfolio_returns_cumulative(self) -> Series | None:
         """Function to get a series containing cumulative portfolio returns
 
@@ -130,11 +781,38 @@ class PortfolioAnalysis:
         Series | None
             _description_
         """
-        benchmark_returns = fetch_returns(
-            self.benchmark, self.start_date, self.end_date
+        benchmark_returns = returns_from_ohlc(
+            self.ohlc.loc[:, (slice(None), [self.benchmark])]
         ).reindex(self.date_range, fill_value=0)[self.benchmark]
         return benchmark_returns
 
+    @derived("constituent_returns")
+    def get_constituent_returns_cumulative(self) -> DataFrame | None:
+        """Function to get a df containing cumulative returns for all constituents within the portfolio
+
+        Returns
+        -------
+        DataFrame | None
+            df containing cumulative returns with one column per constituent
+        """
+        constituent_returns_cumulative = cumprod(1 + self.constituent_returns) - 1
+        return constituent_returns_cumulative
+
+    @derived("benchmark", "benchmark_returns")
+    def get_benchmark_returns_cumulative(self) -> Series | None:
+        """Function to get a series containing cumulative benchmark returns
+
+        Returns
+        -------
+        Series | None
+            series containing cumulative benchmark returns
+        """
+        benchmark_returns_cumulative = cumprod(1 + self.benchmark_returns) - 1
+        return benchmark_returns_cumulative
+
+    @derived(
+        "weights", "rebalancing", "benchmark", "constituent_returns", "benchmark_returns"
+    )
     def get_return_overview_daily(self) -> DataFrame | None:
         """Function to get a df containing daily portfolio and benchmark returns
 
@@ -144,12 +822,15 @@ class PortfolioAnalysis:
             _description_
         """
         portfolio_returns_daily = self.get_portfolio_returns_daily()
-        benchmark_returns_daily = self.get_benchmark_returns_daily()
+        benchmark_returns_daily = self.benchmark_returns
         return_overview_daily = DataFrame(
             portfolio_returns_daily.rename("portfolio_return")
         ).join(DataFrame(benchmark_returns_daily.rename("benchmark_return")))
         return return_overview_daily
 
+    @derived(
+        "weights", "rebalancing", "benchmark", "constituent_returns", "benchmark_returns"
+    )
     def get_return_overview_cumulative(self) -> DataFrame | None:
         """Function to get a df containing cumulative portfolio and benchmark returns
 
@@ -162,6 +843,9 @@ class PortfolioAnalysis:
         return_overview_cumulative = cumprod(1 + return_overview_daily) - 1
         return return_overview_cumulative
 
+    @derived(
+        "weights", "rebalancing", "benchmark", "constituent_returns", "benchmark_returns"
+    )
     def get_relative_returns_daily(self) -> Series | None:
         """Function to get a series containing daily relative returns
 
@@ -207,34 +891,39 @@ class PortfolioAnalysis:
         )
         return country_allocation
 
+    @derived(
+        "weights",
+        "rebalancing",
+        "benchmark",
+        "constituent_returns",
+        "benchmark_returns",
+        "var_confidence",
+        "risk_free_rate",
+    )
+    @instrumentation.timed("portfolio.get_constituents_stats")
     def get_constituents_stats(self) -> DataFrame | None:
         """Function to get a df containing various stats for all constituents within the portfolio
 
         Returns
         -------
         DataFrame | None
-            _description_
+            df with the columns of the portfolio df plus total and relative return, annualised
+            volatility, beta and the risk stats of get_risk_stats
         """
         constituent_returns = self.constituent_returns
         bm_returns = self.benchmark_returns
-        temp_volatility = DataFrame(
-            constituent_returns.apply(
-                lambda stock_returns: annualised_volatility(stock_returns)
-            ).rename("volatility_annualised")
-        )
-        temp_betas = DataFrame(
-            constituent_returns.apply(
-                lambda stock_returns: beta(bm_returns, stock_returns)
-            ).rename("beta")
-        )
+        temp_volatility = DataFrame(annualised_volatilities(constituent_returns))
+        temp_betas = DataFrame(betas(bm_returns, constituent_returns))
+        constituent_returns_cumulative = self.get_constituent_returns_cumulative()
+        bm_returns_cumulative = self.get_benchmark_returns_cumulative()
         temp_total_returns = DataFrame(
-            (cumprod(1 + constituent_returns) - 1).iloc[-1].rename("total_return")
+            constituent_returns_cumulative.iloc[-1].rename("total_return")
         )
         temp_relative_returns = DataFrame(
             (
-                cumprod(1 + constituent_returns)
-                .iloc[-1]
-                .div((cumprod(1 + bm_returns).iloc[-1]), axis=0)
+                (1 + constituent_returns_cumulative.iloc[-1]).div(
+                    1 + bm_returns_cumulative.iloc[-1], axis=0
+                )
                 - 1
             ).rename("relative_return")
         )
@@ -245,28 +934,552 @@ class PortfolioAnalysis:
                 temp_relative_returns,
                 temp_volatility,
                 temp_betas,
+                self.get_risk_stats().drop(index="portfolio"),
             ],
             axis=1,
         )
         return constituent_stats
 
-    def create_xlsx_output(self, output_name: str = "portfolio_overview") -> None:
+    @derived(
+        "weights",
+        "rebalancing",
+        "benchmark",
+        "constituent_returns",
+        "benchmark_returns",
+        "var_confidence",
+        "risk_free_rate",
+    )
+    @instrumentation.timed("portfolio.get_risk_stats")
+    def get_risk_stats(self) -> DataFrame | None:
+        """Function to get a df containing drawdown, VaR/CVaR and risk-adjusted return stats of the portfolio and all constituents
+
+        The stats of the portfolio and of all constituents are computed in one pass over the
+        returns matrix, see Risk.risk_stats. VaR and CVaR use params["var_confidence"] (default
+        0.95), the Sharpe and Sortino ratios params["risk_free_rate"] (annual, default 0).
+
+        Returns
+        -------
+        DataFrame | None
+            df indexed by 'portfolio' followed by the constituents, with the columns in Risk.RISK_STATS
+        """
+        returns = concat(
+            [
+                self.get_portfolio_returns_daily().rename("portfolio"),
+                self.constituent_returns,
+            ],
+            axis=1,
+        )
+        return risk_stats(
+            returns,
+            self.benchmark_returns,
+            self.var_confidence,
+            self.risk_free_rate,
+        )
+
+    @derived("benchmark", "constituent_returns", "benchmark_returns")
+    @instrumentation.timed("portfolio.get_covariance_matrix")
+    def get_covariance_matrix(self) -> DataFrame | None:
+        """Function to get the covariance matrix of the daily returns of all constituents and the benchmark
+
+        Returns
+        -------
+        DataFrame | None
+            covariance matrix with the constituents followed by the benchmark (unless it is a
+            constituent itself) as index and columns, see Stats.covariances
+        """
+        returns = self.constituent_returns
+        if self.benchmark not in returns.columns:
+            returns = concat(
+                [returns, self.benchmark_returns.rename(self.benchmark)], axis=1
+            )
+        return covariances(returns)
+
+    @instrumentation.timed("portfolio.simulate")
+    def simulate(
+        self,
+        n_paths: int = 100_000,
+        horizon_days: int = 252,
+        method: str = "bootstrap",
+        block_size: int = 20,
+        seed: int = 0,
+        batch_size: int = 10_000,
+        max_workers: int | None = None,
+    ) -> DataFrame:
+        """Function to simulate the portfolio and benchmark returns and the portfolio drawdown over a future horizon
+
+        The portfolio is assumed to be rebalanced to its weights daily. "bootstrap" resamples blocks
+        of historical days of constituent and benchmark returns; "normal" draws from a normal
+        distribution with the historical means and the covariance matrix of get_covariance_matrix,
+        which for a daily rebalanced portfolio reduces to the 2 x 2 covariance of the weighted
+        constituents and the benchmark. See Simulation.simulate_outcomes for the batching,
+        parallelism and seeding.
+
+        Parameters
+        ----------
+        n_paths : int, optional
+            number of paths, by default 100_000
+        horizon_days : int, optional
+            number of trading days per path, by default 252
+        method : str, optional
+            "bootstrap" or "normal", by default "bootstrap"
+        block_size : int, optional
+            number of consecutive days per block of the bootstrap, by default 20
+        seed : int, optional
+            seed of the random draws, by default 0
+        batch_size : int, optional
+            number of paths simulated at once by a worker, by default 10_000
+        max_workers : int | None, optional
+            number of worker processes, by default None (number of CPUs); 1 simulates in the current process
+
+        Returns
+        -------
+        DataFrame
+            df with one row per path and the columns portfolio_return, benchmark_return,
+            relative_return and max_drawdown
+        """
+        constituent_returns = self.constituent_returns.fillna(0)
+        weights = constituent_returns.columns.map(self.df_portfolio["weight"])
+        history = DataFrame(
+            {
+                "portfolio": constituent_returns @ weights.to_numpy(dtype=float),
+                "benchmark": self.benchmark_returns,
+            }
+        )
+
+        ### weights of the portfolio and the benchmark on the rows and columns of the covariance matrix
+        covariance_matrix = self.get_covariance_matrix().fillna(0)
+        projection = DataFrame(
+            0.0, index=covariance_matrix.index, columns=history.columns
+        )
+        projection.loc[constituent_returns.columns, "portfolio"] = weights
+        projection.loc[self.benchmark, "benchmark"] = 1.0
+        covariance = projection.T @ covariance_matrix @ projection
+
+        return simulate_outcomes(
+            history,
+            n_paths,
+            horizon_days,
+            method,
+            block_size,
+            covariance,
+            seed,
+            batch_size,
+            max_workers,
+        )
+
+    def get_simulation_summary(self, **kwargs) -> DataFrame:
+        """Function to get the distribution of the simulated outcomes, see simulate and Simulation.summarise_outcomes
+
+        Parameters
+        ----------
+        **kwargs
+            params of simulate
+
+        Returns
+        -------
+        DataFrame
+            df indexed by outcome with its mean, std, quantiles and probability of being negative
+        """
+        return summarise_outcomes(self.simulate(**kwargs))
+
+    @instrumentation.timed("portfolio.optimise_weights")
+    def optimise_weights(
+        self,
+        objective: str = "min_variance",
+        shrinkage: str | float | None = "ledoit_wolf",
+        min_weight: float = 0.0,
+        max_weight: float = 1.0,
+        max_tracking_error: float = 0.05,
+    ) -> DataFrame:
+        """Function to get the constituent weights optimising an objective based on the historical returns
+
+        The covariance matrix of get_covariance_matrix is reused and shrunk towards a scaled identity
+        matrix (see Optimisation.shrink_covariance), which keeps the weights stable when there
+        are many constituents compared to the number of days. The expected returns are the mean
+        daily returns. The objectives are:
+
+        -   "min_variance": lowest variance
+        -   "max_sharpe": highest Sharpe ratio over params["risk_free_rate"] (annual, default 0)
+        -   "risk_parity": equal contributions of all constituents to the volatility, always long
+            only, so min_weight and max_weight are ignored
+        -   "tracking_error": highest expected return with an annualised tracking error vs. the
+            benchmark of at most max_tracking_error
+
+        The result has the format of the portfolio input, so it can be analysed with
+        PortfolioAnalysis(weights, params), or with PortfolioAnalysis.from_data and the data of
+        this analysis to avoid fetching the prices again.
+
+        Parameters
+        ----------
+        objective : str, optional
+            one of Optimisation.OBJECTIVES, by default "min_variance"
+        shrinkage : str | float | None, optional
+            "ledoit_wolf" to estimate the shrinkage intensity (see
+            Optimisation.ledoit_wolf_shrinkage), an intensity between 0 and 1, or None for the
+            sample covariance matrix, by default "ledoit_wolf"
+        min_weight : float, optional
+            lowest weight of a constituent, negative values allow short positions, by default 0.0
+        max_weight : float, optional
+            highest weight of a constituent, by default 1.0
+        max_tracking_error : float, optional
+            highest annualised tracking error of "tracking_error", by default 0.05
+
+        Returns
+        -------
+        DataFrame
+            df indexed by the tickers of the portfolio with the column 'weight', 0 for the tickers
+            without returns
+        """
+        assert (
+            objective in OBJECTIVES
+        ), f"unknown objective {objective}, use one of {OBJECTIVES}"
+        covariance_matrix = self.get_covariance_matrix().fillna(0)
+        variances = Series(
+            covariance_matrix.to_numpy().diagonal(), index=covariance_matrix.index
+        )
+        tickers = self.constituent_returns.columns[
+            variances.reindex(self.constituent_returns.columns) > 0
+        ]
+        returns = self.constituent_returns[tickers]
+        covariance = covariance_matrix.loc[tickers, tickers]
+        if shrinkage == "ledoit_wolf":
+            shrinkage = ledoit_wolf_shrinkage(returns.fillna(0))
+        if shrinkage:
+            covariance = shrink_covariance(covariance, shrinkage)
+
+        if objective == "min_variance":
+            weights = min_variance_weights(covariance, min_weight, max_weight)
+        elif objective == "max_sharpe":
+            daily_risk_free_rate = (1 + self.risk_free_rate) ** (1 / 252) - 1
+            weights = max_sharpe_weights(
+                covariance, returns.mean(), daily_risk_free_rate, min_weight, max_weight
+            )
+        elif objective == "risk_parity":
+            weights = risk_parity_weights(covariance)
+        else:
+            weights = tracking_error_weights(
+                covariance,
+                covariance_matrix.loc[tickers, self.benchmark],
+                covariance_matrix.loc[self.benchmark, self.benchmark],
+                returns.mean(),
+                max_tracking_error,
+                min_weight,
+                max_weight,
+            )
+        return weights.reindex(self.df_portfolio.index, fill_value=0).to_frame()
+
+    def get_block_size(self, block_size: int | None = None) -> int:
+        """Function to get the number of tickers per block of the streaming methods
+
+        Parameters
+        ----------
+        block_size : int | None, optional
+            number of tickers per block, by default None (derived from params["memory_budget_mb"]
+            if set, params["block_size"] otherwise)
+
+        Returns
+        -------
+        int
+            number of tickers per block
+        """
+        if block_size:
+            return block_size
+        if self.memory_budget_mb:
+            return block_size_for_budget(len(self.date_range), self.memory_budget_mb)
+        return self.block_size
+
+    def load_constituent_returns(self, tickers: list) -> DataFrame:
+        """Function to get the daily returns of some constituents without loading all of them
+
+        Parameters
+        ----------
+        tickers : list
+            list of constituents
+
+        Returns
+        -------
+        DataFrame
+            df containing daily returns of the tickers with prices, indexed by date_range
+        """
+        if "constituent_returns" in self.__dict__ or "ohlc" in self.__dict__:
+            constituent_returns = self.constituent_returns
+            return constituent_returns[
+                [ticker for ticker in tickers if ticker in constituent_returns.columns]
+            ]
+        returns = returns_from_ohlc(
+            fetch_ohlc(
+                tickers,
+                self.start_date,
+                self.end_date,
+                cache=self.price_cache,
+                scheduler=self.scheduler,
+            )
+        )
+        return returns.reindex(self.date_range, fill_value=0)
+
+    def load_benchmark_returns(self) -> Series:
+        """Function to get the daily benchmark returns, fetching only the benchmark if no data is loaded yet
+
+        Returns
+        -------
+        Series
+            series containing daily benchmark returns
+        """
+        if "benchmark_returns" in self.__dict__ or "ohlc" in self.__dict__:
+            return self.benchmark_returns
+        benchmark_returns = self.load_constituent_returns([self.benchmark])
+        assert (
+            self.benchmark in benchmark_returns.columns
+        ), f"no prices for the benchmark {self.benchmark}"
+        return benchmark_returns[self.benchmark]
+
+    def iter_constituent_returns(self, block_size: int | None = None):
+        """Generator of the daily constituent returns in column blocks, for universes too large for memory
+
+        Parameters
+        ----------
+        block_size : int | None, optional
+            number of tickers per block, see get_block_size, by default None
+
+        Yields
+        ------
+        DataFrame
+            df containing daily returns of the next block of constituents
+        """
+        yield from iter_column_blocks(
+            self.load_constituent_returns,
+            self.portfolio_tickers,
+            self.get_block_size(block_size),
+        )
+
+    @instrumentation.timed("portfolio.stream_constituents_stats")
+    def stream_constituents_stats(self, block_size: int | None = None) -> DataFrame:
+        """Function to get the constituents stats of get_constituents_stats one block of constituents at a time
+
+        Only one block of returns is held in memory at a time, so the memory use is bounded by
+        the block size (see get_block_size) instead of the number of constituents.
+
+        Parameters
+        ----------
+        block_size : int | None, optional
+            number of tickers per block, see get_block_size, by default None
+
+        Returns
+        -------
+        DataFrame
+            df containing various stats for all constituents within the portfolio
+        """
+        running_stats = RunningStats(
+            self.df_portfolio,
+            self.load_benchmark_returns(),
+            confidence=self.var_confidence,
+            risk_free_rate=self.risk_free_rate,
+        )
+        return concat(
+            list(running_stats.stream(self.iter_constituent_returns(block_size)))
+        )
+
+    @instrumentation.timed("portfolio.get_attribution_daily")
+    def get_attribution_daily(self, by: str = "sector") -> DataFrame | None:
+        """Function to get a df containing the daily Brinson-Fachler attribution vs. params["benchmark_composition"]
+
+        Parameters
+        ----------
+        by : str, optional
+            "sector" or "country", by default "sector"
+
+        Returns
+        -------
+        DataFrame | None
+            df with daily group weights, group returns and allocation, selection and interaction
+            effects, columns (stat, group), see Attribution.brinson_attribution
+        """
+        attribution_daily = brinson_attribution(
+            self.get_portfolio_weights_daily(),
+            self.constituent_returns,
+            self.constituents_info[by],
+            self.benchmark_composition["weight"],
+            self.benchmark_constituent_returns,
+            self.benchmark_constituents_info[by],
+        )
+        return attribution_daily
+
+    def get_attribution(self, by: str = "sector") -> DataFrame | None:
+        """Function to get a df containing the attribution of the active return over the whole period by group
+
+        Parameters
+        ----------
+        by : str, optional
+            "sector" or "country", by default "sector"
+
+        Returns
+        -------
+        DataFrame | None
+            df indexed by group with average weights and linked allocation, selection, interaction
+            and total effects, which add up to the cumulative active return
+        """
+        attribution = link_attribution(self.get_attribution_daily(by))
+        return attribution
+
+    @instrumentation.timed("portfolio.get_rolling_stats")
+    def get_rolling_stats(self, window: int | list[int] = 63) -> DataFrame | None:
+        """Function to get a df containing rolling risk stats for all constituents and the portfolio vs. the benchmark
+
+        Parameters
+        ----------
+        window : int | list[int], optional
+            number of trading days per window, or list of window lengths (e.g. [21, 63, 252]), by default 63
+
+        Returns
+        -------
+        DataFrame | None
+            df with rolling beta, volatility, tracking error and correlation, columns (stat, ticker),
+            where ticker includes 'portfolio'; with an additional outer level 'window' if a list is passed
+        """
+        temp_returns = self.constituent_returns.assign(
+            portfolio=self.get_portfolio_returns_daily()
+        )
+        if isinstance(window, int):
+            return rolling_stats(temp_returns, self.benchmark_returns, window)
+
+        rolling_stats_all = concat(
+            {w: rolling_stats(temp_returns, self.benchmark_returns, w) for w in window},
+            axis=1,
+            names=["window"],
+        )
+        return rolling_stats_all
+
+    def get_benchmarks_returns_daily(self, benchmarks: list) -> DataFrame | None:
+        """Function to get a df containing daily returns for several benchmarks
+
+        Benchmarks that are not part of the loaded market data are fetched in a single request
+        and kept, so repeated sweeps do not download them again.
+
+        Parameters
+        ----------
+        benchmarks : list
+            list of benchmark tickers
+
+        Returns
+        -------
+        DataFrame | None
+            df containing daily returns with one column per benchmark
+        """
+        ### other benchmarks can only be taken from the market data if it has been loaded already
+        loaded_tickers = (
+            self.ohlc.columns.get_level_values(1).drop(self.benchmark, errors="ignore")
+            if "ohlc" in self.__dict__
+            else Index([])
+        )
+        missing_tickers = [
+            ticker
+            for ticker in dict.fromkeys(benchmarks)
+            if ticker != self.benchmark
+            and ticker not in loaded_tickers
+            and ticker not in self.sweep_benchmark_returns.columns
+        ]
+        if missing_tickers:
+            logger.info(f"fetching {len(missing_tickers)} sweep benchmarks")
+            missing_returns = returns_from_ohlc(
+                fetch_ohlc(
+                    missing_tickers,
+                    self.start_date,
+                    self.end_date,
+                    cache=self.price_cache,
+                    scheduler=self.scheduler,
+                )
+            )
+            self.sweep_benchmark_returns = self.sweep_benchmark_returns.join(
+                missing_returns.reindex(self.date_range, fill_value=0)
+            )
+
+        benchmarks_returns = [self.sweep_benchmark_returns]
+        if self.benchmark in benchmarks:
+            benchmarks_returns.append(self.benchmark_returns.to_frame(self.benchmark))
+        if loaded_tickers.isin(benchmarks).any():
+            loaded_benchmarks = loaded_tickers[loaded_tickers.isin(benchmarks)]
+            loaded_returns = returns_from_ohlc(
+                self.ohlc.loc[:, (slice(None), loaded_benchmarks)]
+            )
+            benchmarks_returns.append(
+                loaded_returns.reindex(self.date_range, fill_value=0)
+            )
+        benchmarks_returns = (
+            concat(benchmarks_returns, axis=1)
+            .reindex(columns=list(dict.fromkeys(benchmarks)))
+            .fillna(0)
+        )
+        return benchmarks_returns
+
+    @instrumentation.timed("portfolio.run_sweep")
+    def run_sweep(
+        self,
+        weights: DataFrame | dict | None = None,
+        benchmarks: list | None = None,
+        windows: list[tuple] | None = None,
+    ) -> DataFrame | None:
+        """Function to evaluate alternative weightings, benchmarks and time windows without re-running the analysis
+
+        Parameters
+        ----------
+        weights : DataFrame | dict | None, optional
+            df with one row per scenario and one column per constituent, or dict mapping scenario name
+            to a dict of weights, by default None (the portfolio weights, named 'portfolio')
+        benchmarks : list | None, optional
+            list of benchmark tickers, by default None (the benchmark of the analysis)
+        windows : list[tuple] | None, optional
+            list of (start_date, end_date) tuples within the analysis period, end_date exclusive,
+            by default None (the whole analysis period)
+
+        Returns
+        -------
+        DataFrame | None
+            tidy df with one row per scenario, see Scenarios.run_sweep
+        """
+        if weights is None:
+            weights = {"portfolio": self.df_portfolio["weight"]}
+        if isinstance(weights, dict):
+            weights = weights_grid(weights)
+        if benchmarks is None:
+            benchmarks = [self.benchmark]
+
+        unknown_tickers = set(weights.columns) - set(self.constituent_returns.columns)
+        assert (
+            not unknown_tickers
+        ), f"{sorted(unknown_tickers)} are not constituents of the analysis"
+
+        sweep = run_sweep(
+            self.constituent_returns,
+            self.get_benchmarks_returns_daily(benchmarks),
+            weights,
+            windows,
+        )
+        return sweep
+
+    @instrumentation.timed("portfolio.create_xlsx_output")
+    def create_xlsx_output(
+        self, output_name: str = "portfolio_overview", write_only: bool = False
+    ) -> None:
         """Function to create an xlsx output containing the most important information about the portfolio
 
         Parameters
         ----------
         output_name : str, optional
             _description_, by default "portfolio_overview"
+        write_only : bool, optional
+            if True, the sheets are streamed through an openpyxl write-only workbook, which is
+            much faster and leaner for long histories of many constituents, by default False
         """
         info = self.constituents_info
         stats = self.get_constituents_stats()
         return_overview = self.get_return_overview_cumulative()
         constituent_returns = self.constituent_returns
 
-        wb = load_workbook(self.template_xlsx)
+        wb = load_template_workbook(self.template_xlsx, write_only=write_only)
 
         write_df_to_xlsx_table(wb, "constituent_info", info)
         write_df_to_xlsx_table(wb, "constituent_stats", stats)
+        write_df_to_xlsx_table(wb, "risk_report", self.get_risk_stats())
         write_df_to_xlsx_table(
             wb, "return_overview", return_overview, base_formatting="0.00%;-0.00%"
         )
@@ -276,35 +1489,142 @@ class PortfolioAnalysis:
             constituent_returns,
             base_formatting="0.00%;-0.00%",
         )
-        del wb["Sheet1"]
+        if self.benchmark_composition is not None:
+            for by in ["sector", "country"]:
+                write_df_to_xlsx_table(
+                    wb,
+                    f"{by}_attribution",
+                    self.get_attribution(by),
+                    base_formatting="0.00%;-0.00%",
+                )
         file_path = path.join(self.path_output, f"{output_name}.xlsx")
-        wb.save(file_path)
-        print(f"{datetime.now()} - Portfolio output saved here: {file_path}")
+        with instrumentation.stage("save_workbook"):
+            wb.save(file_path)
+        logger.info(f"Portfolio output saved here: {file_path}")
 
-    def plot_returns_daily(self, include_benchmark: bool = True) -> plot:
-        """Function to plot daily stock returns for all constituents
+    @instrumentation.timed("portfolio.create_streamed_output")
+    def create_streamed_output(
+        self,
+        output_name: str = "portfolio_overview",
+        block_size: int | None = None,
+        include_returns: bool = True,
+    ) -> None:
+        """Function to create the outputs of create_xlsx_output for universes too large for memory
+
+        Constituent returns are streamed in column blocks (see get_block_size) through the stats
+        and the writers: the constituents stats are appended to a write-only xlsx workbook, and the
+        constituent returns, which do not fit a worksheet at universe scale, are appended to
+        '<output_name>_constituent_returns.csv' with one row per date and ticker. Only daily
+        rebalancing is supported, since the other schedules depend on all constituents at once.
+        The risk_report sheet only holds the portfolio, the risk stats of the constituents are
+        part of their stats.
+
+        Parameters
+        ----------
+        output_name : str, optional
+            name of the xlsx output, by default "portfolio_overview"
+        block_size : int | None, optional
+            number of tickers per block, see get_block_size, by default None
+        include_returns : bool, optional
+            if False, the constituent returns csv is not written, by default True
+        """
+        assert (
+            self.rebalancing == "daily"
+        ), "streamed outputs are only supported with daily rebalancing"
+        running_stats = RunningStats(
+            self.df_portfolio,
+            self.load_benchmark_returns(),
+            confidence=self.var_confidence,
+            risk_free_rate=self.risk_free_rate,
+        )
+        returns_writer = (
+            CsvBlockWriter(
+                path.join(self.path_output, f"{output_name}_constituent_returns.csv")
+            )
+            if include_returns
+            else None
+        )
+        stats_writer = CsvBlockWriter(
+            path.join(self.path_output, f"{output_name}_constituent_stats.csv")
+        )
+
+        def stream_stats():
+            for returns in self.iter_constituent_returns(block_size):
+                if returns_writer:
+                    returns_writer.write(returns_to_long(returns), index=False)
+                stats = running_stats.update(returns)
+                stats_writer.write(stats)
+                yield stats
+
+        wb = load_template_workbook(self.template_xlsx, write_only=True)
+        write_df_to_xlsx_table(wb, "constituent_info", self.constituents_info)
+        write_dfs_to_xlsx_table(wb, "constituent_stats", stream_stats())
+        write_df_to_xlsx_table(
+            wb,
+            "return_overview",
+            running_stats.get_return_overview_cumulative(),
+            base_formatting="0.00%;-0.00%",
+        )
+        write_df_to_xlsx_table(wb, "risk_report", running_stats.get_risk_stats())
+        file_path = path.join(self.path_output, f"{output_name}.xlsx")
+        with instrumentation.stage("save_workbook"):
+            wb.save(file_path)
+        logger.info(f"Portfolio output saved here: {file_path}")
+
+    def get_charts(
+        self, chart_type: str, include_benchmark: bool = True
+    ) -> list[dict]:
+        """Function to get the definitions of all constituent charts of a type
 
         Parameters
         ----------
+        chart_type : str
+            "returns_daily", "returns_cumulative" or "candles"
         include_benchmark : bool, optional
             if set to True, stock returns will be plotted along with benchmark returns, by default True
 
         Returns
         -------
-        plot
-            plot(s) containing the desired returns
+        list[dict]
+            chart definitions with the keys 'name', 'kind', 'data' and 'title', as taken by Formatting.save_charts
         """
-        constituent_returns = self.constituent_returns
-        constituents_info = self.constituents_info
+        if chart_type == "candles":
+            ohlc = self.get_constituent_ohlc_daily()
+            charts = []
+            for ticker in ohlc.columns.get_level_values(1).unique().tolist():
+                ticker_returns = ohlc.loc[:, (slice(None), ticker)][
+                    ["Open", "High", "Low", "Close"]
+                ]
+                ticker_returns.columns = ticker_returns.columns.droplevel(1)
+                ticker_returns = ticker_returns.dropna(how="all")
+                ticker_name = self.constituents_info.at[ticker, "name"]
+                charts.append(
+                    {
+                        "name": f"{chart_type}_{ticker}",
+                        "kind": "candle",
+                        "data": ticker_returns,
+                        "title": ticker_name,
+                    }
+                )
+            return charts
 
-        if include_benchmark:
+        if chart_type == "returns_daily":
+            constituent_returns = self.constituent_returns
             benchmark_returns = self.benchmark_returns
-            benchmark_name = self.benchmark_info["name"]
-            benchmark_returns.rename(benchmark_name)
+            title = "Daily returns"
+        elif chart_type == "returns_cumulative":
+            constituent_returns = self.get_constituent_returns_cumulative()
+            benchmark_returns = self.get_benchmark_returns_cumulative()
+            title = "Cumulative returns"
+        else:
+            raise ValueError(f"unknown chart_type {chart_type}")
+
+        benchmark_returns = benchmark_returns.rename(self.benchmark_info["name"])
 
+        charts = []
         for ticker in constituent_returns.columns:
             ticker_returns = constituent_returns[ticker]
-            ticker_name = constituents_info.at[ticker, "name"]
+            ticker_name = self.constituents_info.at[ticker, "name"]
             ticker_returns = ticker_returns.rename(ticker_name)
 
             if include_benchmark:
@@ -312,10 +1632,18 @@ class PortfolioAnalysis:
             else:
                 returns = ticker_returns
 
-            line_plot(returns, title="Daily returns")
+            charts.append(
+                {
+                    "name": f"{chart_type}_{ticker}",
+                    "kind": "line",
+                    "data": returns,
+                    "title": title,
+                }
+            )
+        return charts
 
-    def plot_returns_cumulative(self, include_benchmark: bool = True) -> plot:
-        """Function to plot cumulative stock returns for all constituents
+    def plot_returns_daily(self, include_benchmark: bool = True) -> "plot":
+        """Function to plot daily stock returns for all constituents
 
         Parameters
         ----------
@@ -327,27 +1655,26 @@ class PortfolioAnalysis:
         plot
             plot(s) containing the desired returns
         """
-        constituent_returns = cumprod(1 + self.constituent_returns) - 1
-        constituents_info = self.constituents_info
-
-        if include_benchmark:
-            benchmark_returns = cumprod(1 + self.benchmark_returns) - 1
-            benchmark_name = self.benchmark_info["name"]
-            benchmark_returns.rename(benchmark_name)
+        for chart in self.get_charts("returns_daily", include_benchmark):
+            line_plot(chart["data"], title=chart["title"])
 
-        for ticker in constituent_returns.columns:
-            ticker_returns = constituent_returns[ticker]
-            ticker_name = constituents_info.at[ticker, "name"]
-            ticker_returns = ticker_returns.rename(ticker_name)
+    def plot_returns_cumulative(self, include_benchmark: bool = True) -> "plot":
+        """Function to plot cumulative stock returns for all constituents
 
-            if include_benchmark:
-                returns = [ticker_returns, benchmark_returns]
-            else:
-                returns = ticker_returns
+        Parameters
+        ----------
+        include_benchmark : bool, optional
+            if set to True, stock returns will be plotted along with benchmark returns, by default True
 
-            line_plot(returns, title="Cumulative returns")
+        Returns
+        -------
+        plot
+            plot(s) containing the desired returns
+        """
+        for chart in self.get_charts("returns_cumulative", include_benchmark):
+            line_plot(chart["data"], title=chart["title"])
 
-    def plot_constituent_candles(self) -> plot:
+    def plot_constituent_candles(self) -> "plot":
         """Function to create candle charts for constituents
 
         Returns
@@ -355,15 +1682,70 @@ class PortfolioAnalysis:
         plot
             plot(s) containing the desired candle charts
         """
-        ohlc = self.get_constituent_ohlc_daily()
+        for chart in self.get_charts("candles"):
+            candle_plot(chart["data"], title=chart["title"])
 
-        for ticker in ohlc.columns.get_level_values(1).unique().tolist():
-            ticker_returns = ohlc.loc[:, (slice(None), ticker)][
-                ["Open", "High", "Low", "Close"]
-            ]
-            ticker_returns.columns = ticker_returns.columns.droplevel(1)
-            ticker_name = self.constituents_info.at[ticker, "name"]
+    @instrumentation.timed("portfolio.export_charts")
+    def export_charts(
+        self,
+        chart_types: tuple = ("returns_daily", "returns_cumulative", "candles"),
+        file_format: str = "png",
+        include_benchmark: bool = True,
+        max_workers: int | None = None,
+        pdf_report: bool = False,
+    ) -> list[str]:
+        """Function to render constituent charts to files instead of displaying them
+
+        Charts are rendered with the non-interactive Agg backend on a process pool and closed
+        after saving, which makes this suitable for headless batch jobs.
+
+        Parameters
+        ----------
+        chart_types : tuple, optional
+            chart types to render, see get_charts, by default ("returns_daily", "returns_cumulative", "candles")
+        file_format : str, optional
+            file format of the charts, e.g. "png", "svg" or "pdf", by default "png"
+        include_benchmark : bool, optional
+            if set to True, stock returns will be plotted along with benchmark returns, by default True
+        max_workers : int | None, optional
+            number of worker processes, by default None (number of CPUs); 1 renders in the current process
+        pdf_report : bool, optional
+            if True, all charts are additionally collected in 'chart_report.pdf', by default False
+
+        Returns
+        -------
+        list[str]
+            paths of all created files, saved in the 'charts' folder of the output path
+        """
+        charts = [
+            chart
+            for chart_type in chart_types
+            for chart in self.get_charts(chart_type, include_benchmark)
+        ]
+        created_files = save_charts(
+            charts,
+            path.join(self.path_output, "charts"),
+            file_format=file_format,
+            max_workers=max_workers,
+            pdf_report="chart_report.pdf" if pdf_report else None,
+        )
+        logger.info(f"{len(created_files)} charts saved")
+        return created_files
+
+
+def _align_dates(returns: DataFrame | Series, dates) -> DataFrame | Series:
+    ### data already covering the dates (e.g. memory-mapped from a snapshot) is not copied
+    if returns.index.equals(dates):
+        return returns.set_axis(dates, axis=0, copy=False)
+    return returns.reindex(dates, fill_value=0)
+
+
+def _before(df: DataFrame | Series, date: str) -> DataFrame | Series:
+    return df.loc[df.index < date]
 
-            returns = ticker_returns
 
-            candle_plot(returns, title=ticker_name)
+def _business_days(start_date: str, end_date: str) -> DatetimeIndex:
+    ### same as date_range(freq="B"), which generates business days one by one and is slow for long periods
+    calendar_days = date_range(start=start_date, end=end_date, freq="D")
+    weekdays = calendar_days[calendar_days.dayofweek < 5].to_numpy()
+    return DatetimeIndex(weekdays, freq="B", name="date")
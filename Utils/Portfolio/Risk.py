@@ -0,0 +1,173 @@
+from statistics import NormalDist
+from warnings import catch_warnings, filterwarnings
+
+from numpy import (
+    ceil,
+    cumprod,
+    errstate,
+    floor,
+    inf,
+    isnan,
+    maximum,
+    minimum,
+    nan,
+    nanmean,
+    sort,
+    sqrt,
+    take_along_axis,
+    where,
+)
+from pandas import DataFrame, Series
+
+from ..Instrumentation import instrumentation
+from .Stats import _masked_values
+
+## create list of the columns returned by risk_stats
+RISK_STATS = [
+    "max_drawdown",
+    "max_drawdown_days",
+    "var_historical",
+    "cvar_historical",
+    "var_parametric",
+    "cvar_parametric",
+    "sharpe_ratio",
+    "sortino_ratio",
+    "tracking_error",
+    "information_ratio",
+]
+
+
+## Create function to calculate drawdown, VaR/CVaR and risk-adjusted returns of all stocks at once
+@instrumentation.timed("risk.risk_stats")
+def risk_stats(
+    returns: DataFrame,
+    benchmark_returns: Series,
+    confidence: float = 0.95,
+    risk_free_rate: float = 0.0,
+    annual_trading_days: int = 252,
+    drop_zero_returns: bool = True,
+) -> DataFrame:
+    """Function to calculate downside risk and risk-adjusted return stats for all columns of a df in a single pass
+
+    All stats are computed on the whole returns matrix at once, so the cost does not depend on
+    the number of columns beyond the size of the matrix itself:
+
+    -   max_drawdown: largest loss from a peak of the cumulative returns, as negative share
+    -   max_drawdown_days: longest number of observations spent below a previous peak
+    -   var_historical / cvar_historical: daily loss not exceeded with the given confidence and the
+        mean loss beyond it, from the empirical distribution, as positive share
+    -   var_parametric / cvar_parametric: the same assuming normally distributed returns
+    -   sharpe_ratio / sortino_ratio: annualised excess return over the risk free rate per unit of
+        annualised volatility / downside deviation
+    -   tracking_error / information_ratio: annualised volatility of the returns in excess of the
+        benchmark and the annualised mean excess return per unit of it
+
+    Parameters
+    ----------
+    returns : DataFrame
+        df of daily returns, one column per stock
+    benchmark_returns : Series
+        series of daily benchmark returns
+    confidence : float, optional
+        confidence level of the VaR and CVaR, by default 0.95
+    risk_free_rate : float, optional
+        annual risk free rate of the Sharpe and Sortino ratios, by default 0.0
+    annual_trading_days : int, optional
+        number of assumed annual trading days, by default 252
+    drop_zero_returns : bool, optional
+        if True, returns data points with the value 0 will be ignored for all stats but the
+        drawdowns, as for the annualised volatility, by default True
+
+    Returns
+    -------
+    DataFrame
+        df indexed by the columns of returns with the columns in RISK_STATS
+    """
+    values = returns.to_numpy(dtype=float)
+    x_values = benchmark_returns.reindex(returns.index).to_numpy(dtype=float)[:, None]
+
+    ### drawdowns of the cumulative returns, which start at 1 and skip missing returns
+    wealth = cumprod(where(isnan(values), 1, 1 + values), axis=0)
+    peaks = maximum(maximum.accumulate(wealth, axis=0), 1)
+    drawdowns = wealth / peaks - 1
+    underwater = drawdowns < 0
+    ### observations below the last peak: the running count minus its value at the last peak
+    days_underwater = underwater.cumsum(axis=0)
+    days_since_peak = days_underwater - maximum.accumulate(
+        where(underwater, 0, days_underwater), axis=0
+    )
+
+    masked = _masked_values(returns, drop_zero_returns)
+    valid = ~isnan(masked)
+    count = valid.sum(axis=0)
+    daily_risk_free_rate = (1 + risk_free_rate) ** (1 / annual_trading_days) - 1
+    normal = NormalDist()
+    z_score = normal.inv_cdf(1 - confidence)
+
+    ### columns without valid returns give NaN, which numpy reports as warnings
+    with catch_warnings(), errstate(divide="ignore", invalid="ignore"):
+        filterwarnings("ignore", category=RuntimeWarning)
+        mean = nanmean(masked, axis=0)
+        centered = where(valid, masked - mean, 0)
+        volatility = sqrt(
+            where(count > 1, (centered**2).sum(axis=0) / (count - 1), nan)
+        )
+
+        var_historical = -_nanquantiles(masked, count, 1 - confidence)
+        cvar_historical = -nanmean(
+            where(masked <= -var_historical, masked, nan), axis=0
+        )
+        var_parametric = -(mean + z_score * volatility)
+        cvar_parametric = -(
+            mean - volatility * normal.pdf(z_score) / (1 - confidence)
+        )
+
+        excess_returns = masked - daily_risk_free_rate
+        mean_excess_return = nanmean(excess_returns, axis=0)
+        downside_deviation = sqrt(nanmean(minimum(excess_returns, 0) ** 2, axis=0))
+        sharpe_ratio = mean_excess_return / volatility * sqrt(annual_trading_days)
+        sortino_ratio = (
+            mean_excess_return / downside_deviation * sqrt(annual_trading_days)
+        )
+
+        active_returns = masked - x_values
+        active_valid = ~isnan(active_returns)
+        active_count = active_valid.sum(axis=0)
+        mean_active_return = nanmean(active_returns, axis=0)
+        active_centered = where(active_valid, active_returns - mean_active_return, 0)
+        tracking_error = sqrt(
+            where(
+                active_count > 1,
+                (active_centered**2).sum(axis=0) / (active_count - 1),
+                nan,
+            )
+        ) * sqrt(annual_trading_days)
+        information_ratio = mean_active_return * annual_trading_days / tracking_error
+
+    ### ratios without any risk (e.g. no losses for the Sortino ratio) are undefined
+    return DataFrame(
+        {
+            "max_drawdown": drawdowns.min(axis=0, initial=0),
+            "max_drawdown_days": days_since_peak.max(axis=0, initial=0),
+            "var_historical": var_historical,
+            "cvar_historical": cvar_historical,
+            "var_parametric": var_parametric,
+            "cvar_parametric": cvar_parametric,
+            "sharpe_ratio": sharpe_ratio,
+            "sortino_ratio": sortino_ratio,
+            "tracking_error": tracking_error,
+            "information_ratio": information_ratio,
+        },
+        index=returns.columns,
+    ).replace([inf, -inf], nan)
+
+
+def _nanquantiles(values, count, probability: float):
+    ### same as nanquantile(values, probability, axis=0), which loops over the columns in python;
+    ### sort moves the NaNs to the end, so the valid values of each column are its first count rows
+    sorted_values = sort(values, axis=0)
+    position = maximum(count - 1, 0) * probability
+    lower = take_along_axis(sorted_values, floor(position).astype(int)[None], axis=0)[0]
+    upper = take_along_axis(sorted_values, ceil(position).astype(int)[None], axis=0)[0]
+    quantiles = lower + (upper - lower) * (position - floor(position))
+    return where(count > 0, quantiles, nan)
@@ -0,0 +1,167 @@
+from numpy import arange, concatenate, errstate, expm1, log1p, nan, sqrt, where, zeros
+from pandas import DataFrame, MultiIndex, Series, Timestamp
+
+
+## create function to evaluate a grid of weights, benchmarks and windows at once
+def run_sweep(
+    returns: DataFrame,
+    benchmark_returns: DataFrame,
+    weights: DataFrame,
+    windows: list[tuple] | None = None,
+    annual_trading_days: int = 252,
+    drop_zero_returns: bool = True,
+    chunk_size: int = 1000,
+) -> DataFrame:
+    """Function to compute return and risk stats for every combination of weights, benchmark and window
+
+    The portfolio returns of all weight vectors are one matrix product with the return matrix.
+    Window stats are taken as differences of cumulative sums at the window boundaries, and the
+    betas of all scenarios vs. all benchmarks are one further matrix product per window. Portfolios
+    are assumed to be rebalanced daily, as in PortfolioAnalysis with the default params.
+
+    Parameters
+    ----------
+    returns : DataFrame
+        df of daily returns, one column per stock, with a DatetimeIndex
+    benchmark_returns : DataFrame
+        df of daily returns, one column per benchmark, with the same index as returns
+    weights : DataFrame
+        df of weights, one row per weighting scenario and one column per stock; missing stocks have weight 0
+    windows : list[tuple] | None, optional
+        list of (start_date, end_date) tuples, end_date exclusive and None for open ends,
+        by default None (whole period)
+    annual_trading_days : int, optional
+        number of assumed annual trading days, by default 252
+    drop_zero_returns : bool, optional
+        if True, returns data points with the value 0 will be ignored for the volatility, by default True
+    chunk_size : int, optional
+        number of weighting scenarios evaluated at once, limits memory to days x chunk_size, by default 1000
+
+    Returns
+    -------
+    DataFrame
+        tidy df with one row per (weights, benchmark, start_date, end_date) and the columns total_return,
+        benchmark_return, relative_return, volatility_annualised and beta
+    """
+    if windows is None:
+        windows = [(None, None)]
+    weight_values = (
+        weights.reindex(columns=returns.columns).fillna(0).to_numpy(dtype=float)
+    )
+    return_values = returns.fillna(0).to_numpy(dtype=float)
+    benchmark_values = (
+        benchmark_returns.reindex(returns.index).fillna(0).to_numpy(dtype=float)
+    )
+
+    ### positions of the window boundaries in the cumulative sums below
+    starts = [
+        0 if start is None else returns.index.searchsorted(Timestamp(start))
+        for start, _ in windows
+    ]
+    ends = [
+        len(returns) if end is None else returns.index.searchsorted(Timestamp(end))
+        for _, end in windows
+    ]
+
+    ### window stats have the shape windows x benchmarks and windows x scenarios
+    benchmark_log_growth = _cumulative(log1p(benchmark_values))
+    benchmark_total = expm1(benchmark_log_growth[ends] - benchmark_log_growth[starts])
+    benchmark_squares = _cumulative(benchmark_values**2)
+    benchmark_variance = benchmark_squares[ends] - benchmark_squares[starts]
+
+    stats = {
+        name: zeros((len(weights), len(windows), benchmark_values.shape[1]))
+        for name in ["total_return", "benchmark_return", "volatility_annualised", "beta"]
+    }
+    for chunk_start in range(0, len(weights), chunk_size):
+        chunk = slice(chunk_start, chunk_start + chunk_size)
+        portfolio_values = return_values @ weight_values[chunk].T
+
+        log_growth = _cumulative(log1p(portfolio_values))
+        total_return = expm1(log_growth[ends] - log_growth[starts])
+        volatility = _window_volatility(
+            portfolio_values, starts, ends, drop_zero_returns
+        ) * sqrt(annual_trading_days)
+
+        ### no-intercept betas as in Stats.betas, scenarios x benchmarks per window
+        with errstate(divide="ignore", invalid="ignore"):
+            beta = [
+                portfolio_values[start:end].T @ benchmark_values[start:end] / variance
+                for start, end, variance in zip(starts, ends, benchmark_variance)
+            ]
+
+        stats["total_return"][chunk] = total_return.T[:, :, None]
+        stats["benchmark_return"][chunk] = benchmark_total[None, :, :]
+        stats["volatility_annualised"][chunk] = volatility.T[:, :, None]
+        stats["beta"][chunk] = concatenate(
+            [window_beta[:, None, :] for window_beta in beta], axis=1
+        )
+
+    sweep = DataFrame(
+        {name: values.ravel() for name, values in stats.items()},
+        index=MultiIndex.from_product(
+            [weights.index, arange(len(windows)), benchmark_returns.columns],
+            names=["weights", "window", "benchmark"],
+        ),
+    ).reset_index()
+    sweep["start_date"] = [windows[w][0] for w in sweep["window"]]
+    sweep["end_date"] = [windows[w][1] for w in sweep["window"]]
+    sweep["relative_return"] = (1 + sweep["total_return"]) / (
+        1 + sweep["benchmark_return"]
+    ) - 1
+    return sweep[
+        [
+            "weights",
+            "benchmark",
+            "start_date",
+            "end_date",
+            "total_return",
+            "benchmark_return",
+            "relative_return",
+            "volatility_annualised",
+            "beta",
+        ]
+    ]
+
+
+def _cumulative(values):
+    ### cumulative sums with a leading row of zeros, so that window sums are cumulative[end] - cumulative[start]
+    return concatenate([zeros((1, *values.shape[1:])), values.cumsum(axis=0)])
+
+
+def _window_volatility(values, starts: list, ends: list, drop_zero_returns: bool):
+    valid = ~(values == 0) if drop_zero_returns else values == values
+    count = _cumulative(valid.astype(float))
+    ### zero returns add nothing to the sums, so only the counts depend on drop_zero_returns
+    sums = _cumulative(values)
+    sums_of_squares = _cumulative(values**2)
+
+    window_count = count[ends] - count[starts]
+    window_sums = sums[ends] - sums[starts]
+    window_squares = sums_of_squares[ends] - sums_of_squares[starts]
+    with errstate(divide="ignore", invalid="ignore"):
+        variance = (window_squares - window_sums**2 / window_count) / (window_count - 1)
+    variance = where(window_count > 1, variance, nan)
+    return sqrt(variance.clip(min=0))
+
+
+## create function to build a weights grid from named weight vectors
+def weights_grid(scenarios: dict[str, dict | Series]) -> DataFrame:
+    """Function to build the weights df of run_sweep from named weight vectors
+
+    Parameters
+    ----------
+    scenarios : dict[str, dict | Series]
+        dict mapping scenario name to a dict or series mapping ticker to weight
+
+    Returns
+    -------
+    DataFrame
+        df with one row per scenario and one column per ticker, missing weights are 0
+    """
+    grid = DataFrame.from_dict(
+        {name: Series(weights, dtype=float) for name, weights in scenarios.items()},
+        orient="index",
+    ).fillna(0)
+    grid.index.name = "weights"
+    return grid
@@ -0,0 +1,272 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from numpy import (
+    arange,
+    column_stack,
+    concatenate,
+    cumprod,
+    divide,
+    maximum,
+    minimum,
+    ndarray,
+    sqrt,
+)
+from numpy.random import Generator, SeedSequence, default_rng
+from pandas import DataFrame
+
+from ..Instrumentation import instrumentation
+
+## create list of the outcomes simulated for every path
+OUTCOMES = ["portfolio_return", "benchmark_return", "relative_return", "max_drawdown"]
+
+
+## create function to draw paths of daily returns by resampling blocks of the history
+def draw_bootstrap_paths(
+    history: ndarray,
+    n_paths: int,
+    horizon_days: int,
+    block_size: int,
+    rng: Generator,
+) -> tuple[ndarray, ndarray]:
+    """Function to draw paths of portfolio and benchmark returns as blocks of consecutive historical days
+
+    Blocks start at random days and wrap around the end of the history (circular block bootstrap),
+    so autocorrelation within a block and the co-movement of portfolio and benchmark are kept.
+
+    Parameters
+    ----------
+    history : ndarray
+        array of daily returns with the shape (days, 2), portfolio first and benchmark second
+    n_paths : int
+        number of paths
+    horizon_days : int
+        number of days per path
+    block_size : int
+        number of consecutive days per block
+    rng : Generator
+        random generator of the draws
+
+    Returns
+    -------
+    tuple[ndarray, ndarray]
+        portfolio and benchmark returns, each with the shape (n_paths, horizon_days)
+    """
+    n_blocks = -(-horizon_days // block_size)
+    starts = rng.integers(0, len(history), (n_paths, n_blocks, 1))
+    days = (starts + arange(block_size)).reshape(n_paths, -1)[:, :horizon_days]
+    ### blocks running past the last day continue with the first days of the history
+    wrapped = concatenate([history, history[arange(block_size - 1) % len(history)]])
+    return wrapped[:, 0][days], wrapped[:, 1][days]
+
+
+## create function to draw paths of daily returns from a bivariate normal distribution
+def draw_normal_paths(
+    mean: ndarray,
+    covariance: ndarray,
+    n_paths: int,
+    horizon_days: int,
+    rng: Generator,
+) -> tuple[ndarray, ndarray]:
+    """Function to draw paths of portfolio and benchmark returns from a normal distribution
+
+    Parameters
+    ----------
+    mean : ndarray
+        mean daily portfolio and benchmark return
+    covariance : ndarray
+        2 x 2 covariance matrix of the daily portfolio and benchmark returns
+    n_paths : int
+        number of paths
+    horizon_days : int
+        number of days per path
+    rng : Generator
+        random generator of the draws
+
+    Returns
+    -------
+    tuple[ndarray, ndarray]
+        portfolio and benchmark returns, each with the shape (n_paths, horizon_days)
+    """
+    ### Cholesky factor of the 2 x 2 matrix, which also holds for a riskless portfolio or benchmark
+    portfolio_scale = sqrt(max(covariance[0, 0], 0))
+    shared_scale = covariance[0, 1] / portfolio_scale if portfolio_scale else 0.0
+    benchmark_scale = sqrt(max(covariance[1, 1] - shared_scale**2, 0))
+
+    ### the shocks are scaled in place, the benchmark first as it also uses the portfolio shocks
+    portfolio_returns, benchmark_returns = rng.standard_normal((2, n_paths, horizon_days))
+    benchmark_returns *= benchmark_scale
+    benchmark_returns += shared_scale * portfolio_returns
+    benchmark_returns += mean[1]
+    portfolio_returns *= portfolio_scale
+    portfolio_returns += mean[0]
+    return portfolio_returns, benchmark_returns
+
+
+## create function to reduce paths of daily returns to their outcomes
+def path_outcomes(portfolio_returns: ndarray, benchmark_returns: ndarray) -> ndarray:
+    """Function to get the terminal returns and the max drawdown of every path
+
+    Parameters
+    ----------
+    portfolio_returns : ndarray
+        daily portfolio returns with the shape (n_paths, horizon_days)
+    benchmark_returns : ndarray
+        daily benchmark returns with the shape (n_paths, horizon_days)
+
+    Returns
+    -------
+    ndarray
+        array with the shape (n_paths, 4) and the columns in OUTCOMES
+    """
+    ### the batch arrays are updated in place to keep the memory at two arrays of the batch size
+    portfolio_growth = cumprod(1 + portfolio_returns, axis=1)
+    benchmark_growth = (1 + benchmark_returns).prod(axis=1)
+    terminal_growth = portfolio_growth[:, -1].copy()
+    peaks = maximum.accumulate(portfolio_growth, axis=1)
+    divide(portfolio_growth, maximum(peaks, 1, out=peaks), out=portfolio_growth)
+    max_drawdown = minimum(portfolio_growth.min(axis=1) - 1, 0)
+    return column_stack(
+        [
+            terminal_growth - 1,
+            benchmark_growth - 1,
+            terminal_growth / benchmark_growth - 1,
+            max_drawdown,
+        ]
+    )
+
+
+## create function to simulate one batch of paths, run on the worker processes
+def simulate_batch(task: dict) -> ndarray:
+    """Function to simulate a batch of paths, see simulate_outcomes for the keys of task
+
+    Returns
+    -------
+    ndarray
+        array with the shape (n_paths, 4) and the columns in OUTCOMES
+    """
+    rng = default_rng(task["seed"])
+    if task["method"] == "bootstrap":
+        paths = draw_bootstrap_paths(
+            task["history"],
+            task["n_paths"],
+            task["horizon_days"],
+            task["block_size"],
+            rng,
+        )
+    else:
+        paths = draw_normal_paths(
+            task["mean"],
+            task["covariance"],
+            task["n_paths"],
+            task["horizon_days"],
+            rng,
+        )
+    return path_outcomes(*paths)
+
+
+## create function to simulate the outcomes of many paths on a process pool
+@instrumentation.timed("simulation.simulate_outcomes")
+def simulate_outcomes(
+    history: DataFrame,
+    n_paths: int = 100_000,
+    horizon_days: int = 252,
+    method: str = "bootstrap",
+    block_size: int = 20,
+    covariance: DataFrame | None = None,
+    seed: int = 0,
+    batch_size: int = 10_000,
+    max_workers: int | None = None,
+) -> DataFrame:
+    """Function to simulate the terminal returns and drawdowns of a portfolio and its benchmark over a horizon
+
+    Paths are generated in batches of batch_size paths, so the memory used is bounded by
+    batch_size x horizon_days per worker (about 60 bytes per path and day) instead of growing with
+    n_paths. Every batch gets its own child of SeedSequence(seed), so the outcomes only depend on
+    seed and batch_size, not on the number of workers or the order in which batches finish.
+
+    Parameters
+    ----------
+    history : DataFrame
+        df of daily returns with the columns portfolio and benchmark
+    n_paths : int, optional
+        number of paths, by default 100_000
+    horizon_days : int, optional
+        number of trading days per path, by default 252
+    method : str, optional
+        "bootstrap" to resample blocks of historical days or "normal" to draw from a normal
+        distribution with the mean of history, by default "bootstrap"
+    block_size : int, optional
+        number of consecutive days per block of the bootstrap, by default 20
+    covariance : DataFrame | None, optional
+        2 x 2 covariance matrix of the daily portfolio and benchmark returns used by "normal",
+        by default None (covariance of history)
+    seed : int, optional
+        seed of the random draws, by default 0
+    batch_size : int, optional
+        number of paths simulated at once by a worker, by default 10_000
+    max_workers : int | None, optional
+        number of worker processes, by default None (number of CPUs); 1 simulates in the current process
+
+    Returns
+    -------
+    DataFrame
+        df with one row per path and the columns in OUTCOMES
+    """
+    assert method in ["bootstrap", "normal"], f"unknown simulation method {method}"
+    history = history[["portfolio", "benchmark"]].fillna(0)
+    if covariance is None:
+        covariance = history.cov()
+
+    batch_sizes = [
+        min(batch_size, n_paths - start) for start in range(0, n_paths, batch_size)
+    ]
+    batch_seeds = SeedSequence(seed).spawn(len(batch_sizes))
+    tasks = [
+        {
+            "method": method,
+            "history": history.to_numpy(dtype=float),
+            "mean": history.mean().to_numpy(dtype=float),
+            "covariance": covariance.to_numpy(dtype=float),
+            "n_paths": size,
+            "horizon_days": horizon_days,
+            "block_size": block_size,
+            "seed": batch_seed,
+        }
+        for size, batch_seed in zip(batch_sizes, batch_seeds)
+    ]
+
+    if max_workers == 1 or len(tasks) == 1:
+        outcomes = list(map(simulate_batch, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            outcomes = list(executor.map(simulate_batch, tasks))
+    instrumentation.count("simulated_paths", n_paths)
+    return DataFrame(concatenate(outcomes), columns=OUTCOMES).rename_axis("path")
+
+
+## create function to summarise the distribution of simulated outcomes
+def summarise_outcomes(
+    outcomes: DataFrame,
+    quantiles: tuple = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99),
+) -> DataFrame:
+    """Function to get the mean, volatility, quantiles and probability of a loss of every outcome
+
+    Parameters
+    ----------
+    outcomes : DataFrame
+        df with one row per path, as returned by simulate_outcomes
+    quantiles : tuple, optional
+        quantiles reported, by default (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+    Returns
+    -------
+    DataFrame
+        df indexed by outcome with the columns mean, std, one column per quantile (e.g. 'q5'
+        for 0.05) and probability_negative
+    """
+    summary = outcomes.quantile(list(quantiles)).T
+    summary.columns = [f"q{quantile * 100:g}" for quantile in quantiles]
+    summary.insert(0, "mean", outcomes.mean())
+    summary.insert(1, "std", outcomes.std())
+    summary["probability_negative"] = (outcomes < 0).mean()
+    return summary
@@ -0,0 +1,150 @@
+import json
+from datetime import date, datetime
+from os import makedirs, path
+
+from numpy import generic, load, save
+from pandas import DataFrame, DatetimeIndex, MultiIndex, Series
+
+## version of the snapshot layout, increased whenever files or metadata change incompatibly
+SNAPSHOT_VERSION = 1
+
+
+## create function to convert the numpy scalars and dates of records to JSON values
+def json_default(value):
+    if isinstance(value, generic):
+        return value.item()
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serialisable")
+
+
+## create function to check if a value can be stored in the snapshot header
+def json_serialisable(value) -> bool:
+    try:
+        json.dumps(value, default=json_default)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+## create function to write the data of an analysis to a snapshot directory
+def write_snapshot(
+    path_snapshot: str,
+    metadata: dict,
+    frames: dict[str, DataFrame | Series],
+    records: dict[str, DataFrame | dict],
+) -> None:
+    """Function to write frames as memory-mappable .npy files plus a metadata.json header
+
+    Every frame is stored as one float array, its index as int64 nanoseconds and its column labels
+    in the header. Small tables with mixed types (e.g. company info) are stored as JSON records.
+
+    Parameters
+    ----------
+    path_snapshot : str
+        directory of the snapshot, created if necessary
+    metadata : dict
+        JSON serialisable metadata, e.g. the analysis params
+    frames : dict[str, DataFrame | Series]
+        numeric frames with a DatetimeIndex, stored as .npy files
+    records : dict[str, DataFrame | dict]
+        small tables (stored with their index) or dicts, stored in the header
+    """
+    makedirs(path_snapshot, exist_ok=True)
+    header = {
+        "version": SNAPSHOT_VERSION,
+        "created_at": datetime.now().isoformat(),
+        "metadata": metadata,
+        "frames": {},
+        "records": {},
+    }
+
+    for name, frame in frames.items():
+        is_series = isinstance(frame, Series)
+        series_name = frame.name if is_series else None
+        frame = frame.to_frame() if is_series else frame
+        save(path.join(path_snapshot, f"{name}.npy"), frame.to_numpy(dtype=float))
+        save(
+            path.join(path_snapshot, f"{name}_index.npy"),
+            DatetimeIndex(frame.index).asi8,
+        )
+        header["frames"][name] = {
+            "series": is_series,
+            "series_name": series_name,
+            "index_name": frame.index.name,
+            "column_names": list(frame.columns.names),
+            "columns": frame.columns.tolist(),
+        }
+
+    for name, record in records.items():
+        if isinstance(record, DataFrame):
+            data = record.reset_index()
+            header["records"][name] = {
+                "index_column": data.columns[0],
+                "index_name": record.index.name,
+                "data": data.to_dict("records"),
+            }
+        else:
+            header["records"][name] = {"data": record}
+
+    with open(path.join(path_snapshot, "metadata.json"), "w") as file:
+        json.dump(header, file, default=json_default, indent=1)
+
+
+## create function to read a snapshot directory written by write_snapshot
+def read_snapshot(path_snapshot: str, mmap: bool = True) -> dict:
+    """Function to read a snapshot directory
+
+    Parameters
+    ----------
+    path_snapshot : str
+        directory of the snapshot
+    mmap : bool, optional
+        if True, the arrays are memory-mapped read-only instead of read into memory, by default True
+
+    Returns
+    -------
+    dict
+        dict with the keys 'metadata', 'frames' and 'records' and the objects written by write_snapshot
+    """
+    with open(path.join(path_snapshot, "metadata.json")) as file:
+        header = json.load(file)
+    if header.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(
+            f"snapshot version {header.get('version')} is not supported, expected {SNAPSHOT_VERSION}"
+        )
+
+    mmap_mode = "r" if mmap else None
+    frames = {}
+    for name, layout in header["frames"].items():
+        values = load(path.join(path_snapshot, f"{name}.npy"), mmap_mode=mmap_mode)
+        index = DatetimeIndex(
+            load(path.join(path_snapshot, f"{name}_index.npy")),
+            name=layout["index_name"],
+        )
+        if len(layout["column_names"]) > 1:
+            columns = MultiIndex.from_tuples(
+                [tuple(column) for column in layout["columns"]],
+                names=layout["column_names"],
+            )
+        else:
+            columns = layout["columns"]
+        frame = DataFrame(values, index=index, columns=columns, copy=False)
+        if len(layout["column_names"]) == 1:
+            frame.columns.name = layout["column_names"][0]
+        if layout["series"]:
+            frame = frame.iloc[:, 0].rename(layout["series_name"])
+        frames[name] = frame
+
+    records = {}
+    for name, record in header["records"].items():
+        if "index_column" in record:
+            records[name] = (
+                DataFrame(record["data"])
+                .set_index(record["index_column"])
+                .rename_axis(record["index_name"])
+            )
+        else:
+            records[name] = record["data"]
+
+    return {"metadata": header["metadata"], "frames": frames, "records": records}
@@ -1,6 +1,7 @@
-from numpy import sqrt
-from pandas import Series
-from sklearn.linear_model import LinearRegression
+from numpy import concatenate, errstate, full, isnan, nan, nanmean, sqrt, where, zeros
+from pandas import DataFrame, Series, concat
+
+from ..Instrumentation import instrumentation
 
 
 ## Create function to calculate stock betas vs. given benchmark
@@ -19,19 +20,46 @@ def beta(x: Series, y: Series) -> float | None:
     float
         returns beta as float
     """
-    beta = (
-        LinearRegression(fit_intercept=False)
-        .fit(x.values.reshape(-1, 1), y.values.reshape(-1, 1))
-        .coef_.item()
-    )
+    beta = betas(x, y.to_frame()).item()
     return beta
 
 
+## Create function to calculate betas of all stocks vs. given benchmark at once
+@instrumentation.timed("stats.betas")
+def betas(x: Series, y: DataFrame) -> Series:
+    """Function to calculate stock betas for all columns of a df in a single pass
+
+    Betas are the slopes of a least-squares fit without intercept, i.e. sum(x*y) / sum(x*x).
+    Observations where either the benchmark or the stock return is missing are ignored.
+
+    Parameters
+    ----------
+    x : Series
+        X series (i.e. benchmark)
+    y : DataFrame
+        Y df (i.e. one column per stock)
+
+    Returns
+    -------
+    Series
+        series containing the beta of each column of y
+    """
+    x_values = x.reindex(y.index).to_numpy(dtype=float)[:, None]
+    y_values = y.to_numpy(dtype=float)
+    valid = ~isnan(x_values) & ~isnan(y_values)
+    x_values = where(valid, x_values, 0)
+    y_values = where(valid, y_values, 0)
+
+    with errstate(divide="ignore", invalid="ignore"):
+        stock_betas = (x_values * y_values).sum(axis=0) / (x_values**2).sum(axis=0)
+    return Series(stock_betas, index=y.columns, name="beta")
+
+
 ## Create function to calculate annualised volatility of stocks
 def annualised_volatility(
     returns: Series, annual_trading_days: int = 252, drop_zero_returns: bool = True
 ) -> float | None:
-    """_summary_
+    """Function to calculate the annualised volatility of a stock
 
     Parameters
     ----------
@@ -42,8 +70,229 @@ def annualised_volatility(
     drop_zero_returns : bool, optional
         if True, returns data points witht the value 0 will be ignored, by default True
     """
+    annualised_volatility = annualised_volatilities(
+        returns.to_frame(), annual_trading_days, drop_zero_returns
+    ).item()
+    return annualised_volatility
+
+
+## Create function to calculate annualised volatility of all stocks at once
+@instrumentation.timed("stats.annualised_volatilities")
+def annualised_volatilities(
+    returns: DataFrame, annual_trading_days: int = 252, drop_zero_returns: bool = True
+) -> Series:
+    """Function to calculate the annualised volatility for all columns of a df in a single pass
+
+    Parameters
+    ----------
+    returns : DataFrame
+        df of returns, one column per stock
+    annual_trading_days : int, optional
+        number of assumed annual trading days, by default 252
+    drop_zero_returns : bool, optional
+        if True, returns data points witht the value 0 will be ignored, by default True
+
+    Returns
+    -------
+    Series
+        series containing the annualised volatility of each column
+    """
+    values = _masked_values(returns, drop_zero_returns)
+    valid = ~isnan(values)
+    count = valid.sum(axis=0)
+
+    with errstate(divide="ignore", invalid="ignore"):
+        centered = where(valid, values - nanmean(values, axis=0), 0)
+        variance = (centered**2).sum(axis=0) / (count - 1)
+    variance = where(count > 1, variance, nan)
+    return Series(
+        sqrt(variance) * sqrt(annual_trading_days),
+        index=returns.columns,
+        name="volatility_annualised",
+    )
+
+
+## Create function to calculate the covariance matrix of stock returns
+@instrumentation.timed("stats.covariances")
+def covariances(returns: DataFrame, drop_zero_returns: bool = False) -> DataFrame:
+    """Function to calculate the pairwise covariance matrix of all columns of a df
+
+    Each pair of columns only uses the observations where both are available, matching
+    DataFrame.cov, but computed with a few matrix products instead of per-pair loops.
+
+    Parameters
+    ----------
+    returns : DataFrame
+        df of returns, one column per stock
+    drop_zero_returns : bool, optional
+        if True, returns data points witht the value 0 will be ignored, by default False
+
+    Returns
+    -------
+    DataFrame
+        covariance matrix with the columns of returns as index and columns
+    """
+    covariance, _, _ = _pairwise_moments(returns, drop_zero_returns)
+    return DataFrame(covariance, index=returns.columns, columns=returns.columns)
 
+
+## Create function to calculate the correlation matrix of stock returns
+@instrumentation.timed("stats.correlations")
+def correlations(returns: DataFrame, drop_zero_returns: bool = False) -> DataFrame:
+    """Function to calculate the pairwise correlation matrix of all columns of a df
+
+    Parameters
+    ----------
+    returns : DataFrame
+        df of returns, one column per stock
+    drop_zero_returns : bool, optional
+        if True, returns data points witht the value 0 will be ignored, by default False
+
+    Returns
+    -------
+    DataFrame
+        correlation matrix with the columns of returns as index and columns
+    """
+    covariance, variance_rows, variance_columns = _pairwise_moments(
+        returns, drop_zero_returns
+    )
+    with errstate(divide="ignore", invalid="ignore"):
+        correlation = covariance / sqrt(variance_rows * variance_columns)
+    return DataFrame(correlation, index=returns.columns, columns=returns.columns)
+
+
+## Create function to calculate rolling risk stats of all stocks vs. given benchmark
+@instrumentation.timed("stats.rolling_stats")
+def rolling_stats(
+    returns: DataFrame,
+    benchmark_returns: Series,
+    window: int = 63,
+    annual_trading_days: int = 252,
+    drop_zero_returns: bool = True,
+) -> DataFrame:
+    """Function to calculate rolling beta, volatility, tracking error and correlation for all columns of a df
+
+    All window statistics are derived from running sums (cumulative sums differenced
+    over the window), so the cost is linear in the number of observations regardless
+    of the window length. Windows containing fewer than two valid observations are NaN.
+
+    Parameters
+    ----------
+    returns : DataFrame
+        df of returns, one column per stock
+    benchmark_returns : Series
+        series of benchmark returns
+    window : int, optional
+        number of observations per window, by default 63
+    annual_trading_days : int, optional
+        number of assumed annual trading days, by default 252
+    drop_zero_returns : bool, optional
+        if True, returns data points witht the value 0 will be ignored for the volatility, by default True
+
+    Returns
+    -------
+    DataFrame
+        df with the same index as returns and two column levels (stat, stock)
+    """
+    y_values = returns.to_numpy(dtype=float)
+    x_values = benchmark_returns.reindex(returns.index).to_numpy(dtype=float)[:, None]
+    annualisation = sqrt(annual_trading_days)
+
+    ### volatility of the stocks themselves, optionally ignoring zero returns
+    volatility = _rolling_std(_masked_values(returns, drop_zero_returns), window)
+
+    ### all other stats use the observations where stock and benchmark are available
+    valid = ~isnan(x_values) & ~isnan(y_values)
+    count = _rolling_sum(valid.astype(float), window)
+    x_paired = where(valid, x_values, 0)
+    y_paired = where(valid, y_values, 0)
+    with errstate(divide="ignore", invalid="ignore"):
+        beta = _rolling_sum(x_paired * y_paired, window) / _rolling_sum(
+            x_paired**2, window
+        )
+
+        x_centered = where(valid, x_values - nanmean(x_values), 0)
+        y_centered = where(valid, y_values - nanmean(y_values, axis=0), 0)
+        x_sum = _rolling_sum(x_centered, window)
+        y_sum = _rolling_sum(y_centered, window)
+        x_squares = _rolling_sum(x_centered**2, window)
+        y_squares = _rolling_sum(y_centered**2, window)
+        x_variance = x_squares - x_sum**2 / count
+        y_variance = y_squares - y_sum**2 / count
+        covariance = _rolling_sum(x_centered * y_centered, window) - x_sum * y_sum / count
+        correlation = covariance / sqrt(x_variance * y_variance)
+        ### constant windows leave rounding noise instead of a zero variance, their correlation
+        ### is undefined as with DataFrame.rolling
+        constant = (x_variance <= 1e-12 * x_squares) | (y_variance <= 1e-12 * y_squares)
+        correlation[constant] = nan
+        tracking_variance = (y_variance + x_variance - 2 * covariance) / (count - 1)
+        tracking_error = sqrt(tracking_variance.clip(min=0))
+
+    few_observations = ~(count >= 2)
+    beta[few_observations] = nan
+    correlation[few_observations] = nan
+    tracking_error[few_observations] = nan
+
+    stats = {
+        "beta": beta,
+        "volatility_annualised": volatility * annualisation,
+        "tracking_error_annualised": tracking_error * annualisation,
+        "correlation": correlation,
+    }
+    return concat(
+        {
+            name: DataFrame(values, index=returns.index, columns=returns.columns)
+            for name, values in stats.items()
+        },
+        axis=1,
+        names=["stat", returns.columns.name],
+    )
+
+
+def _rolling_sum(values, window: int):
+    ### difference of cumulative sums: O(n) independent of window length
+    cumulative = concatenate([zeros((1, *values.shape[1:])), values.cumsum(axis=0)])
+    window_sums = full(values.shape, nan)
+    if window <= values.shape[0]:
+        window_sums[window - 1 :] = cumulative[window:] - cumulative[:-window]
+    return window_sums
+
+
+def _rolling_std(values, window: int):
+    valid = ~isnan(values)
+    with errstate(divide="ignore", invalid="ignore"):
+        centered = where(valid, values - nanmean(values, axis=0), 0)
+        count = _rolling_sum(valid.astype(float), window)
+        sums = _rolling_sum(centered, window)
+        variance = (_rolling_sum(centered**2, window) - sums**2 / count) / (count - 1)
+    variance = where(count > 1, variance, nan)
+    return sqrt(variance.clip(min=0))
+
+
+def _masked_values(returns: DataFrame, drop_zero_returns: bool):
+    values = returns.to_numpy(dtype=float, copy=True)
     if drop_zero_returns:
-        returns = returns.replace(0, None)
-    annualised_volatility = returns.std() * sqrt(annual_trading_days)
-    return annualised_volatility
+        values[values == 0] = nan
+    return values
+
+
+def _pairwise_moments(returns: DataFrame, drop_zero_returns: bool):
+    values = _masked_values(returns, drop_zero_returns)
+    valid = ~isnan(values)
+    mask = valid.astype(float)
+
+    ### centering does not change covariances but avoids cancellation in the sums below
+    with errstate(invalid="ignore"):
+        centered = where(valid, values - nanmean(values, axis=0), 0)
+
+    count = mask.T @ mask
+    sums = centered.T @ mask
+    sums_of_squares = (centered**2).T @ mask
+    sums_of_products = centered.T @ centered
+
+    with errstate(divide="ignore", invalid="ignore"):
+        covariance = (sums_of_products - sums * sums.T / count) / (count - 1)
+        variance_rows = (sums_of_squares - sums**2 / count) / (count - 1)
+    covariance = where(count > 1, covariance, nan)
+    variance_rows = where(count > 1, variance_rows, nan)
+    return covariance, variance_rows, variance_rows.T
@@ -0,0 +1,241 @@
+from os import makedirs, path
+from typing import Callable, Iterable, Iterator
+
+from numpy import zeros
+from pandas import DataFrame, Series, concat
+
+from ..Instrumentation import instrumentation
+from .Risk import risk_stats
+from .Stats import annualised_volatilities, betas
+
+## estimated peak bytes per returns cell (date x ticker) of a block while it is loaded and its
+## stats are computed: OHLC download, returns and the masked and centered copies of the stats
+BYTES_PER_CELL = 160
+
+
+## create function to size the column blocks for a memory budget
+def block_size_for_budget(n_dates: int, memory_budget_mb: float) -> int:
+    """Function to get the number of tickers per block that keeps a block within a memory budget
+
+    Parameters
+    ----------
+    n_dates : int
+        number of dates of each block
+    memory_budget_mb : float
+        memory in MB that the processing of one block may use
+
+    Returns
+    -------
+    int
+        number of tickers per block, at least 1
+    """
+    return max(1, int(memory_budget_mb * 1024**2 // (max(n_dates, 1) * BYTES_PER_CELL)))
+
+
+## create generator of column blocks of returns
+def iter_column_blocks(
+    load_block: Callable[[list], DataFrame], tickers: list, block_size: int
+) -> Iterator[DataFrame]:
+    """Generator loading the returns of the tickers in column blocks of block_size tickers
+
+    Parameters
+    ----------
+    load_block : Callable[[list], DataFrame]
+        function returning the returns df of a list of tickers
+    tickers : list
+        list of all tickers
+    block_size : int
+        number of tickers per block
+
+    Yields
+    ------
+    DataFrame
+        returns df of the next block, one column per ticker
+    """
+    for start in range(0, len(tickers), block_size):
+        with instrumentation.stage("streaming.load_block"):
+            block = load_block(tickers[start : start + block_size])
+        instrumentation.count("streamed_blocks")
+        yield block
+
+
+class RunningStats:
+    """Running aggregates of constituent returns streamed in column blocks
+
+    Every block is reduced to the stats of its constituents (total and relative return, annualised
+    volatility, beta vs. the benchmark and the risk stats of Risk.risk_stats) and its contribution
+    to the daily portfolio return, so only one block of returns is held in memory at a time. The stats equal those of
+    PortfolioAnalysis.get_constituents_stats for a daily rebalanced portfolio.
+
+    Parameters
+    ----------
+    portfolio : DataFrame
+        df indexed by ticker with a 'weight' column
+    benchmark_returns : Series
+        daily benchmark returns, whose index all blocks share
+    annual_trading_days : int, optional
+        number of assumed annual trading days, by default 252
+    confidence : float, optional
+        confidence level of the VaR and CVaR, by default 0.95
+    risk_free_rate : float, optional
+        annual risk free rate of the Sharpe and Sortino ratios, by default 0.0
+    """
+
+    def __init__(
+        self,
+        portfolio: DataFrame,
+        benchmark_returns: Series,
+        annual_trading_days: int = 252,
+        confidence: float = 0.95,
+        risk_free_rate: float = 0.0,
+    ):
+        self.portfolio = portfolio
+        self.benchmark_returns = benchmark_returns
+        self.annual_trading_days = annual_trading_days
+        self.confidence = confidence
+        self.risk_free_rate = risk_free_rate
+        self.benchmark_total_return = (1 + benchmark_returns).prod() - 1
+        self.portfolio_return_sum = zeros(len(benchmark_returns))
+        self.n_constituents = 0
+
+    def update(self, returns: DataFrame) -> DataFrame:
+        """Function to add a block of constituent returns to the aggregates
+
+        Parameters
+        ----------
+        returns : DataFrame
+            df of daily returns of some constituents, indexed like benchmark_returns
+
+        Returns
+        -------
+        DataFrame
+            constituents stats of the block, with the columns of the portfolio df plus total_return,
+            relative_return, volatility_annualised, beta and the columns in Risk.RISK_STATS
+        """
+        with instrumentation.stage("streaming.update"):
+            weights = returns.columns.map(self.portfolio["weight"]).to_numpy(float)
+            self.portfolio_return_sum += returns.fillna(0).to_numpy(float) @ weights
+            self.n_constituents += returns.shape[1]
+
+            total_returns = ((1 + returns).prod(min_count=1) - 1).rename("total_return")
+            relative_returns = (
+                (1 + total_returns) / (1 + self.benchmark_total_return) - 1
+            ).rename("relative_return")
+            block_stats = concat(
+                [
+                    self.portfolio[self.portfolio.index.isin(returns.columns)],
+                    total_returns,
+                    relative_returns,
+                    annualised_volatilities(returns, self.annual_trading_days),
+                    betas(self.benchmark_returns, returns),
+                    self.get_risk_stats(returns),
+                ],
+                axis=1,
+            )
+        return block_stats
+
+    def stream(self, blocks: Iterable[DataFrame]) -> Iterator[DataFrame]:
+        """Generator passing blocks of constituent returns through update
+
+        Parameters
+        ----------
+        blocks : Iterable[DataFrame]
+            blocks of constituent returns, e.g. from iter_column_blocks
+
+        Yields
+        ------
+        DataFrame
+            constituents stats of the next block
+        """
+        for block in blocks:
+            yield self.update(block)
+
+    @property
+    def portfolio_returns(self) -> Series:
+        """Daily returns of the (daily rebalanced) portfolio from all blocks added so far"""
+        return Series(self.portfolio_return_sum, index=self.benchmark_returns.index)
+
+    def get_risk_stats(self, returns: DataFrame | None = None) -> DataFrame:
+        """Function to get the risk stats of Risk.risk_stats
+
+        Parameters
+        ----------
+        returns : DataFrame | None, optional
+            df of daily returns, by default None (the portfolio returns of all blocks added so far)
+
+        Returns
+        -------
+        DataFrame
+            df indexed by the columns of returns, or 'portfolio', with the columns in Risk.RISK_STATS
+        """
+        if returns is None:
+            returns = self.portfolio_returns.to_frame("portfolio")
+        return risk_stats(
+            returns,
+            self.benchmark_returns,
+            self.confidence,
+            self.risk_free_rate,
+            self.annual_trading_days,
+        )
+
+    def get_return_overview_cumulative(self) -> DataFrame:
+        """Function to get a df containing cumulative portfolio and benchmark returns
+
+        Returns
+        -------
+        DataFrame
+            df with the columns portfolio_return and benchmark_return
+        """
+        return_overview_daily = DataFrame(
+            {
+                "portfolio_return": self.portfolio_returns,
+                "benchmark_return": self.benchmark_returns,
+            }
+        )
+        return (1 + return_overview_daily).cumprod() - 1
+
+
+class CsvBlockWriter:
+    """Writer appending dfs to one csv file, with the header written before the first df only
+
+    Parameters
+    ----------
+    file_path : str
+        path of the csv file, which is overwritten
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.rows_written = 0
+        makedirs(path.dirname(file_path) or ".", exist_ok=True)
+        open(file_path, "w").close()
+
+    def write(self, df: DataFrame, index: bool = True) -> None:
+        with instrumentation.stage("streaming.write_csv"):
+            df.to_csv(
+                self.file_path, mode="a", header=self.rows_written == 0, index=index
+            )
+        self.rows_written += len(df)
+        instrumentation.count("rows_written", len(df))
+
+
+## create function to turn a block of returns into rows of (date, ticker, return)
+def returns_to_long(returns: DataFrame) -> DataFrame:
+    """Function to reshape a returns df to one row per date and ticker, which can be appended block by block
+
+    Parameters
+    ----------
+    returns : DataFrame
+        df of daily returns, one column per ticker
+
+    Returns
+    -------
+    DataFrame
+        df with the columns date, ticker and return, without missing returns
+    """
+    return (
+        returns.rename_axis(index="date", columns="ticker")
+        .stack()
+        .rename("return")
+        .reset_index()
+    )
@@ -0,0 +1,435 @@
+import json
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from os import makedirs, path
+from time import time
+from typing import Callable
+
+import pandas as pd
+
+from ..Instrumentation import instrumentation
+from .Yahoo import OHLC_FIELDS
+
+## create table definitions for the price cache
+PRICE_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    ticker TEXT NOT NULL,
+    date TEXT NOT NULL,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    PRIMARY KEY (ticker, date)
+);
+CREATE TABLE IF NOT EXISTS coverage (
+    ticker TEXT PRIMARY KEY,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL
+);
+"""
+
+## create table definition for the company info cache
+INFO_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS company_info (
+    ticker TEXT PRIMARY KEY,
+    info TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+
+def resolve_cache_file(path_cache: str) -> str:
+    """Function to resolve the SQLite file used by the caches
+
+    Parameters
+    ----------
+    path_cache : str
+        path to the SQLite file, or to a directory in which 'cache.sqlite' is created
+
+    Returns
+    -------
+    str
+        path to the SQLite file
+    """
+    if path.isdir(path_cache) or not path.splitext(str(path_cache))[1]:
+        makedirs(path_cache, exist_ok=True)
+        path_cache = path.join(path_cache, "cache.sqlite")
+    return str(path_cache)
+
+
+@contextmanager
+def connect(path_cache: str):
+    """Context manager yielding a SQLite connection that is committed and closed on exit"""
+    con = sqlite3.connect(path_cache)
+    try:
+        with con:
+            yield con
+    finally:
+        con.close()
+
+
+class PriceCache:
+    """Persistent SQLite cache for daily adjusted OHLC data
+
+    For every ticker the cache remembers the date range [start_date, end_date) that has
+    already been requested from the source, so that later requests only download the
+    missing ranges before and after it. Adjusted prices change retroactively after
+    splits and dividends: whenever the tail of a ticker is topped up, the last cached
+    close is compared with the freshly downloaded one and the full history of the
+    ticker is re-fetched if they differ.
+
+    Parameters
+    ----------
+    path_cache : str
+        path to the SQLite file, or to a directory in which 'cache.sqlite' is created
+    source : Callable | None, optional
+        function with the signature of Utils.Sourcing.Yahoo.download_ohlc, by default None (Yahoo Finance)
+    tolerance : float, optional
+        relative difference between cached and downloaded closes above which a ticker is re-fetched, by default 1e-6
+    """
+
+    def __init__(
+        self,
+        path_cache: str,
+        source: Callable | None = None,
+        tolerance: float = 1e-6,
+    ):
+        self.path_cache = resolve_cache_file(path_cache)
+
+        if source is None:
+            from .Yahoo import download_ohlc
+
+            source = download_ohlc
+        self.source = source
+        self.tolerance = tolerance
+
+        with self._connect() as con:
+            con.executescript(PRICE_CACHE_SCHEMA)
+
+    def _connect(self):
+        return connect(self.path_cache)
+
+    def get_ohlc(
+        self,
+        tickers: list | str,
+        start_date: str,
+        end_date: str | None = None,
+    ) -> pd.DataFrame:
+        """Function to get daily OHLC data, downloading only ranges missing from the cache
+
+        Parameters
+        ----------
+        tickers : list | str
+            list of tickers or ticker as str
+        start_date : str
+            First observation date as string in format 'YYYY-MM-DD'
+        end_date : str | None, optional
+            Last observation date (exclusive) as string in format 'YYYY-MM-DD', by default None (converted to today's date)
+
+        Returns
+        -------
+        pd.DataFrame
+            DataFrame with two column levels (field, ticker) and a DatetimeIndex
+        """
+        if type(tickers) == str:
+            tickers = [tickers]
+
+        start_date = pd.Timestamp(start_date).strftime("%Y-%m-%d")
+        today = datetime.now().strftime("%Y-%m-%d")
+        ### today's bar is still moving, so the cache never covers it
+        end_date = min(pd.Timestamp(end_date or today).strftime("%Y-%m-%d"), today)
+
+        with instrumentation.stage("sourcing.price_cache"):
+            self.update(tickers, start_date, end_date)
+            return self.read(tickers, start_date, end_date)
+
+    def update(self, tickers: list, start_date: str, end_date: str) -> None:
+        """Function to download all ranges of [start_date, end_date) not yet covered by the cache
+
+        Parameters
+        ----------
+        tickers : list
+            list of tickers
+        start_date : str
+            First observation date as string in format 'YYYY-MM-DD'
+        end_date : str
+            Last observation date (exclusive) as string in format 'YYYY-MM-DD'
+        """
+        coverage = self.get_coverage(tickers)
+
+        ### group tickers by missing range, so that each range is downloaded in one batch
+        missing_ranges = {}
+        for ticker in tickers:
+            if ticker not in coverage.index:
+                missing_ranges.setdefault((start_date, end_date), []).append(ticker)
+                continue
+            cov_start, cov_end = coverage.loc[ticker, ["start_date", "end_date"]]
+            if start_date < cov_start:
+                missing_ranges.setdefault((start_date, cov_start), []).append(ticker)
+            if end_date > cov_end:
+                missing_ranges.setdefault((cov_end, end_date), []).append(ticker)
+
+        missing_tickers = {
+            ticker for range_tickers in missing_ranges.values() for ticker in range_tickers
+        }
+        instrumentation.count("price_cache_hits", len(tickers) - len(missing_tickers))
+        instrumentation.count("price_cache_misses", len(missing_tickers))
+
+        for (range_start, range_end), range_tickers in missing_ranges.items():
+            self._top_up(range_tickers, range_start, range_end, coverage)
+
+    def _top_up(
+        self,
+        tickers: list,
+        start_date: str,
+        end_date: str,
+        coverage: pd.DataFrame,
+    ) -> None:
+        last_cached = self._last_cached_close(tickers, before=start_date)
+        ### re-download the last cached bar as well to detect re-adjusted histories
+        if last_cached.empty:
+            download_start = start_date
+        else:
+            download_start = min(last_cached["date"])
+        download = self.source(tickers, download_start, end_date)
+
+        readjusted = []
+        if not last_cached.empty and not download.empty:
+            downloaded_close = download["Close"].stack().rename("new_close")
+            downloaded_close.index.names = ["date", "ticker"]
+            downloaded_close = downloaded_close.reset_index()
+            downloaded_close["date"] = downloaded_close["date"].dt.strftime("%Y-%m-%d")
+            compared = last_cached.merge(downloaded_close, on=["date", "ticker"])
+            deviation = (compared["new_close"] / compared["close"] - 1).abs()
+            readjusted = compared.loc[deviation > self.tolerance, "ticker"].tolist()
+
+        if readjusted:
+            full_start = min(
+                [start_date] + coverage.reindex(readjusted)["start_date"].dropna().tolist()
+            )
+            self.invalidate(readjusted)
+            self._store(
+                self.source(readjusted, full_start, end_date),
+                readjusted,
+                full_start,
+                end_date,
+            )
+
+        remaining = [ticker for ticker in tickers if ticker not in readjusted]
+        if remaining:
+            self._store(download, remaining, start_date, end_date)
+
+    def _last_cached_close(self, tickers: list, before: str) -> pd.DataFrame:
+        placeholders = ",".join("?" * len(tickers))
+        query = f"""
+            SELECT ticker, MAX(date) AS date, close
+            FROM prices
+            WHERE ticker IN ({placeholders}) AND date < ?
+            GROUP BY ticker
+        """
+        with self._connect() as con:
+            return pd.read_sql_query(query, con, params=[*tickers, before])
+
+    def _store(
+        self, ohlc: pd.DataFrame, tickers: list, start_date: str, end_date: str
+    ) -> None:
+        ### tickers missing from a non-empty download failed (e.g. dropped by a FetchScheduler)
+        ### and are not marked as covered, so that they are requested again next time
+        covered_tickers = tickers
+        if not ohlc.empty:
+            covered_tickers = [
+                ticker for ticker in tickers if ticker in ohlc.columns.get_level_values(1)
+            ]
+            ohlc = ohlc.loc[:, ohlc.columns.get_level_values(1).isin(tickers)]
+            rows = ohlc.stack(level=1).dropna(how="all").reset_index()
+            rows.columns = ["date", "ticker", *[c.lower() for c in rows.columns[2:]]]
+            rows["date"] = pd.to_datetime(rows["date"]).dt.strftime("%Y-%m-%d")
+            rows = rows[(rows["date"] >= start_date) & (rows["date"] < end_date)]
+            records = list(
+                rows[["ticker", "date", "open", "high", "low", "close"]].itertuples(
+                    index=False, name=None
+                )
+            )
+        else:
+            records = []
+
+        with self._connect() as con:
+            con.executemany(
+                "INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?, ?, ?)",
+                records,
+            )
+            con.executemany(
+                """
+                INSERT INTO coverage VALUES (?, ?, ?)
+                ON CONFLICT(ticker) DO UPDATE SET
+                    start_date = MIN(start_date, excluded.start_date),
+                    end_date = MAX(end_date, excluded.end_date)
+                """,
+                [(ticker, start_date, end_date) for ticker in covered_tickers],
+            )
+
+    def read(self, tickers: list, start_date: str, end_date: str) -> pd.DataFrame:
+        """Function to read cached OHLC data without downloading anything
+
+        Parameters
+        ----------
+        tickers : list
+            list of tickers
+        start_date : str
+            First observation date as string in format 'YYYY-MM-DD'
+        end_date : str
+            Last observation date (exclusive) as string in format 'YYYY-MM-DD'
+
+        Returns
+        -------
+        pd.DataFrame
+            DataFrame with two column levels (field, ticker) and a DatetimeIndex
+        """
+        placeholders = ",".join("?" * len(tickers))
+        query = f"""
+            SELECT date, ticker, open, high, low, close
+            FROM prices
+            WHERE ticker IN ({placeholders}) AND date >= ? AND date < ?
+        """
+        with self._connect() as con:
+            rows = pd.read_sql_query(
+                query, con, params=[*tickers, start_date, end_date]
+            )
+        rows["date"] = pd.to_datetime(rows["date"])
+        rows.columns = ["Date", "ticker", *OHLC_FIELDS]
+
+        ohlc = rows.pivot(index="Date", columns="ticker", values=OHLC_FIELDS)
+        ohlc = ohlc.reindex(
+            columns=pd.MultiIndex.from_product([OHLC_FIELDS, tickers])
+        )
+        return ohlc
+
+    def get_coverage(self, tickers: list | None = None) -> pd.DataFrame:
+        """Function to get the date ranges already covered by the cache
+
+        Parameters
+        ----------
+        tickers : list | None, optional
+            list of tickers, by default None (all cached tickers)
+
+        Returns
+        -------
+        pd.DataFrame
+            df indexed by ticker with the covered start_date and (exclusive) end_date
+        """
+        query = "SELECT ticker, start_date, end_date FROM coverage"
+        params = []
+        if tickers is not None:
+            query += f" WHERE ticker IN ({','.join('?' * len(tickers))})"
+            params = list(tickers)
+        with self._connect() as con:
+            coverage = pd.read_sql_query(query, con, params=params)
+        return coverage.set_index("ticker")
+
+    def invalidate(self, tickers: list | str | None = None) -> None:
+        """Function to drop cached data, e.g. after a split or dividend re-adjustment
+
+        Parameters
+        ----------
+        tickers : list | str | None, optional
+            list of tickers or ticker as str to drop, by default None (drop everything)
+        """
+        if type(tickers) == str:
+            tickers = [tickers]
+
+        with self._connect() as con:
+            if tickers is None:
+                con.execute("DELETE FROM prices")
+                con.execute("DELETE FROM coverage")
+            else:
+                placeholders = ",".join("?" * len(tickers))
+                con.execute(f"DELETE FROM prices WHERE ticker IN ({placeholders})", tickers)
+                con.execute(
+                    f"DELETE FROM coverage WHERE ticker IN ({placeholders})", tickers
+                )
+
+
+class InfoCache:
+    """Persistent SQLite cache for company (or index) info with a time-to-live
+
+    Parameters
+    ----------
+    path_cache : str
+        path to the SQLite file, or to a directory in which 'cache.sqlite' is created
+    ttl_days : float, optional
+        number of days after which a cached entry is fetched again, by default 7
+    """
+
+    def __init__(self, path_cache: str, ttl_days: float = 7):
+        self.path_cache = resolve_cache_file(path_cache)
+        self.ttl_days = ttl_days
+
+        with self._connect() as con:
+            con.executescript(INFO_CACHE_SCHEMA)
+
+    def _connect(self):
+        return connect(self.path_cache)
+
+    def get_many(self, tickers: list) -> dict:
+        """Function to get all cached info entries that have not expired yet
+
+        Parameters
+        ----------
+        tickers : list
+            list of tickers
+
+        Returns
+        -------
+        dict
+            dict mapping ticker to its cached info dict
+        """
+        placeholders = ",".join("?" * len(tickers))
+        oldest_valid = time() - self.ttl_days * 86400
+        with self._connect() as con:
+            rows = con.execute(
+                f"""
+                SELECT ticker, info FROM company_info
+                WHERE ticker IN ({placeholders}) AND fetched_at >= ?
+                """,
+                [*tickers, oldest_valid],
+            ).fetchall()
+        instrumentation.count("info_cache_hits", len(rows))
+        instrumentation.count("info_cache_misses", len(set(tickers)) - len(rows))
+        return {ticker: json.loads(info) for ticker, info in rows}
+
+    def put_many(self, infos: list[dict]) -> None:
+        """Function to store info dicts as returned by Utils.Sourcing.Yahoo.fetch_company_info
+
+        Parameters
+        ----------
+        infos : list[dict]
+            list of info dicts, each containing a 'ticker' key
+        """
+        fetched_at = time()
+        with self._connect() as con:
+            con.executemany(
+                "INSERT OR REPLACE INTO company_info VALUES (?, ?, ?)",
+                [(info["ticker"], json.dumps(info), fetched_at) for info in infos],
+            )
+
+    def invalidate(self, tickers: list | str | None = None) -> None:
+        """Function to drop cached info entries
+
+        Parameters
+        ----------
+        tickers : list | str | None, optional
+            list of tickers or ticker as str to drop, by default None (drop everything)
+        """
+        if type(tickers) == str:
+            tickers = [tickers]
+
+        with self._connect() as con:
+            if tickers is None:
+                con.execute("DELETE FROM company_info")
+            else:
+                placeholders = ",".join("?" * len(tickers))
+                con.execute(
+                    f"DELETE FROM company_info WHERE ticker IN ({placeholders})",
+                    tickers,
+                )
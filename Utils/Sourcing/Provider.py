@@ -0,0 +1,356 @@
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime
+from functools import cached_property
+from os import makedirs, path
+
+import numpy as np
+import pandas as pd
+
+from ..Instrumentation import instrumentation
+from .Scheduler import FetchScheduler
+from .Synthetic import synthetic_company_info, synthetic_ohlc
+from .Yahoo import OHLC_FIELDS, download_ohlc, fetch_company_info, returns_from_ohlc
+
+logger = logging.getLogger(__name__)
+
+## create list of the company info fields stored by LocalFileProvider
+INFO_FIELDS = ["name", "sector", "market_cap_usd", "country"]
+
+
+class DataProvider(ABC):
+    """Interface of the sources of OHLC data, returns and company info
+
+    download_ohlc and fetch_company_info share the signatures and output layouts of the functions
+    in Utils.Sourcing.Yahoo, so a provider can be used as source of Utils.Sourcing.Cache.PriceCache
+    and of Utils.Sourcing.Scheduler.FetchScheduler.
+
+    Attributes
+    ----------
+    remote : bool
+        True if the data is fetched over the network, in which case it is worth caching on disk
+    scheduler_defaults : dict
+        FetchScheduler params suited to the provider, overridden by params["fetch_scheduler"]
+    """
+
+    remote = True
+    scheduler_defaults = {}
+
+    @abstractmethod
+    def download_ohlc(
+        self, tickers: list | str, start_date: str, end_date: str | None = None
+    ) -> pd.DataFrame:
+        """Function to get daily OHLC data, see Utils.Sourcing.Yahoo.download_ohlc"""
+
+    @abstractmethod
+    def fetch_company_info(self, ticker: str) -> dict:
+        """Function to get company info, see Utils.Sourcing.Yahoo.fetch_company_info"""
+
+    def download_returns(
+        self, tickers: list | str, start_date: str, end_date: str | None = None
+    ) -> pd.DataFrame:
+        """Function to get daily close-to-close returns, see Utils.Sourcing.Yahoo.returns_from_ohlc"""
+        return returns_from_ohlc(self.download_ohlc(tickers, start_date, end_date))
+
+    def create_scheduler(self, **options) -> FetchScheduler:
+        """Function to create a FetchScheduler sending its requests to this provider
+
+        Parameters
+        ----------
+        **options
+            FetchScheduler params, overriding scheduler_defaults
+
+        Returns
+        -------
+        FetchScheduler
+            scheduler with the provider as ohlc and info source
+        """
+        return FetchScheduler(
+            **{
+                "ohlc_source": self.download_ohlc,
+                "info_source": self.fetch_company_info,
+            }
+            | self.scheduler_defaults
+            | options
+        )
+
+
+class YahooProvider(DataProvider):
+    """Provider fetching from Yahoo Finance through yfinance, the default of the project"""
+
+    def download_ohlc(
+        self, tickers: list | str, start_date: str, end_date: str | None = None
+    ) -> pd.DataFrame:
+        return download_ohlc(tickers, start_date, end_date)
+
+    def fetch_company_info(self, ticker: str) -> dict:
+        return fetch_company_info(ticker)
+
+
+class SyntheticProvider(DataProvider):
+    """Provider generating synthetic data without network access, see Utils.Sourcing.Synthetic
+
+    Parameters
+    ----------
+    seed : int, optional
+        seed of the random paths, by default 0
+    holiday_share : float, optional
+        share of business days without prices, by default 0.02
+    """
+
+    remote = False
+    scheduler_defaults = {"rate": None, "retries": 0, "chunk_size": None}
+
+    def __init__(self, seed: int = 0, holiday_share: float = 0.02):
+        self.seed = seed
+        self.holiday_share = holiday_share
+
+    def download_ohlc(
+        self, tickers: list | str, start_date: str, end_date: str | None = None
+    ) -> pd.DataFrame:
+        return synthetic_ohlc(
+            tickers, start_date, end_date, self.seed, self.holiday_share
+        )
+
+    def fetch_company_info(self, ticker: str) -> dict:
+        return synthetic_company_info(ticker)
+
+
+class LocalFileProvider(DataProvider):
+    """Provider reading vendor price files from a local directory
+
+    The directory holds one file per OHLC field (Open, High, Low and Close) with one column per
+    ticker and the dates as first column named 'Date', plus an optional info.csv with the columns
+    ticker, name, sector, market_cap_usd and country. Only the requested tickers and dates are read:
+
+    -   'npy': arrays stored column-major and memory-mapped, plus dates.npy and tickers.npy, so only
+        the pages of the requested tickers are read from disk
+    -   'parquet': read column-wise with the date range pushed down to the file (requires pyarrow)
+    -   'csv': only the requested columns are parsed, the date range is selected afterwards
+
+    Parameters
+    ----------
+    path_store : str
+        directory of the files
+    file_format : str | None, optional
+        'npy', 'parquet' or 'csv', by default None (detected from the files, 'npy' for a new directory)
+    """
+
+    remote = False
+    scheduler_defaults = {"rate": None, "retries": 0, "chunk_size": None}
+    file_formats = ["npy", "parquet", "csv"]
+
+    def __init__(self, path_store: str, file_format: str | None = None):
+        self.path_store = path_store
+        if file_format is None:
+            file_format = next(
+                (
+                    candidate
+                    for candidate in self.file_formats
+                    if path.exists(self.field_file("Close", candidate))
+                ),
+                "npy",
+            )
+        assert (
+            file_format in self.file_formats
+        ), f"file_format must be one of {self.file_formats}, got {file_format}"
+        self.file_format = file_format
+
+    def field_file(self, field: str, file_format: str | None = None) -> str:
+        return path.join(self.path_store, f"{field}.{file_format or self.file_format}")
+
+    def download_ohlc(
+        self, tickers: list | str, start_date: str, end_date: str | None = None
+    ) -> pd.DataFrame:
+        """Function to read daily OHLC data of the tickers available in the files
+
+        Parameters
+        ----------
+        tickers : list | str
+            list of tickers or ticker as str
+        start_date : str
+            First observation date as string in format 'YYYY-MM-DD'
+        end_date : str | None, optional
+            Last observation date (exclusive) as string in format 'YYYY-MM-DD', by default None (today)
+
+        Returns
+        -------
+        pd.DataFrame
+            DataFrame with two column levels (field, ticker) and a DatetimeIndex; tickers missing
+            from the files are missing from the columns
+        """
+        if not end_date:
+            end_date = datetime.now().strftime("%Y-%m-%d")
+        if type(tickers) == str:
+            tickers = [tickers]
+        start_date, end_date = pd.Timestamp(start_date), pd.Timestamp(end_date)
+
+        read_field = {
+            "npy": self.read_npy,
+            "parquet": self.read_parquet,
+            "csv": self.read_csv,
+        }[self.file_format]
+        with instrumentation.stage("sourcing.read_local_files"):
+            ohlc = pd.concat(
+                {
+                    field: read_field(field, tickers, start_date, end_date)
+                    for field in OHLC_FIELDS
+                },
+                axis=1,
+            )
+        ohlc.index = pd.DatetimeIndex(ohlc.index, name="Date")
+        instrumentation.count("local_rows_read", len(ohlc))
+        return ohlc.dropna(how="all")
+
+    def read_npy(
+        self,
+        field: str,
+        tickers: list,
+        start_date: pd.Timestamp,
+        end_date: pd.Timestamp,
+    ) -> pd.DataFrame:
+        dates = np.load(path.join(self.path_store, "dates.npy"))
+        stored_tickers = pd.Index(np.load(path.join(self.path_store, "tickers.npy")))
+        positions = stored_tickers.get_indexer(tickers)
+        positions = positions[positions >= 0]
+        first, last = np.searchsorted(dates, [start_date.value, end_date.value])
+
+        values = np.load(self.field_file(field), mmap_mode="r")
+        return pd.DataFrame(
+            values[first:last, positions],
+            index=pd.DatetimeIndex(dates[first:last]),
+            columns=stored_tickers[positions],
+        )
+
+    def read_parquet(
+        self,
+        field: str,
+        tickers: list,
+        start_date: pd.Timestamp,
+        end_date: pd.Timestamp,
+    ) -> pd.DataFrame:
+        ### pyarrow is an optional dependency, only needed for parquet files
+        from pyarrow.parquet import read_schema
+
+        stored_tickers = set(read_schema(self.field_file(field)).names)
+        return pd.read_parquet(
+            self.field_file(field),
+            columns=[ticker for ticker in tickers if ticker in stored_tickers],
+            filters=[("Date", ">=", start_date), ("Date", "<", end_date)],
+            memory_map=True,
+        )
+
+    def read_csv(
+        self,
+        field: str,
+        tickers: list,
+        start_date: pd.Timestamp,
+        end_date: pd.Timestamp,
+    ) -> pd.DataFrame:
+        requested = set(tickers) | {"Date"}
+        frame = pd.read_csv(
+            self.field_file(field),
+            usecols=lambda column: column in requested,
+            index_col="Date",
+            parse_dates=True,
+        )
+        return frame.loc[(frame.index >= start_date) & (frame.index < end_date)]
+
+    @cached_property
+    def company_info(self) -> pd.DataFrame:
+        """Company info of all tickers in info.csv, indexed by ticker"""
+        return pd.read_csv(path.join(self.path_store, "info.csv"), index_col="ticker")
+
+    def fetch_company_info(self, ticker: str) -> dict:
+        """Function to read the company info of a ticker from info.csv
+
+        Parameters
+        ----------
+        ticker : str
+            ticker for which to read info
+
+        Returns
+        -------
+        dict
+            dict containing ticker, name, sector, market cap (usd), and country
+
+        Raises
+        ------
+        KeyError
+            if the ticker is not in info.csv
+        """
+        info = self.company_info.loc[ticker].reindex(INFO_FIELDS)
+        return {"ticker": ticker} | info.astype(object).where(info.notna(), None).to_dict()
+
+    def write(
+        self, ohlc: pd.DataFrame, company_info: pd.DataFrame | None = None
+    ) -> None:
+        """Function to write OHLC data and company info to the directory in the provider's format
+
+        Parameters
+        ----------
+        ohlc : pd.DataFrame
+            DataFrame with two column levels (field, ticker), as returned by download_ohlc
+        company_info : pd.DataFrame | None, optional
+            df indexed by ticker with the fields of fetch_company_info, by default None (not written)
+        """
+        makedirs(self.path_store, exist_ok=True)
+        ohlc = ohlc.sort_index()
+        for field in OHLC_FIELDS:
+            values = ohlc[field].rename_axis("Date").rename_axis(None, axis=1)
+            if self.file_format == "npy":
+                np.save(self.field_file(field), np.asfortranarray(values.to_numpy(float)))
+            elif self.file_format == "parquet":
+                values.to_parquet(self.field_file(field))
+            else:
+                values.to_csv(self.field_file(field))
+        if self.file_format == "npy":
+            np.save(
+                path.join(self.path_store, "dates.npy"),
+                pd.DatetimeIndex(ohlc.index).asi8,
+            )
+            np.save(
+                path.join(self.path_store, "tickers.npy"),
+                ohlc["Close"].columns.to_numpy(str),
+            )
+        if company_info is not None:
+            company_info.rename_axis("ticker").reindex(columns=INFO_FIELDS).to_csv(
+                path.join(self.path_store, "info.csv")
+            )
+        self.__dict__.pop("company_info", None)
+        logger.info(f"local data saved here: {self.path_store}")
+
+
+## create dict of the providers selectable by name in params["data_provider"]
+PROVIDERS = {
+    "yahoo": YahooProvider,
+    "local": LocalFileProvider,
+    "synthetic": SyntheticProvider,
+}
+
+
+## create function to create the provider given in the params
+def get_provider(spec: DataProvider | dict | str | None = None) -> DataProvider:
+    """Function to create a data provider from params["data_provider"]
+
+    Parameters
+    ----------
+    spec : DataProvider | dict | str | None, optional
+        a provider, the name of a provider in PROVIDERS, or a dict with its name under 'name' and its
+        params, e.g. {"name": "local", "path_store": "Input/prices"}, by default None (Yahoo Finance)
+
+    Returns
+    -------
+    DataProvider
+        the provider
+    """
+    if isinstance(spec, DataProvider):
+        return spec
+    if spec is None:
+        spec = "yahoo"
+    if isinstance(spec, str):
+        spec = {"name": spec}
+    options = dict(spec)
+    name = options.pop("name")
+    assert name in PROVIDERS, f"unknown data provider {name}, expected one of {list(PROVIDERS)}"
+    return PROVIDERS[name](**options)
@@ -0,0 +1,283 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from random import uniform
+from threading import Lock
+from time import monotonic, sleep
+from typing import Callable
+
+import pandas as pd
+
+from ..Instrumentation import instrumentation
+from .Yahoo import OHLC_FIELDS, download_ohlc, fetch_company_info
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the rate of requests
+
+    Parameters
+    ----------
+    rate : float
+        number of tokens added per second, i.e. the sustained request rate
+    capacity : int
+        maximum number of tokens, i.e. the number of requests that may be sent in a burst
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = monotonic()
+        self.lock = Lock()
+
+    def __getstate__(self) -> dict:
+        ### locks cannot be pickled, e.g. when an analysis is sent to a worker process
+        return {key: value for key, value in self.__dict__.items() if key != "lock"}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.lock = Lock()
+
+    def acquire(self) -> float:
+        """Function to take a token, waiting until one is available
+
+        Returns
+        -------
+        float
+            seconds waited
+        """
+        with self.lock:
+            now = monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated_at) * self.rate
+            )
+            self.updated_at = now
+            ### the token is taken right away, a negative balance is the queue of waiting requests
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            sleep(wait)
+        return wait
+
+
+class FetchScheduler:
+    """Scheduler sending data requests with rate limiting, retries and per-ticker failure reports
+
+    Large ticker lists are split into chunks that are downloaded in parallel. Every request
+    takes a token of a shared token bucket first, failed requests are retried with exponential
+    backoff, and tickers still failing after all retries are recorded in failures instead of
+    aborting the run, so the caller continues with partial data.
+
+    Parameters
+    ----------
+    rate : float | None, optional
+        sustained number of requests per second, None for no rate limit (e.g. local files), by default 5
+    burst : int, optional
+        number of requests that may be sent at once, by default 10
+    retries : int, optional
+        number of retries after a failed request, by default 3
+    backoff : float, optional
+        seconds waited before the first retry, doubled for every further retry, by default 0.5
+    max_backoff : float, optional
+        maximum seconds waited before a retry, by default 30
+    chunk_size : int | None, optional
+        number of tickers per download request, None for a single request, by default 50
+    max_workers : int, optional
+        number of parallel download requests, by default 4
+    ohlc_source : Callable | None, optional
+        function with the signature of Utils.Sourcing.Yahoo.download_ohlc, by default None (Yahoo Finance)
+    info_source : Callable | None, optional
+        function with the signature of Utils.Sourcing.Yahoo.fetch_company_info, by default None (Yahoo Finance)
+    """
+
+    def __init__(
+        self,
+        rate: float | None = 5,
+        burst: int = 10,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 30,
+        chunk_size: int | None = 50,
+        max_workers: int = 4,
+        ohlc_source: Callable | None = None,
+        info_source: Callable | None = None,
+    ):
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.ohlc_source = ohlc_source or download_ohlc
+        self.info_source = info_source or fetch_company_info
+        self.failures = []
+        self.lock = Lock()
+
+    def __getstate__(self) -> dict:
+        return {key: value for key, value in self.__dict__.items() if key != "lock"}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.lock = Lock()
+
+    def wait_before_retry(self, attempt: int) -> None:
+        """Function to wait with exponential backoff and jitter before retry number attempt (1, 2, ...)"""
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        sleep(delay * uniform(0.5, 1))
+
+    def record_failure(
+        self, ticker: str, dataset: str, attempts: int, error: str
+    ) -> None:
+        logger.warning(f"failed to fetch {dataset} of {ticker}: {error}")
+        instrumentation.count(f"failed_{dataset}_fetches")
+        with self.lock:
+            self.failures.append(
+                {"ticker": ticker, "dataset": dataset, "attempts": attempts, "error": error}
+            )
+
+    def failure_report(self) -> pd.DataFrame:
+        """Function to get all tickers that could not be fetched
+
+        Returns
+        -------
+        pd.DataFrame
+            df with one row per failed ticker and dataset, with the columns ticker, dataset ('ohlc' or
+            'info'), attempts and error
+        """
+        with self.lock:
+            return pd.DataFrame(
+                self.failures, columns=["ticker", "dataset", "attempts", "error"]
+            )
+
+    def download_ohlc(
+        self,
+        tickers: list | str,
+        start_date: str,
+        end_date: str | None = None,
+    ) -> pd.DataFrame:
+        """Function to download daily OHLC data in parallel chunks, retrying failed tickers
+
+        Shares the signature and output layout of Utils.Sourcing.Yahoo.download_ohlc, so it can be
+        passed as source of Utils.Sourcing.Cache.PriceCache. Tickers that fail after all retries
+        are missing from the columns and recorded in failures.
+
+        Parameters
+        ----------
+        tickers : list | str
+            list of tickers or ticker as str
+        start_date : str
+            First observation date as string in format 'YYYY-MM-DD'
+        end_date : str | None, optional
+            Last observation date (exclusive) as string in format 'YYYY-MM-DD', by default None (today)
+
+        Returns
+        -------
+        pd.DataFrame
+            DataFrame with two column levels (field, ticker) and a DatetimeIndex
+        """
+        if type(tickers) == str:
+            tickers = [tickers]
+        chunk_size = self.chunk_size or max(len(tickers), 1)
+        chunks = [
+            tickers[i : i + chunk_size] for i in range(0, len(tickers), chunk_size)
+        ]
+
+        def download_chunk(chunk: list) -> pd.DataFrame | None:
+            return self.download_chunk(chunk, start_date, end_date)
+
+        if len(chunks) == 1:
+            downloads = [download_chunk(chunks[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                downloads = list(executor.map(download_chunk, chunks))
+
+        downloads = [download for download in downloads if download is not None]
+        if not downloads:
+            return pd.DataFrame(
+                columns=pd.MultiIndex.from_product([OHLC_FIELDS, []]),
+                index=pd.DatetimeIndex([], name="Date"),
+                dtype=float,
+            )
+        ohlc = pd.concat(downloads, axis=1)
+        received_tickers = [
+            ticker for ticker in tickers if ticker in ohlc.columns.get_level_values(1)
+        ]
+        return ohlc.reindex(
+            columns=pd.MultiIndex.from_product([OHLC_FIELDS, received_tickers])
+        ).sort_index()
+
+    def download_chunk(
+        self, tickers: list, start_date: str, end_date: str | None = None
+    ) -> pd.DataFrame | None:
+        """Function to download one chunk of tickers, retrying the tickers without data
+
+        A ticker counts as failed if the request raises, or if it returns no prices for it. yfinance
+        returns a frame without rows if all tickers of a request failed, which is retried as well.
+
+        Returns
+        -------
+        pd.DataFrame | None
+            DataFrame with the tickers received, None if none was received
+        """
+        pending, received, error = list(tickers), [], None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.wait_before_retry(attempt)
+                instrumentation.count("retries")
+            if self.bucket:
+                self.bucket.acquire()
+            try:
+                download = self.ohlc_source(pending, start_date, end_date)
+            except Exception as e:
+                error = repr(e)
+                continue
+            if download.empty:
+                error = "no data returned"
+                continue
+
+            has_data = download["Close"].notna().any()
+            succeeded = [ticker for ticker in pending if has_data.get(ticker, False)]
+            received.append(
+                download.loc[:, download.columns.get_level_values(1).isin(succeeded)]
+            )
+            pending = [ticker for ticker in pending if ticker not in succeeded]
+            error = "no data returned"
+            if not pending:
+                break
+
+        for ticker in pending:
+            self.record_failure(ticker, "ohlc", self.retries + 1, error)
+        if received:
+            return pd.concat(received, axis=1)
+
+    def fetch_company_info(self, ticker: str) -> dict:
+        """Function to fetch the company info of a ticker with rate limiting and retries
+
+        Parameters
+        ----------
+        ticker : str
+            ticker for which to fetch info
+
+        Returns
+        -------
+        dict
+            info dict as returned by Utils.Sourcing.Yahoo.fetch_company_info
+
+        Raises
+        ------
+        Exception
+            the last error if all attempts failed; the failure is recorded before
+        """
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.wait_before_retry(attempt)
+                instrumentation.count("retries")
+            if self.bucket:
+                self.bucket.acquire()
+            try:
+                return self.info_source(ticker)
+            except Exception as e:
+                error = e
+        self.record_failure(ticker, "info", self.retries + 1, repr(error))
+        raise error
@@ -0,0 +1,109 @@
+from datetime import datetime
+from zlib import crc32
+
+import numpy as np
+import pandas as pd
+
+from .Yahoo import OHLC_FIELDS
+
+## create lists of the sectors and countries assigned to synthetic tickers
+SYNTHETIC_SECTORS = [
+    "Technology",
+    "Healthcare",
+    "Financial Services",
+    "Consumer Defensive",
+    "Industrials",
+    "Energy",
+]
+SYNTHETIC_COUNTRIES = ["Switzerland", "United States", "Germany", "Japan"]
+
+
+def synthetic_ohlc(
+    tickers: list | str,
+    start_date: str,
+    end_date: str | None = None,
+    seed: int = 0,
+    holiday_share: float = 0.02,
+) -> pd.DataFrame:
+    """Function to generate daily OHLC data without network access, e.g. for benchmarks or offline use
+
+    Shares the signature and output layout of Utils.Sourcing.Yahoo.download_ohlc, so it can be
+    passed as source of Utils.Sourcing.Cache.PriceCache. Close prices follow a geometric random
+    walk; each ticker gets its own reproducible path (derived from seed and ticker), so the
+    prices of a ticker do not depend on the other tickers requested.
+
+    Parameters
+    ----------
+    tickers : list | str
+        list of tickers or ticker as str
+    start_date : str
+        First observation date as string in format 'YYYY-MM-DD'
+    end_date : str | None, optional
+        Last observation date (exclusive) as string in format 'YYYY-MM-DD', by default None (converted to today's date)
+    seed : int, optional
+        seed of the random paths, by default 0
+    holiday_share : float, optional
+        share of business days without prices, set independently per ticker, by default 0.02
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame with two column levels (field, ticker) and a DatetimeIndex
+    """
+    if not end_date:
+        end_date = datetime.now().strftime("%Y-%m-%d")
+
+    if type(tickers) == str:
+        tickers = [tickers]
+
+    dates = pd.bdate_range(start_date, pd.Timestamp(end_date) - pd.Timedelta(days=1))
+    dates = pd.DatetimeIndex(dates.to_numpy(), name="Date")
+    fields = {field: np.empty((len(dates), len(tickers))) for field in OHLC_FIELDS}
+    for i, ticker in enumerate(tickers):
+        rng = np.random.default_rng([seed, crc32(ticker.encode())])
+        drift, volatility = rng.uniform(-0.0002, 0.0006), rng.uniform(0.008, 0.025)
+        log_returns = rng.normal(drift, volatility, len(dates))
+        close = rng.uniform(20, 500) * np.exp(log_returns.cumsum())
+        open_ = close * np.exp(rng.normal(0, volatility / 3, len(dates)))
+        spread = np.abs(rng.normal(0, volatility / 2, (2, len(dates))))
+        holidays = rng.random(len(dates)) < holiday_share
+
+        fields["Open"][:, i] = open_
+        fields["High"][:, i] = np.maximum(open_, close) * np.exp(spread[0])
+        fields["Low"][:, i] = np.minimum(open_, close) * np.exp(-spread[1])
+        fields["Close"][:, i] = close
+        for values in fields.values():
+            values[holidays, i] = np.nan
+
+    ohlc = pd.concat(
+        {
+            field: pd.DataFrame(values, index=dates, columns=tickers)
+            for field, values in fields.items()
+        },
+        axis=1,
+    )
+    return ohlc.dropna(how="all")
+
+
+def synthetic_company_info(ticker: str) -> dict:
+    """Function to generate company info shaped like Utils.Sourcing.Yahoo.fetch_company_info
+
+    Parameters
+    ----------
+    ticker : str
+        ticker for which to generate info
+
+    Returns
+    -------
+    dict
+        dict containing ticker, name, sector, market cap (usd), and country
+    """
+    ticker_hash = crc32(ticker.encode())
+    info = {
+        "ticker": ticker,
+        "name": f"{ticker} Synthetic Inc.",
+        "sector": SYNTHETIC_SECTORS[ticker_hash % len(SYNTHETIC_SECTORS)],
+        "market_cap_usd": float(ticker_hash % 1000 + 1) * 1e8,
+        "country": SYNTHETIC_COUNTRIES[ticker_hash // 7 % len(SYNTHETIC_COUNTRIES)],
+    }
+    return info
@@ -1,16 +1,26 @@
+import logging
 import os as os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import pandas as pd
-import yfinance as yf
 
+from ..Instrumentation import instrumentation
 
-def fetch_ohlc(
+logger = logging.getLogger(__name__)
+
+OHLC_FIELDS = ["Open", "High", "Low", "Close"]
+
+
+def download_ohlc(
     tickers: list | str,
     start_date: str,
     end_date: str | None = None,
-) -> pd.DataFrame | None:
-    """Function to fetch daily OHLC data from Yahoo Finance through yfinance
+) -> pd.DataFrame:
+    """Function to download daily adjusted OHLC data from Yahoo Finance through yfinance
+
+    This is the default download source of Utils.Sourcing.Cache.PriceCache. Any
+    replacement source has to share its signature and output layout.
 
     Parameters
     ----------
@@ -19,33 +29,84 @@ def fetch_ohlc(
     start_date : str
         First observation date as string in format 'YYYY-MM-DD'
     end_date : str | None, optional
-        Last observation date as string in format 'YYYY-MM-DD', by default None (converted to today's date)
+        Last observation date (exclusive) as string in format 'YYYY-MM-DD', by default None (converted to today's date)
 
     Returns
     -------
-    pd.DataFrame | None
-        DataFrame with Open, High, Low, Close, and Volume
+    pd.DataFrame
+        DataFrame with two column levels (field, ticker) and a DatetimeIndex
     """
     if not end_date:
-        end_date = pd.to_datetime("today")
+        end_date = datetime.now().strftime("%Y-%m-%d")
 
     if type(tickers) == str:
         tickers = [tickers]
 
-    ohlc_data = yf.download(
-        tickers, start=start_date, end=end_date, auto_adjust=True, progress=False
+    ### yfinance is only imported once data is requested, as it takes long to import
+    import yfinance as yf
+
+    with instrumentation.stage("sourcing.download_ohlc"):
+        temp_download = yf.download(
+            tickers, start=start_date, end=end_date, auto_adjust=True, progress=False
+        )
+    instrumentation.count("network_calls")
+    instrumentation.count("downloaded_rows", len(temp_download))
+    instrumentation.count(
+        "downloaded_bytes", int(temp_download.memory_usage(deep=True).sum())
     )
+    ### yfinance drops the ticker level if a single ticker is requested
+    if temp_download.columns.nlevels == 1:
+        temp_download.columns = pd.MultiIndex.from_product(
+            [temp_download.columns, tickers]
+        )
+    temp_download.index = pd.to_datetime(temp_download.index)
+
+    return temp_download[OHLC_FIELDS]
+
 
-    ohlc_data.index = pd.to_datetime(ohlc_data.index)
+def fetch_ohlc(
+    tickers: list | str,
+    start_date: str,
+    end_date: str | None = None,
+    cache=None,
+    scheduler=None,
+) -> pd.DataFrame | None:
+    """Function to fetch daily OHLC data from Yahoo Finance through yfinance
+
+    Parameters
+    ----------
+    tickers : list | str
+        list of Yahoo tickers or Yahoo ticker as str
+    start_date : str
+        First observation date as string in format 'YYYY-MM-DD'
+    end_date : str | None, optional
+        Last observation date as string in format 'YYYY-MM-DD', by default None (converted to today's date)
+    cache : PriceCache | None, optional
+        Utils.Sourcing.Cache.PriceCache used to serve and store the data, by default None (always download)
+    scheduler : FetchScheduler | None, optional
+        Utils.Sourcing.Scheduler.FetchScheduler sending the downloads if no cache is given (a cache
+        uses its own source), by default None (one direct request)
+
+    Returns
+    -------
+    pd.DataFrame | None
+        DataFrame with Open, High, Low, Close
+    """
+    if cache is not None:
+        return cache.get_ohlc(tickers, start_date, end_date)
+    if scheduler is not None:
+        return scheduler.download_ohlc(tickers, start_date, end_date)
 
-    return ohlc_data[["Open", "High", "Low", "Close"]]
+    return download_ohlc(tickers, start_date, end_date)
 
 
 def fetch_returns(
     tickers: list | str,
     start_date: str,
     end_date: str | None = None,
-) -> pd.DataFrame | None:
+    cache=None,
+    scheduler=None,
+) -> pd.DataFrame:
     """Function to fetch daily total returns data from Yahoo Finance through yfinance
 
     Parameters
@@ -56,34 +117,41 @@ def fetch_returns(
         First oberservation date as string in format 'YYYY-MM-DD'
     end_date : str | None, optional
         Last oberservation date as string in format 'YYYY-MM-DD', by default None (converted to today's date)
+    cache : PriceCache | None, optional
+        Utils.Sourcing.Cache.PriceCache used to serve and store the data, by default None (always download)
+    scheduler : FetchScheduler | None, optional
+        Utils.Sourcing.Scheduler.FetchScheduler sending the downloads, see fetch_ohlc, by default None
 
     Returns
     -------
-    pd.DataFrame | None
-        df containing returns for all tickers
+    pd.DataFrame
+        df containing returns for all tickers, indexed by date (DatetimeIndex)
     """
-    if not end_date:
-        end_date = datetime.now().strftime("%Y-%m-%d")
+    ohlc = fetch_ohlc(tickers, start_date, end_date, cache=cache, scheduler=scheduler)
+    return returns_from_ohlc(ohlc)
 
-    if type(tickers) == str:
-        tickers = [tickers]
 
-    temp_download = yf.download(
-        tickers, start=start_date, end=end_date, auto_adjust=True, progress=False
-    )
-    temp_close = temp_download.iloc[
-        :, temp_download.columns.get_level_values(0) == "Close"
-    ]
-    if temp_close.columns.nlevels == 2:
-        temp_close.columns = temp_close.columns.droplevel(0)
-    else:
-        temp_close.columns = tickers
-    temp_close.index = pd.to_datetime(temp_close.index).strftime("%Y-%m-%d")
+def returns_from_ohlc(ohlc: pd.DataFrame) -> pd.DataFrame:
+    """Function to derive daily close-to-close returns from OHLC data
 
-    returns = temp_close.ffill().pct_change().dropna(how="all")
+    Parameters
+    ----------
+    ohlc : pd.DataFrame
+        DataFrame with two column levels (field, ticker), as returned by fetch_ohlc
 
-    if not returns.empty:
-        return returns
+    Returns
+    -------
+    pd.DataFrame
+        df containing returns for all tickers, indexed by date (DatetimeIndex), empty if there are
+        no prices (e.g. all tickers failed to download)
+    """
+    if ohlc.empty or "Close" not in ohlc.columns.get_level_values(0):
+        return pd.DataFrame(index=pd.DatetimeIndex([], name="date"), dtype=float)
+    temp_close = ohlc["Close"].copy()
+    temp_close.index = pd.DatetimeIndex(temp_close.index, name="date")
+
+    returns = temp_close.ffill().pct_change().dropna(how="all")
+    return returns
 
 
 def fetch_company_info(ticker: str) -> dict:
@@ -99,8 +167,13 @@ def fetch_company_info(ticker: str) -> dict:
     dict
         dict containing ticker, name, sector, market cap (usd), and country (if available)
     """
-    yf_ticker = yf.Ticker(ticker)
-    temp_info = yf_ticker.info
+    import yfinance as yf
+
+    with instrumentation.stage("sourcing.fetch_company_info"):
+        yf_ticker = yf.Ticker(ticker)
+        temp_info = yf_ticker.info
+    instrumentation.count("network_calls")
+    instrumentation.count("downloaded_bytes", len(repr(temp_info)))
     info = {
         "ticker": ticker,
         "name": temp_info.get("longName"),
@@ -109,3 +182,65 @@ def fetch_company_info(ticker: str) -> dict:
         "country": temp_info.get("country"),
     }
     return info
+
+
+def fetch_company_info_many(
+    tickers: list,
+    max_workers: int = 8,
+    cache=None,
+    scheduler=None,
+) -> list[dict]:
+    """Function to fetch company (or index) info for many tickers concurrently
+
+    Tickers are fetched on a bounded thread pool. A failing ticker does not affect the
+    others: its info fields are set to None and a warning is logged instead.
+
+    Parameters
+    ----------
+    tickers : list
+        list of tickers for which to fetch info
+    max_workers : int, optional
+        maximum number of concurrent requests, by default 8
+    cache : InfoCache | None, optional
+        Utils.Sourcing.Cache.InfoCache used to serve and store the info, by default None (always fetch)
+    scheduler : FetchScheduler | None, optional
+        Utils.Sourcing.Scheduler.FetchScheduler adding rate limiting and retries to every request,
+        by default None (one attempt per ticker)
+
+    Returns
+    -------
+    list[dict]
+        list of info dicts as returned by fetch_company_info, in the order of tickers
+    """
+    infos = cache.get_many(tickers) if cache is not None else {}
+    missing_tickers = [ticker for ticker in tickers if ticker not in infos]
+
+    def fetch_isolated(ticker: str) -> tuple[dict, bool]:
+        try:
+            if scheduler is not None:
+                return scheduler.fetch_company_info(ticker), True
+            return fetch_company_info(ticker), True
+        except Exception as e:
+            ### the scheduler reports its failures itself
+            if scheduler is None:
+                logger.warning(f"failed to fetch info for {ticker}: {e!r}")
+                instrumentation.count("failed_info_fetches")
+            empty_info = {
+                "ticker": ticker,
+                "name": None,
+                "sector": None,
+                "market_cap_usd": None,
+                "country": None,
+            }
+            return empty_info, False
+
+    if missing_tickers:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(fetch_isolated, missing_tickers))
+
+        for info, _ in results:
+            infos[info["ticker"]] = info
+        if cache is not None:
+            cache.put_many([info for info, succeeded in results if succeeded])
+
+    return [infos[ticker] for ticker in tickers]
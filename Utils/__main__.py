@@ -0,0 +1,161 @@
+"""Command line entry point of the portfolio analysis, an alternative to PortfolioAnalyser.ipynb
+
+    python -m Utils run --portfolio Input/portfolio.xlsx --out Output --start-date 2023-01-01 --benchmark ^SPX
+    python -m Utils refresh --portfolio Input/portfolio.xlsx --out Output --start-date 2023-01-01 --benchmark ^SPX --interval 3600
+
+'run' analyses the portfolio once and writes the Excel output (and optionally the charts).
+'refresh' does the same and then keeps the analysis in memory: every --interval seconds it
+fetches only the days published since the last tick, extends the outputs incrementally (see
+PortfolioAnalysis.refresh) and rewrites them if days were added.
+"""
+import json
+import logging
+from argparse import ArgumentParser, Namespace
+from os import makedirs
+from time import sleep
+
+from pandas import read_excel
+
+from .Instrumentation import configure_logging, instrumentation
+from .Portfolio.Portfolio import PortfolioAnalysis
+
+logger = logging.getLogger("Utils.cli")
+
+
+## create function to parse the command line arguments
+def parse_args(args: list[str] | None = None) -> Namespace:
+    parser = ArgumentParser(
+        prog="python -m Utils", description=__doc__.splitlines()[0]
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for command, help_text in [
+        ("run", "analyse the portfolio once and write the outputs"),
+        ("refresh", "keep the analysis in memory and append new days periodically"),
+    ]:
+        subparser = subparsers.add_parser(command, help=help_text)
+        subparser.add_argument(
+            "--portfolio",
+            required=True,
+            help="xlsx file with the tickers as first column and a 'weight' column",
+        )
+        subparser.add_argument("--out", default="Output", help="output directory")
+        subparser.add_argument(
+            "--input", default="Input", help="input directory with template.xlsx"
+        )
+        subparser.add_argument(
+            "--params",
+            help="JSON file with further analysis params, see PortfolioAnalyser.ipynb",
+        )
+        subparser.add_argument(
+            "--start-date", help="first observation date, YYYY-MM-DD"
+        )
+        subparser.add_argument(
+            "--end-date",
+            help="last observation date (exclusive), YYYY-MM-DD, by default today",
+        )
+        subparser.add_argument("--benchmark", help="ticker of the benchmark, e.g. ^SPX")
+        subparser.add_argument("--cache", help="directory of the price and info cache")
+        subparser.add_argument(
+            "--output-name",
+            default="portfolio_overview",
+            help="name of the xlsx output",
+        )
+        subparser.add_argument(
+            "--write-only",
+            action="store_true",
+            help="stream the xlsx output, faster for long histories",
+        )
+        subparser.add_argument(
+            "--charts", action="store_true", help="also export the charts"
+        )
+        subparser.add_argument(
+            "--report", help="JSON file for the run report of Utils.Instrumentation"
+        )
+        subparser.add_argument("--log-level", default="INFO")
+        if command == "refresh":
+            subparser.add_argument(
+                "--interval",
+                type=float,
+                default=3600,
+                help="seconds between two refreshes",
+            )
+            subparser.add_argument(
+                "--ticks",
+                type=int,
+                default=0,
+                help="number of refreshes, by default 0 (until interrupted)",
+            )
+    return parser.parse_args(args)
+
+
+## create function to build the analysis params from the command line arguments
+def get_params(args: Namespace) -> dict:
+    params = {}
+    if args.params:
+        with open(args.params) as file:
+            params = json.load(file)
+    for key, value in {
+        "start_date": args.start_date,
+        "end_date": args.end_date,
+        "benchmark": args.benchmark,
+        "path_cache": args.cache,
+    }.items():
+        if value:
+            params[key] = value
+    params["path_input"] = args.input
+    params["path_output"] = args.out
+    return params
+
+
+## create function to write the outputs of an analysis
+def write_outputs(analysis: PortfolioAnalysis, args: Namespace) -> None:
+    analysis.create_xlsx_output(args.output_name, write_only=args.write_only)
+    if args.charts:
+        analysis.export_charts()
+
+
+## create function to refresh an analysis periodically
+def refresh_periodically(analysis: PortfolioAnalysis, args: Namespace) -> None:
+    """Function to append new days to the analysis every args.interval seconds
+
+    Without --end-date every tick advances to today, with --end-date the analysis does not
+    move past it. The outputs are only rewritten if a tick added days.
+
+    Parameters
+    ----------
+    analysis : PortfolioAnalysis
+        analysis kept in memory between the ticks
+    args : Namespace
+        parsed command line arguments
+    """
+    tick = 0
+    try:
+        while not args.ticks or tick < args.ticks:
+            sleep(args.interval)
+            tick += 1
+            with instrumentation.stage("cli.refresh"):
+                days_added = analysis.refresh(args.end_date)
+            if days_added:
+                write_outputs(analysis, args)
+            else:
+                logger.info(f"no new prices since {analysis.end_date}")
+    except KeyboardInterrupt:
+        logger.info("refresh stopped")
+
+
+def main(args: list[str] | None = None) -> None:
+    args = parse_args(args)
+    configure_logging(args.log_level.upper())
+    params = get_params(args)
+    portfolio = read_excel(args.portfolio, index_col=0)
+    makedirs(args.out, exist_ok=True)
+
+    with instrumentation.run(args.report):
+        analysis = PortfolioAnalysis(portfolio, params)
+        write_outputs(analysis, args)
+        if args.command == "refresh":
+            refresh_periodically(analysis, args)
+
+
+if __name__ == "__main__":
+    main()
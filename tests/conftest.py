@@ -0,0 +1,92 @@
+"""Shared fixtures of the tests, which run offline on synthetic prices"""
+from functools import lru_cache
+from os import path
+
+import pandas as pd
+import pytest
+
+from Utils.Sourcing.Synthetic import synthetic_company_info, synthetic_ohlc
+from Utils.Sourcing.Yahoo import OHLC_FIELDS
+
+## create path of the input directory with template.xlsx
+PATH_INPUT = path.join(path.dirname(path.dirname(__file__)), "Input")
+
+
+@lru_cache
+def calendar_ohlc(ticker: str) -> pd.DataFrame:
+    ### every ticker gets one path over a fixed calendar, so overlapping requests agree
+    return synthetic_ohlc(ticker, "2015-01-01", "2030-01-01")
+
+
+class FakeSource:
+    """Offline replacement of Utils.Sourcing.Yahoo.download_ohlc recording its requests
+
+    Attributes
+    ----------
+    requests : list
+        list of (tickers, start_date, end_date) of every call
+    failing : set
+        tickers returned without prices, as yfinance does for unknown tickers
+    errors : int
+        number of the next calls raising a ConnectionError
+    adjustments : dict
+        factor per ticker applied to all prices, e.g. to re-adjust the history after a dividend
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.failing = set()
+        self.errors = 0
+        self.adjustments = {}
+
+    def __call__(
+        self, tickers: list | str, start_date: str, end_date: str | None = None
+    ) -> pd.DataFrame:
+        if type(tickers) == str:
+            tickers = [tickers]
+        self.requests.append((list(tickers), start_date, end_date))
+        if self.errors:
+            self.errors -= 1
+            raise ConnectionError("connection reset")
+
+        ohlc = pd.concat([calendar_ohlc(ticker) for ticker in tickers], axis=1)
+        ohlc = ohlc.reindex(columns=pd.MultiIndex.from_product([OHLC_FIELDS, tickers]))
+        ohlc = ohlc.loc[
+            (ohlc.index >= pd.Timestamp(start_date))
+            & (ohlc.index < pd.Timestamp(end_date or "2030-01-01"))
+        ].copy()
+        for ticker in tickers:
+            ohlc.loc[:, (slice(None), ticker)] *= self.adjustments.get(ticker, 1)
+            if ticker in self.failing:
+                ohlc.loc[:, (slice(None), ticker)] = float("nan")
+        return ohlc
+
+
+@pytest.fixture
+def source() -> FakeSource:
+    return FakeSource()
+
+
+@pytest.fixture
+def portfolio() -> pd.DataFrame:
+    return pd.DataFrame(
+        {"weight": [0.4, 0.3, 0.3]}, index=pd.Index(["AAA", "BBB", "CCC"], name="ticker")
+    )
+
+
+@pytest.fixture
+def params(tmp_path, source: FakeSource) -> dict:
+    return {
+        "start_date": "2021-01-01",
+        "end_date": "2022-06-01",
+        "benchmark": "BENCH",
+        "path_input": PATH_INPUT,
+        "path_output": str(tmp_path),
+        "fetch_scheduler": {
+            "ohlc_source": source,
+            "info_source": synthetic_company_info,
+            "rate": None,
+            "retries": 0,
+            "chunk_size": None,
+        },
+    }
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Utils.Portfolio.Attribution import (
+    attribution_effects,
+    brinson_attribution,
+    link_attribution,
+)
+from Utils.Portfolio.Portfolio import PortfolioAnalysis
+
+
+@pytest.fixture
+def stocks() -> dict:
+    rng = np.random.default_rng(3)
+    returns = pd.DataFrame(
+        rng.normal(0.0005, 0.02, (250, 5)),
+        index=pd.bdate_range("2021-01-01", periods=250),
+        columns=["A", "B", "C", "D", "E"],
+    )
+    groups = pd.Series(
+        ["Tech", "Tech", "Energy", "Health", "Utilities"], index=returns.columns
+    )
+    return {"returns": returns, "groups": groups.rename("sector")}
+
+
+def test_daily_effects_add_up_to_the_active_return(stocks):
+    returns, groups = stocks["returns"], stocks["groups"]
+    portfolio_weights = pd.Series({"A": 0.5, "B": 0.2, "C": 0.3})
+    benchmark_weights = pd.Series({"A": 0.2, "C": 0.2, "D": 0.3, "E": 0.3})
+    attribution_daily = brinson_attribution(
+        portfolio_weights,
+        returns[portfolio_weights.index],
+        groups,
+        benchmark_weights,
+        returns[benchmark_weights.index],
+        groups,
+    )
+
+    portfolio_returns = returns[portfolio_weights.index] @ portfolio_weights
+    benchmark_returns = returns[benchmark_weights.index] @ benchmark_weights
+    effects = sum(
+        attribution_daily[effect].sum(axis=1) for effect in attribution_effects
+    )
+    np.testing.assert_allclose(
+        effects, portfolio_returns - benchmark_returns, atol=1e-14
+    )
+
+    attribution = link_attribution(attribution_daily)
+    active_return = (1 + portfolio_returns).prod() - (1 + benchmark_returns).prod()
+    assert attribution["total_effect"].sum() == pytest.approx(active_return, rel=1e-10)
+    assert attribution[attribution_effects].sum().sum() == pytest.approx(
+        active_return, rel=1e-10
+    )
+    ### groups the portfolio does not hold only have allocation effects
+    not_held = attribution.loc[["Health", "Utilities"], ["selection", "interaction"]]
+    assert (not_held == 0).all().all()
+
+
+def test_linked_effects_add_up_for_a_drifting_portfolio(portfolio, params):
+    composition = pd.DataFrame(
+        {"weight": [0.3, 0.2, 0.25, 0.25]},
+        index=pd.Index(["AAA", "CCC", "DDD", "EEE"], name="ticker"),
+    )
+    analysis = PortfolioAnalysis(
+        portfolio,
+        params | {"benchmark_composition": composition, "rebalancing": "monthly"},
+    )
+    benchmark_constituent_returns = analysis.benchmark_constituent_returns
+    benchmark_returns = benchmark_constituent_returns @ composition["weight"]
+    active_return = (
+        analysis.get_portfolio_returns_cumulative().iloc[-1]
+        - ((1 + benchmark_returns).prod() - 1)
+    )
+    for by in ["sector", "country"]:
+        attribution = analysis.get_attribution(by)
+        assert attribution["total_effect"].sum() == pytest.approx(
+            active_return, rel=1e-9
+        )
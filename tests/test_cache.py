@@ -0,0 +1,55 @@
+import pandas as pd
+
+from Utils.Sourcing.Cache import PriceCache
+
+
+def test_top_up_downloads_only_missing_ranges(tmp_path, source):
+    cache = PriceCache(tmp_path, source=source)
+    first = cache.get_ohlc(["AAA", "BBB"], "2021-01-01", "2021-06-01")
+    assert source.requests == [(["AAA", "BBB"], "2021-01-01", "2021-06-01")]
+
+    source.requests.clear()
+    inner = cache.get_ohlc(["AAA", "BBB"], "2021-03-01", "2021-05-01")
+    assert source.requests == []
+    pd.testing.assert_frame_equal(
+        inner, first.loc["2021-03-01":"2021-04-30"], check_names=False
+    )
+
+    wider = cache.get_ohlc(["AAA", "BBB", "CCC"], "2020-10-01", "2021-08-01")
+    requested = {(tuple(tickers), end) for tickers, _, end in source.requests}
+    assert requested == {
+        (("AAA", "BBB"), "2021-01-01"),
+        (("AAA", "BBB"), "2021-08-01"),
+        (("CCC",), "2021-08-01"),
+    }
+    ### the tail is requested from the last cached day on, to compare its close
+    tail_start = [start for _, start, end in source.requests if end == "2021-08-01"]
+    assert min(tail_start) < "2021-06-01"
+    expected = source(["AAA", "BBB", "CCC"], "2020-10-01", "2021-08-01")
+    pd.testing.assert_frame_equal(wider, expected, check_names=False, check_freq=False)
+
+
+def test_readjusted_history_is_fetched_again(tmp_path, source):
+    cache = PriceCache(tmp_path, source=source)
+    cache.get_ohlc(["AAA", "BBB"], "2021-01-01", "2021-06-01")
+
+    ### a dividend re-adjusts all past prices of AAA
+    source.adjustments["AAA"] = 0.98
+    source.requests.clear()
+    ohlc = cache.get_ohlc(["AAA", "BBB"], "2021-01-01", "2021-08-01")
+
+    assert (["AAA"], "2021-01-01", "2021-08-01") in source.requests
+    expected = source(["AAA", "BBB"], "2021-01-01", "2021-08-01")
+    pd.testing.assert_frame_equal(ohlc, expected, check_names=False, check_freq=False)
+
+
+def test_invalidate_drops_the_cached_tickers(tmp_path, source):
+    cache = PriceCache(tmp_path, source=source)
+    cache.get_ohlc(["AAA", "BBB"], "2021-01-01", "2021-06-01")
+    cache.invalidate("AAA")
+    assert cache.get_coverage().index.tolist() == ["BBB"]
+    assert cache.read(["AAA"], "2021-01-01", "2021-06-01").dropna().empty
+
+    source.requests.clear()
+    cache.get_ohlc(["AAA", "BBB"], "2021-01-01", "2021-06-01")
+    assert source.requests == [(["AAA"], "2021-01-01", "2021-06-01")]
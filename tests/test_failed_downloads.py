@@ -0,0 +1,88 @@
+import pandas as pd
+
+from Utils.Portfolio.Portfolio import PortfolioAnalysis
+from Utils.Sourcing.Scheduler import FetchScheduler
+from Utils.Sourcing.Yahoo import returns_from_ohlc
+
+
+def test_returns_of_failed_downloads_are_empty(source):
+    source.failing = {"BAD", "WORSE"}
+    scheduler = FetchScheduler(rate=None, retries=1, backoff=0, ohlc_source=source)
+    ohlc = scheduler.download_ohlc(["BAD", "WORSE"], "2021-01-01", "2021-02-01")
+
+    assert returns_from_ohlc(ohlc).empty
+    assert scheduler.failure_report()["ticker"].tolist() == ["BAD", "WORSE"]
+
+
+def test_responses_without_rows_are_retried_and_reported():
+    ### yfinance returns a frame without rows if all tickers of a request failed
+    requests = []
+
+    def empty_source(tickers, start_date, end_date=None):
+        requests.append(tickers)
+        return pd.DataFrame()
+
+    scheduler = FetchScheduler(
+        rate=None, retries=2, backoff=0, ohlc_source=empty_source
+    )
+    ohlc = scheduler.download_ohlc(["BAD", "WORSE"], "2021-01-01", "2021-02-01")
+
+    assert len(requests) == 3
+    assert scheduler.failure_report()["ticker"].tolist() == ["BAD", "WORSE"]
+    returns = returns_from_ohlc(ohlc)
+    assert returns.empty
+    assert isinstance(returns.index, pd.DatetimeIndex)
+
+
+def test_returns_of_ohlc_without_rows_are_empty():
+    ohlc = pd.DataFrame(
+        columns=pd.MultiIndex.from_product([["Close", "Open"], ["AAA"]]), dtype=float
+    )
+    assert returns_from_ohlc(ohlc).empty
+
+
+def test_requests_without_rows_give_zero_returns(portfolio, params, source):
+    def partly_empty_source(tickers, start_date, end_date=None):
+        if set(tickers) & {"CCC", "IDX", "EEE"}:
+            return pd.DataFrame()
+        return source(tickers, start_date, end_date)
+
+    composition = pd.DataFrame(
+        {"weight": [0.6, 0.4]}, index=pd.Index(["AAA", "EEE"], name="ticker")
+    )
+    params = params | {
+        "benchmark_composition": composition,
+        "fetch_scheduler": params["fetch_scheduler"]
+        | {"ohlc_source": partly_empty_source, "chunk_size": 1},
+    }
+    analysis = PortfolioAnalysis(portfolio, params)
+    assert analysis.constituent_returns.columns.tolist() == ["AAA", "BBB"]
+    assert (analysis.get_benchmarks_returns_daily(["IDX"])["IDX"] == 0).all()
+    assert (analysis.benchmark_constituent_returns["EEE"] == 0).all()
+    failed = analysis.scheduler.failure_report()["ticker"].tolist()
+    assert sorted(failed) == ["CCC", "EEE", "IDX"]
+
+
+def test_failed_sweep_benchmarks_have_no_returns(portfolio, params, source):
+    source.failing = {"BAD", "IDX"}
+    analysis = PortfolioAnalysis(portfolio, params)
+    benchmarks_returns = analysis.get_benchmarks_returns_daily(["BAD", "IDX"])
+    assert benchmarks_returns.columns.tolist() == ["BAD", "IDX"]
+    assert (benchmarks_returns == 0).all().all()
+
+    sweep = analysis.run_sweep(benchmarks=["BAD", "IDX"])
+    assert sorted(sweep["benchmark"].unique()) == ["BAD", "IDX"]
+
+
+def test_failed_benchmark_constituents_have_no_returns(portfolio, params, source):
+    source.failing = {"DDD", "EEE"}
+    composition = pd.DataFrame(
+        {"weight": [0.5, 0.3, 0.2]}, index=pd.Index(["AAA", "DDD", "EEE"], name="ticker")
+    )
+    analysis = PortfolioAnalysis(
+        portfolio, params | {"benchmark_composition": composition}
+    )
+    returns = analysis.benchmark_constituent_returns
+    assert returns.columns.tolist() == ["AAA", "DDD", "EEE"]
+    assert (returns[["DDD", "EEE"]] == 0).all().all()
+    assert returns.index.equals(analysis.date_range)
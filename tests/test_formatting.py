@@ -0,0 +1,51 @@
+from io import BytesIO
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+from Utils.Portfolio.Formatting import load_template_workbook, write_dfs_to_xlsx_table
+
+
+def written_cells(write_only: bool) -> list:
+    dfs = [
+        pd.DataFrame(
+            {"weight": [0.25, None], "name": ["a", "b"]},
+            index=pd.DatetimeIndex(dates, name="date"),
+        )
+        for dates in [["2021-01-04", "2021-01-05"], ["2021-01-06", "2021-01-07"]]
+    ]
+    wb = Workbook(write_only=write_only)
+    write_dfs_to_xlsx_table(wb, "weights", iter(dfs))
+    file = BytesIO()
+    wb.save(file)
+    ws = load_workbook(file)["weights"]
+    return [
+        [(cell.value, cell.number_format) for cell in row] for row in ws.iter_rows()
+    ]
+
+
+def test_number_formats_are_set_while_appending_rows():
+    cells = written_cells(write_only=False)
+    assert cells == written_cells(write_only=True)
+    assert len(cells) == 5
+    assert [number_format for _, number_format in cells[1]] == [
+        "dd.mm.yyyy",
+        "0.00%;-0.00%",
+        "General",
+    ]
+
+
+def test_template_sheets_keep_their_visibility(params):
+    template_xlsx = f"{params['path_input']}/template.xlsx"
+    template = load_workbook(template_xlsx, read_only=True)
+    assert template["__FDSCACHE__"].sheet_state == "veryHidden"
+
+    for write_only in [False, True]:
+        wb = load_template_workbook(template_xlsx, write_only=write_only)
+        write_dfs_to_xlsx_table(wb, "weights", iter([pd.DataFrame({"weight": [1.0]})]))
+        file = BytesIO()
+        wb.save(file)
+        output = load_workbook(file)
+        assert output.sheetnames == ["__FDSCACHE__", "weights"]
+        assert output["__FDSCACHE__"].sheet_state == "veryHidden"
+        assert output["weights"].sheet_state == "visible"
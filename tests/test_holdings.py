@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Utils.Portfolio.Holdings import rebalancing_flags, simulate_rebalanced_portfolio
+
+
+@pytest.fixture
+def returns() -> pd.DataFrame:
+    ### A gains 10% on three days, then B gains 20%
+    return pd.DataFrame(
+        {"A": [0.1, 0.1, 0.1, 0.0, 0.0], "B": [0.0, 0.0, 0.0, 0.2, 0.0]},
+        index=pd.bdate_range("2021-01-04", periods=5),
+    )
+
+
+def test_weights_drift_until_the_threshold_is_breached(returns):
+    target_weights = pd.Series({"A": 0.5, "B": 0.5})
+    weights, portfolio_returns = simulate_rebalanced_portfolio(
+        returns, target_weights, "threshold", threshold=0.05
+    )
+
+    ### A drifts to 0.55 / 1.05 and 0.605 / 1.105, still within 0.05 of its target;
+    ### at 0.6655 / 1.1655 it is not, so day 4 starts from the target weights again
+    expected_weights_a = [0.5, 0.55 / 1.05, 0.605 / 1.105, 0.5, 0.5 / 1.1]
+    np.testing.assert_allclose(weights["A"], expected_weights_a, rtol=1e-12)
+    np.testing.assert_allclose(weights.sum(axis=1), 1, rtol=1e-12)
+    expected_returns = [0.05, 0.055 / 1.05, 0.0605 / 1.105, 0.1, 0.0]
+    np.testing.assert_allclose(portfolio_returns, expected_returns, atol=1e-12)
+
+
+def test_chunks_do_not_change_threshold_rebalancing():
+    rng = np.random.default_rng(5)
+    returns = pd.DataFrame(
+        rng.normal(0.0005, 0.02, (300, 4)),
+        index=pd.bdate_range("2021-01-01", periods=300),
+        columns=["A", "B", "C", "D"],
+    )
+    target_weights = pd.Series([0.4, 0.3, 0.2, 0.1], index=returns.columns)
+    results = [
+        simulate_rebalanced_portfolio(
+            returns, target_weights, "threshold", 0.03, chunk_size
+        )
+        for chunk_size in [1, 7, 252]
+    ]
+    for weights, portfolio_returns in results[1:]:
+        pd.testing.assert_frame_equal(weights, results[0][0])
+        pd.testing.assert_series_equal(portfolio_returns, results[0][1])
+
+    ### day by day, the returns are the drifting weights times the stock returns
+    weights, portfolio_returns = results[0]
+    np.testing.assert_allclose(
+        portfolio_returns, (weights * returns).sum(axis=1), rtol=1e-10
+    )
+
+
+def test_calendar_rebalancing_resets_weights_on_the_first_day_of_each_month():
+    index = pd.bdate_range("2021-01-25", "2021-02-05")
+    returns = pd.DataFrame({"A": 0.01, "B": -0.01}, index=index)
+    weights, _ = simulate_rebalanced_portfolio(
+        returns, pd.Series({"A": 0.5, "B": 0.5}), "monthly"
+    )
+    flags = rebalancing_flags(index, "monthly")
+    assert index[flags].strftime("%Y-%m-%d").tolist() == ["2021-01-25", "2021-02-01"]
+    assert (weights.loc[index[flags], "A"] == 0.5).all()
+    assert weights.loc["2021-01-29", "A"] == pytest.approx(
+        1.01**4 / (1.01**4 + 0.99**4)
+    )
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Utils.Portfolio.Optimisation import (
+    ledoit_wolf_shrinkage,
+    max_sharpe_weights,
+    min_variance_weights,
+    risk_parity_weights,
+    tracking_error_weights,
+)
+
+
+@pytest.fixture
+def returns() -> pd.DataFrame:
+    ### stocks driven by a common market factor, plus a benchmark
+    rng = np.random.default_rng(7)
+    market = rng.normal(0.0004, 0.01, (750, 1))
+    betas = rng.uniform(0.5, 1.5, 30)
+    stocks = market * betas + rng.normal(0.0002, 0.015, (750, 30))
+    returns = pd.DataFrame(stocks, columns=[f"S{i:02d}" for i in range(30)])
+    return returns.assign(BENCH=market[:, 0])
+
+
+@pytest.fixture
+def covariance(returns) -> pd.DataFrame:
+    return returns.drop(columns="BENCH").cov()
+
+
+def assert_fully_invested(weights: pd.Series, min_weight: float, max_weight: float):
+    assert weights.sum() == pytest.approx(1, abs=1e-9)
+    assert weights.min() >= min_weight - 1e-10
+    assert weights.max() <= max_weight + 1e-10
+
+
+def test_min_variance_matches_closed_form(covariance):
+    ### with bounds that do not bind, the weights are cov^-1 1 / 1' cov^-1 1
+    inverse_ones = np.linalg.solve(covariance, np.ones(len(covariance)))
+    expected = inverse_ones / inverse_ones.sum()
+    weights = min_variance_weights(covariance, -5, 5)
+    np.testing.assert_allclose(weights.to_numpy(), expected, atol=1e-9)
+    assert weights.index.equals(covariance.index)
+
+
+def test_max_sharpe_matches_closed_form(covariance):
+    ### expected returns of cov w make w the unbounded tangency portfolio cov^-1 mu / 1' cov^-1 mu
+    expected = np.linspace(0.5, 1.5, len(covariance))
+    expected = expected / expected.sum()
+    expected_returns = covariance @ expected * 10
+    weights = max_sharpe_weights(covariance, expected_returns, 0.0, -5, 5)
+    np.testing.assert_allclose(weights.to_numpy(), expected, atol=1e-6)
+
+
+def test_bounded_weights_are_fully_invested(returns, covariance):
+    expected_returns = returns.drop(columns="BENCH").mean()
+    weights = min_variance_weights(covariance, 0.0, 0.1)
+    assert_fully_invested(weights, 0.0, 0.1)
+    assert_fully_invested(min_variance_weights(covariance, -0.05, 0.2), -0.05, 0.2)
+    assert_fully_invested(
+        max_sharpe_weights(covariance, expected_returns, 0.0, 0.0, 0.1), 0.0, 0.1
+    )
+    ### the bounded minimum variance is not below the unbounded one
+    unbounded = min_variance_weights(covariance, -5, 5)
+    assert weights @ covariance @ weights >= unbounded @ covariance @ unbounded
+
+
+def test_tracking_error_stays_within_budget(returns):
+    covariance_matrix = returns.cov()
+    stocks = covariance_matrix.index.drop("BENCH")
+    weights = tracking_error_weights(
+        covariance_matrix.loc[stocks, stocks],
+        covariance_matrix.loc[stocks, "BENCH"],
+        covariance_matrix.loc["BENCH", "BENCH"],
+        returns[stocks].mean(),
+        0.05,
+        0.0,
+        0.1,
+    )
+    assert_fully_invested(weights, 0.0, 0.1)
+    active_variance = (
+        weights @ covariance_matrix.loc[stocks, stocks] @ weights
+        - 2 * weights @ covariance_matrix.loc[stocks, "BENCH"]
+        + covariance_matrix.loc["BENCH", "BENCH"]
+    )
+    assert np.sqrt(active_variance * 252) <= 0.05 + 1e-8
+
+
+def test_risk_parity_contributions_are_equal(covariance):
+    weights = risk_parity_weights(covariance)
+    contributions = weights * (covariance @ weights)
+    assert_fully_invested(weights, 0.0, 1.0)
+    np.testing.assert_allclose(
+        contributions / contributions.sum(), 1 / len(covariance), atol=1e-9
+    )
+
+
+def test_risk_parity_follows_risk_budgets(covariance):
+    budgets = pd.Series(np.arange(1, 31), index=covariance.index, dtype=float)
+    weights = risk_parity_weights(covariance, budgets)
+    contributions = weights * (covariance @ weights)
+    np.testing.assert_allclose(
+        contributions / contributions.sum(), budgets / budgets.sum(), atol=1e-9
+    )
+
+
+@pytest.mark.parametrize("min_weight, max_weight", [(0.0, 0.02), (0.05, 1.0)])
+def test_infeasible_bounds_raise(covariance, min_weight, max_weight):
+    with pytest.raises(AssertionError, match="cannot sum to 1"):
+        min_variance_weights(covariance, min_weight, max_weight)
+
+
+def test_shrinkage_is_a_share(returns):
+    assert 0 <= ledoit_wolf_shrinkage(returns.drop(columns="BENCH")) <= 1
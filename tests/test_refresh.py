@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+from Utils.Portfolio.Portfolio import PortfolioAnalysis
+
+## create list of the getters extended by refresh instead of recomputed
+GETTERS = [
+    "get_constituent_returns_cumulative",
+    "get_benchmark_returns_cumulative",
+    "get_portfolio_returns_daily",
+    "get_portfolio_returns_cumulative",
+    "get_return_overview_daily",
+    "get_return_overview_cumulative",
+    "get_relative_returns_daily",
+    "get_constituents_stats",
+]
+
+
+@pytest.mark.parametrize("rebalancing", ["daily", "monthly"])
+def test_refresh_matches_a_full_recompute(portfolio, params, rebalancing):
+    params = params | {"rebalancing": rebalancing}
+    refreshed = PortfolioAnalysis(portfolio, params)
+    refreshed.get_constituents_stats()
+    days_added = sum(
+        refreshed.refresh(end_date)
+        for end_date in ["2022-06-02", "2022-06-04", "2022-06-07", "2022-07-20"]
+    )
+
+    recomputed = PortfolioAnalysis(portfolio, params | {"end_date": refreshed.end_date})
+    assert refreshed.date_range.equals(recomputed.date_range)
+    assert days_added == len(recomputed.date_range) - len(
+        PortfolioAnalysis(portfolio, params).date_range
+    )
+    for getter in GETTERS:
+        refreshed_values = getattr(refreshed, getter)()
+        recomputed_values = getattr(recomputed, getter)()
+        if isinstance(refreshed_values, pd.Series):
+            pd.testing.assert_series_equal(
+                refreshed_values, recomputed_values, rtol=1e-9, check_freq=False
+            )
+        else:
+            pd.testing.assert_frame_equal(
+                refreshed_values, recomputed_values, rtol=1e-9, check_freq=False
+            )
+
+
+def test_refresh_without_new_days(portfolio, params):
+    analysis = PortfolioAnalysis(portfolio, params)
+    stats = analysis.get_constituents_stats()
+    date_range = analysis.date_range
+    assert analysis.refresh(params["end_date"]) == 0
+    assert analysis.date_range.equals(date_range)
+    pd.testing.assert_frame_equal(analysis.get_constituents_stats(), stats)
@@ -0,0 +1,88 @@
+from math import sqrt
+from statistics import NormalDist
+
+import pandas as pd
+import pytest
+
+from Utils.Portfolio.Portfolio import PortfolioAnalysis
+from Utils.Portfolio.Risk import risk_stats
+
+
+@pytest.fixture
+def returns() -> pd.DataFrame:
+    ### the last day has no return and is ignored by all stats but the drawdowns
+    return pd.DataFrame(
+        {"A": [0.01, -0.02, 0.03, -0.04, 0.05, 0.0]},
+        index=pd.bdate_range("2021-01-04", periods=6),
+    )
+
+
+@pytest.fixture
+def benchmark_returns(returns) -> pd.Series:
+    return pd.Series([0.005, -0.01, 0.01, -0.02, 0.015, 0.0], index=returns.index)
+
+
+def test_risk_stats_match_hand_computed_values(returns, benchmark_returns):
+    stats = risk_stats(returns, benchmark_returns, confidence=0.8).loc["A"]
+
+    ### mean 0.006, sample variance 0.00532 / 4 and downside deviation sqrt(0.002 / 5)
+    volatility = sqrt(0.00532 / 4)
+    assert stats["max_drawdown"] == pytest.approx(0.96 - 1)
+    assert stats["max_drawdown_days"] == 1
+    ### the 20% quantile lies 80% of the way from -0.04 to -0.02
+    assert stats["var_historical"] == pytest.approx(0.024)
+    assert stats["cvar_historical"] == pytest.approx(0.04)
+    z_score = NormalDist().inv_cdf(0.2)
+    assert stats["var_parametric"] == pytest.approx(-(0.006 + z_score * volatility))
+    assert stats["cvar_parametric"] == pytest.approx(
+        -(0.006 - volatility * NormalDist().pdf(z_score) / 0.2)
+    )
+    assert stats["sharpe_ratio"] == pytest.approx(0.006 / volatility * sqrt(252))
+    assert stats["sortino_ratio"] == pytest.approx(0.006 / 0.02 * sqrt(252))
+
+    ### active returns 0.005, -0.01, 0.02, -0.02, 0.035 with mean 0.006
+    tracking_error = sqrt(0.00197 / 4) * sqrt(252)
+    assert stats["tracking_error"] == pytest.approx(tracking_error)
+    assert stats["information_ratio"] == pytest.approx(0.006 * 252 / tracking_error)
+
+
+def test_risk_free_rate_lowers_sharpe_and_sortino(returns, benchmark_returns):
+    stats = risk_stats(returns, benchmark_returns, risk_free_rate=0.05).loc["A"]
+    daily_risk_free_rate = 1.05 ** (1 / 252) - 1
+    excess_returns = [r - daily_risk_free_rate for r in returns["A"].iloc[:5]]
+    mean_excess_return = sum(excess_returns) / 5
+    downside_deviation = sqrt(sum(min(r, 0) ** 2 for r in excess_returns) / 5)
+
+    assert stats["sharpe_ratio"] == pytest.approx(
+        mean_excess_return / sqrt(0.00532 / 4) * sqrt(252)
+    )
+    assert stats["sortino_ratio"] == pytest.approx(
+        mean_excess_return / downside_deviation * sqrt(252)
+    )
+
+
+def test_stats_without_risk_are_undefined(returns, benchmark_returns):
+    gains = returns.assign(A=[0.01, 0.02, 0.01, 0.03, 0.02, 0.0])
+    stats = risk_stats(gains, benchmark_returns).loc["A"]
+    assert stats["max_drawdown"] == 0
+    assert stats["max_drawdown_days"] == 0
+    assert pd.isna(stats["sortino_ratio"])
+
+
+def test_risk_params_update_the_cached_stats(portfolio, params):
+    analysis = PortfolioAnalysis(portfolio, params)
+    risk = analysis.get_risk_stats()
+    stats = analysis.get_constituents_stats()
+
+    analysis.var_confidence = 0.99
+    analysis.risk_free_rate = 0.05
+    expected = PortfolioAnalysis(
+        portfolio, params | {"var_confidence": 0.99, "risk_free_rate": 0.05}
+    )
+    assert (analysis.get_risk_stats()["var_historical"] > risk["var_historical"]).all()
+    pd.testing.assert_frame_equal(analysis.get_risk_stats(), expected.get_risk_stats())
+    pd.testing.assert_frame_equal(
+        analysis.get_constituents_stats(), expected.get_constituents_stats()
+    )
+    assert not analysis.get_constituents_stats().equals(stats)
+    assert "portfolio" not in analysis.get_constituents_stats().index
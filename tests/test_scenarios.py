@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+from Utils.Portfolio.Portfolio import PortfolioAnalysis
+from Utils.Portfolio.Stats import annualised_volatility, beta
+
+## create grid of the sweep, checked against one analysis per combination
+WEIGHTS = {
+    "portfolio": {"AAA": 0.4, "BBB": 0.3, "CCC": 0.3},
+    "equal": {"AAA": 1 / 3, "BBB": 1 / 3, "CCC": 1 / 3},
+    "concentrated": {"AAA": 0.8, "CCC": 0.2},
+}
+BENCHMARKS = ["BENCH", "IDX"]
+WINDOWS = [(None, None), ("2021-06-01", "2022-01-01")]
+
+
+def test_sweep_matches_single_runs(portfolio, params):
+    analysis = PortfolioAnalysis(portfolio, params)
+    sweep = analysis.run_sweep(WEIGHTS, BENCHMARKS, WINDOWS)
+    assert len(sweep) == len(WEIGHTS) * len(BENCHMARKS) * len(WINDOWS)
+
+    for row in sweep.itertuples():
+        single = PortfolioAnalysis(
+            pd.DataFrame({"weight": WEIGHTS[row.weights]}),
+            params | {"benchmark": row.benchmark},
+        )
+        ### windows keep the return of their first day, so the single run covers the
+        ### whole period and is restricted to the window afterwards
+        dates = single.date_range
+        in_window = dates >= (row.start_date or params["start_date"])
+        if row.end_date:
+            in_window &= dates < row.end_date
+        portfolio_returns = single.get_portfolio_returns_daily()[in_window]
+        benchmark_returns = single.benchmark_returns[in_window]
+        expected = {
+            "total_return": (1 + portfolio_returns).prod() - 1,
+            "benchmark_return": (1 + benchmark_returns).prod() - 1,
+            "volatility_annualised": annualised_volatility(portfolio_returns),
+            "beta": beta(benchmark_returns, portfolio_returns),
+        }
+        expected["relative_return"] = (1 + expected["total_return"]) / (
+            1 + expected["benchmark_return"]
+        ) - 1
+        for name, value in expected.items():
+            assert getattr(row, name) == pytest.approx(value, rel=1e-9), (
+                row.weights,
+                row.benchmark,
+                row.start_date,
+                name,
+            )
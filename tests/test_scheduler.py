@@ -0,0 +1,71 @@
+from Utils.Instrumentation import instrumentation
+from Utils.Sourcing.Scheduler import FetchScheduler
+from Utils.Sourcing.Synthetic import synthetic_company_info
+
+
+def create_scheduler(source, **options) -> FetchScheduler:
+    return FetchScheduler(
+        **{
+            "rate": None,
+            "backoff": 0,
+            "ohlc_source": source,
+            "info_source": synthetic_company_info,
+        }
+        | options
+    )
+
+
+def test_failed_requests_are_retried(source):
+    instrumentation.reset()
+    source.errors = 2
+    scheduler = create_scheduler(source, retries=3)
+    ohlc = scheduler.download_ohlc(["AAA", "BBB"], "2021-01-01", "2021-02-01")
+
+    assert len(source.requests) == 3
+    assert instrumentation.report()["counters"]["retries"] == 2
+    assert ohlc["Close"].columns.tolist() == ["AAA", "BBB"]
+    assert scheduler.failure_report().empty
+
+
+def test_tickers_failing_all_retries_are_reported(source):
+    source.failing = {"BAD"}
+    scheduler = create_scheduler(source, retries=2)
+    ohlc = scheduler.download_ohlc(["AAA", "BAD"], "2021-01-01", "2021-02-01")
+
+    ### only the failed ticker is requested again
+    assert [tickers for tickers, _, _ in source.requests] == [
+        ["AAA", "BAD"],
+        ["BAD"],
+        ["BAD"],
+    ]
+    assert ohlc["Close"].columns.tolist() == ["AAA"]
+    report = scheduler.failure_report()
+    assert report[["ticker", "dataset", "attempts"]].values.tolist() == [
+        ["BAD", "ohlc", 3]
+    ]
+
+
+def test_chunks_are_combined(source):
+    scheduler = create_scheduler(source, chunk_size=2, max_workers=2)
+    tickers = ["AAA", "BBB", "CCC", "DDD", "EEE"]
+    ohlc = scheduler.download_ohlc(tickers, "2021-01-01", "2021-02-01")
+
+    assert sorted(len(tickers) for tickers, _, _ in source.requests) == [1, 2, 2]
+    assert ohlc["Close"].columns.tolist() == tickers
+
+
+def test_failed_info_is_reported(source):
+    def failing_info(ticker: str) -> dict:
+        raise ConnectionError("connection reset")
+
+    scheduler = create_scheduler(source, retries=1, info_source=failing_info)
+    try:
+        scheduler.fetch_company_info("AAA")
+    except ConnectionError:
+        pass
+    else:
+        raise AssertionError("the last error is raised")
+    report = scheduler.failure_report()
+    assert report[["ticker", "dataset", "attempts"]].values.tolist() == [
+        ["AAA", "info", 2]
+    ]
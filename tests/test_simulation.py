@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+from numpy.random import default_rng
+
+from Utils.Portfolio.Simulation import (
+    OUTCOMES,
+    draw_bootstrap_paths,
+    path_outcomes,
+    simulate_outcomes,
+)
+
+
+@pytest.fixture
+def history() -> pd.DataFrame:
+    rng = np.random.default_rng(1)
+    portfolio = rng.normal(0.0005, 0.012, 500)
+    benchmark = 0.8 * portfolio + rng.normal(0, 0.005, 500)
+    return pd.DataFrame({"portfolio": portfolio, "benchmark": benchmark})
+
+
+@pytest.mark.parametrize("method", ["bootstrap", "normal"])
+def test_seed_gives_the_same_outcomes_serial_and_parallel(history, method):
+    options = {
+        "n_paths": 2500,
+        "horizon_days": 60,
+        "method": method,
+        "seed": 42,
+        "batch_size": 1000,
+    }
+    serial = simulate_outcomes(history, max_workers=1, **options)
+    parallel = simulate_outcomes(history, max_workers=2, **options)
+
+    assert serial.shape == (2500, len(OUTCOMES))
+    assert serial.columns.tolist() == OUTCOMES
+    pd.testing.assert_frame_equal(serial, parallel)
+    other_seed = simulate_outcomes(history, max_workers=1, **options | {"seed": 43})
+    assert not serial.equals(other_seed)
+
+
+def test_bootstrap_paths_are_blocks_of_consecutive_days():
+    ### the returns identify their day, so the drawn days can be read off the paths
+    days = np.arange(30)
+    history = np.column_stack([days, days + 100]).astype(float)
+    portfolio, benchmark = draw_bootstrap_paths(history, 7, 45, 20, default_rng(0))
+
+    assert portfolio.shape == benchmark.shape == (7, 45)
+    np.testing.assert_array_equal(benchmark, portfolio + 100)
+    drawn_days = portfolio.astype(int)
+    for block_start in [0, 20, 40]:
+        block = drawn_days[:, block_start : block_start + 20]
+        ### blocks wrap around the end of the history
+        np.testing.assert_array_equal(
+            block, (block[:, :1] + np.arange(block.shape[1])) % len(days)
+        )
+
+
+def test_path_outcomes_match_hand_computed_values():
+    portfolio = np.array([[0.1, -0.5, 0.2]])
+    benchmark = np.array([[0.0, -0.2, 0.0]])
+    outcomes = path_outcomes(portfolio, benchmark)
+    ### growth 1.1, 0.55, 0.66 with the peak at 1.1
+    np.testing.assert_allclose(outcomes, [[-0.34, -0.2, 0.66 / 0.8 - 1, -0.5]])
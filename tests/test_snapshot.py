@@ -0,0 +1,59 @@
+import json
+import socket
+
+import pandas as pd
+import pytest
+
+from Utils.Portfolio.Portfolio import PortfolioAnalysis
+from Utils.Sourcing.Provider import SyntheticProvider
+
+
+def test_snapshot_round_trip_with_a_provider_instance(portfolio, params, tmp_path):
+    params = {
+        name: value for name, value in params.items() if name != "fetch_scheduler"
+    } | {"data_provider": SyntheticProvider(seed=3), "path_cache": str(tmp_path)}
+    analysis = PortfolioAnalysis(portfolio, params)
+    analysis.save_snapshot(str(tmp_path / "snapshot"))
+    with open(tmp_path / "snapshot" / "metadata.json") as file:
+        saved_params = json.load(file)["metadata"]["params"]
+    assert not {"data_provider", "path_cache"} & saved_params.keys()
+
+    loaded = PortfolioAnalysis.load_snapshot(str(tmp_path / "snapshot"))
+    assert loaded.price_cache is None
+    assert "data_provider" not in loaded.params
+    pd.testing.assert_frame_equal(
+        loaded.get_constituents_stats(), analysis.get_constituents_stats()
+    )
+    pd.testing.assert_series_equal(
+        loaded.get_portfolio_returns_cumulative(),
+        analysis.get_portfolio_returns_cumulative(),
+        check_freq=False,
+    )
+
+
+def test_unserialisable_params_are_not_saved(portfolio, params, tmp_path):
+    analysis = PortfolioAnalysis(portfolio, params | {"label": object()})
+    with pytest.raises(ValueError, match="label"):
+        analysis.save_snapshot(str(tmp_path / "snapshot"))
+
+
+def test_snapshot_with_benchmark_composition_reloads_offline(
+    portfolio, params, tmp_path, monkeypatch
+):
+    composition = pd.DataFrame(
+        {"weight": [0.5, 0.3, 0.2]}, index=pd.Index(["AAA", "DDD", "EEE"], name="ticker")
+    )
+    analysis = PortfolioAnalysis(
+        portfolio, params | {"benchmark_composition": composition}
+    )
+    attribution = analysis.get_attribution()
+    analysis.save_snapshot(str(tmp_path / "snapshot"))
+
+    def no_network(*args, **kwargs):
+        raise AssertionError("network access while loading a snapshot")
+
+    monkeypatch.setattr(socket, "socket", no_network)
+    loaded = PortfolioAnalysis.load_snapshot(str(tmp_path / "snapshot"))
+    pd.testing.assert_frame_equal(loaded.get_attribution(), attribution)
+    loaded.create_xlsx_output()
+    assert loaded.get_failure_report().empty
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Utils.Portfolio.Stats import (
+    annualised_volatilities,
+    annualised_volatility,
+    beta,
+    betas,
+    correlations,
+    covariances,
+    rolling_stats,
+)
+
+
+@pytest.fixture
+def returns() -> pd.DataFrame:
+    ### returns with missing days, zero-filled days and a column with a single return
+    rng = np.random.default_rng(11)
+    values = rng.normal(0.0005, 0.02, (300, 5))
+    values[rng.random((300, 5)) < 0.1] = np.nan
+    values[rng.random((300, 5)) < 0.05] = 0
+    values[:, 4] = 0
+    values[10, 4] = 0.01
+    dates = pd.bdate_range("2021-01-01", periods=300)
+    return pd.DataFrame(values, index=dates, columns=["A", "B", "C", "D", "E"])
+
+
+@pytest.fixture
+def benchmark_returns(returns) -> pd.Series:
+    benchmark = returns[["A", "B", "C"]].mean(axis=1) + 0.001
+    benchmark.iloc[::17] = np.nan
+    return benchmark
+
+
+def test_volatilities_match_pandas(returns):
+    ### the former per-column computation
+    expected = returns.apply(
+        lambda stock_returns: stock_returns.replace(0, None).astype(float).std()
+        * np.sqrt(252)
+    )
+    volatilities = annualised_volatilities(returns)
+    pd.testing.assert_series_equal(
+        volatilities, expected, check_names=False, rtol=1e-12
+    )
+    assert np.isnan(volatilities["E"])
+    assert annualised_volatility(returns["A"]) == pytest.approx(expected["A"])
+
+    with_zeros = annualised_volatilities(returns, drop_zero_returns=False)
+    pd.testing.assert_series_equal(
+        with_zeros, returns.std() * np.sqrt(252), check_names=False, rtol=1e-12
+    )
+
+
+def test_betas_match_least_squares_without_intercept(returns, benchmark_returns):
+    stock_betas = betas(benchmark_returns, returns)
+    for ticker in returns.columns:
+        pairs = pd.concat([benchmark_returns, returns[ticker]], axis=1).dropna()
+        expected, *_ = np.linalg.lstsq(
+            pairs.iloc[:, [0]].to_numpy(), pairs.iloc[:, 1].to_numpy(), rcond=None
+        )
+        assert stock_betas[ticker] == pytest.approx(expected.item(), rel=1e-12)
+        assert beta(benchmark_returns, returns[ticker]) == pytest.approx(
+            stock_betas[ticker], rel=1e-12
+        )
+
+
+@pytest.mark.parametrize("drop_zero_returns", [False, True])
+def test_covariances_and_correlations_match_pandas(returns, drop_zero_returns):
+    expected_returns = returns.mask(returns == 0) if drop_zero_returns else returns
+    pd.testing.assert_frame_equal(
+        covariances(returns, drop_zero_returns), expected_returns.cov(), rtol=1e-10
+    )
+    pd.testing.assert_frame_equal(
+        correlations(returns, drop_zero_returns), expected_returns.corr(), rtol=1e-10
+    )
+
+
+@pytest.mark.parametrize("window", [5, 21])
+def test_rolling_stats_match_pandas_rolling(returns, benchmark_returns, window):
+    stats = rolling_stats(returns, benchmark_returns, window)
+    ### the running sums only cover full windows, as DataFrame.rolling does by default
+    warm_up = stats.iloc[: window - 1]
+    assert warm_up.isna().all().all()
+    assert returns.rolling(window).std().iloc[: window - 1].isna().all().all()
+
+    ### within full windows, missing days are skipped like with min_periods
+    def full_windows(expected: pd.DataFrame) -> pd.DataFrame:
+        return expected.iloc[window - 1 :]
+
+    rolling = lambda frame: frame.rolling(window, min_periods=2)
+    volatility = rolling(returns.mask(returns == 0)).std() * np.sqrt(252)
+    pd.testing.assert_frame_equal(
+        full_windows(stats["volatility_annualised"]),
+        full_windows(volatility),
+        check_names=False,
+        rtol=1e-8,
+    )
+
+    paired = returns.where(benchmark_returns.notna(), axis=0)
+    benchmark = pd.DataFrame({ticker: benchmark_returns for ticker in returns}).where(
+        returns.notna()
+    )
+    beta = rolling(paired * benchmark).sum() / rolling(benchmark**2).sum()
+    tracking_error = rolling(paired - benchmark).std() * np.sqrt(252)
+    correlation = pd.DataFrame(
+        {ticker: rolling(paired[ticker]).corr(benchmark[ticker]) for ticker in returns}
+    )
+    for name, expected in [
+        ("beta", beta),
+        ("tracking_error_annualised", tracking_error),
+        ("correlation", correlation),
+    ]:
+        pd.testing.assert_frame_equal(
+            full_windows(stats[name]),
+            full_windows(expected),
+            check_names=False,
+            rtol=1e-7,
+            atol=1e-12,
+        )